@@ -0,0 +1,130 @@
+"""Admission control for /query: bounded concurrency with a role-prioritized wait queue."""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+from .config import settings
+from .logger import get_logger
+from .exceptions import OverloadedError
+from . import metrics
+
+logger = get_logger(__name__)
+
+# Lower value is served first; unknown roles queue behind everyone
+ROLE_PRIORITY = {"Head": 0, "Team Lead": 1, "Recruiter": 2}
+
+
+class AdmissionController:
+    """
+    At most `max_concurrent` requests run at once; up to `max_queue` more wait.
+
+    Waiters are admitted in role priority order (FIFO within a role). When the
+    queue is full, a newcomer that outranks the lowest-priority waiter evicts
+    it, otherwise the newcomer is rejected. Waiters give up after
+    `queue_timeout_s`. Rejections raise OverloadedError so callers can answer
+    "busy" immediately instead of piling up behind OpenAI latency.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout_s: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _publish(self) -> None:
+        metrics.set_gauge("admission.in_flight", self.in_flight)
+        metrics.set_gauge("admission.queue_depth", self.queue_depth)
+
+    def _reject(self, reason: str) -> OverloadedError:
+        metrics.incr(f"admission.rejected.{reason}")
+        logger.warning("Query rejected by admission control", reason=reason,
+                       in_flight=self.in_flight, queue_depth=self.queue_depth)
+        return OverloadedError(reason, retry_after_s=self.queue_timeout_s)
+
+    def _discard(self, entry: Tuple[int, int, asyncio.Future]) -> None:
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    async def acquire(self, role: Optional[str] = None) -> None:
+        """Wait for a slot; raises OverloadedError when shed."""
+        priority = ROLE_PRIORITY.get(role, len(ROLE_PRIORITY))
+
+        if self.in_flight < self.max_concurrent and not self.queue_depth:
+            self.in_flight += 1
+            metrics.incr("admission.admitted")
+            self._publish()
+            return
+
+        if self.queue_depth >= self.max_queue:
+            pending = [entry for entry in self._waiters if not entry[2].done()]
+            worst = max(pending) if pending else None
+            if worst is None or worst[0] <= priority:
+                raise self._reject("queue_full")
+            self._discard(worst)
+            worst[2].set_exception(self._reject("evicted"))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), future)
+        heapq.heappush(self._waiters, entry)
+        metrics.incr("admission.queued")
+        self._publish()
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            self._discard(entry)
+            self._publish()
+            raise self._reject("timeout")
+        except asyncio.CancelledError:
+            self._discard(entry)
+            # The slot may have been handed over just before the cancellation
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            self._publish()
+            raise
+        metrics.incr("admission.admitted")
+        metrics.observe("admission_wait_ms", (time.perf_counter() - start) * 1000)
+
+    def release(self) -> None:
+        """Hand the slot to the highest-priority waiter, or free it."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                self._publish()
+                return
+        self.in_flight -= 1
+        self._publish()
+
+    @asynccontextmanager
+    async def slot(self, role: Optional[str] = None) -> AsyncIterator[None]:
+        await self.acquire(role)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
+
+
+query_admission = AdmissionController(
+    settings.query_max_concurrency,
+    settings.query_max_queue,
+    settings.query_queue_timeout_s,
+)
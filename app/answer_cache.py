@@ -0,0 +1,42 @@
+"""Recent-answer cache used as a fallback while OpenAI is unavailable."""
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from .config import settings
+
+# Model name recorded in QueryLog for answers served from this cache
+CACHED_MODEL = "cache"
+
+_entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict]]" = OrderedDict()
+
+
+def _key(question: str, user_role: Optional[str]) -> Tuple[str, str]:
+    """Normalize case, punctuation and whitespace so trivial rephrasings match."""
+    normalized = " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+    return normalized, user_role or ""
+
+
+def get(question: str, user_role: Optional[str]) -> Optional[Dict]:
+    """Cached answer for the question and role, if fresh."""
+    key = _key(question, user_role)
+    entry = _entries.get(key)
+    if entry is None:
+        return None
+    stored_at, answer = entry
+    if time.time() - stored_at > settings.answer_cache_ttl_s:
+        del _entries[key]
+        return None
+    _entries.move_to_end(key)
+    return answer
+
+
+def put(question: str, user_role: Optional[str], answer: Dict) -> None:
+    """Remember an answer (dict with answer and sources)."""
+    if settings.answer_cache_size <= 0:
+        return
+    key = _key(question, user_role)
+    _entries[key] = (time.time(), answer)
+    _entries.move_to_end(key)
+    while len(_entries) > settings.answer_cache_size:
+        _entries.popitem(last=False)
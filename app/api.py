@@ -1,23 +1,31 @@
 """FastAPI routes with improved error handling and validation."""
+import asyncio
 import time
 from datetime import datetime
-from typing import Dict, Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
-from .db import get_db
+from .db import get_db, AsyncSessionLocal
 from .config import settings
 from .logger import get_logger
-from .exceptions import NotionRAGError, NotionAPIError, OpenAIError, RetrievalError
-from .notion_sync import ingest_all
+from .exceptions import NotionRAGError, NotionAPIError, OpenAIError, RetrievalError, CircuitOpenError, OverloadedError
+from .sync_jobs import JOB_INGEST, enqueue_job, find_active_job
 from .retrieval import retrieve, format_sources
-from .llm import answer_with_context, calculate_cost
+from .llm import route_answer, should_answer_extractively, build_extractive_answer
 from .models import QueryLog, Feedback, TelegramUser
+from .circuit_breaker import breaker_states
+from .answer_cache import CACHED_MODEL
+from .admission import query_admission
+from .write_behind import query_log_buffer, feedback_buffer
+from .stats import load_stats
+from . import answer_cache
 
 # Admin DB utilities
 from sqlalchemy import text, select  # added for raw SQL execution and queries
-from .db import engine  # use engine for DDL
+from .db import engine, pool_status  # use engine for DDL
+from . import metrics
 from .models import Base  # use metadata for table creation
 
 logger = get_logger(__name__)
@@ -29,6 +37,7 @@ class QueryRequest(BaseModel):
     question: str = Field(..., min_length=1, max_length=1000, description="User question")
     telegram_user_id: Optional[int] = Field(None, description="Telegram user ID")
     include_sources: bool = Field(True, description="Include source references")
+    full_answer: bool = Field(False, description="Always generate an LLM answer, skipping the extractive fast path")
 
 
 class QueryResponse(BaseModel):
@@ -36,6 +45,7 @@ class QueryResponse(BaseModel):
     sources: Optional[list] = Field(None, description="Source references")
     processing_time_ms: Optional[int] = Field(None, description="Processing time in milliseconds")
     tokens_used: Optional[int] = Field(None, description="Total tokens used")
+    extractive: bool = Field(False, description="Answer is an extract of the top source, not LLM-generated")
 
 
 class FeedbackRequest(BaseModel):
@@ -45,14 +55,20 @@ class FeedbackRequest(BaseModel):
 
 
 class IngestResponse(BaseModel):
-    status: str = Field(..., description="Ingestion status")
-    stats: Dict[str, int] = Field(..., description="Ingestion statistics")
+    status: str = Field(..., description="Job status")
+    job_id: int = Field(..., description="Sync job ID; progress at /api/sync-jobs/{job_id} (SSE: /events)")
 
 
 @router.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+    """Health check endpoint (degraded while any circuit breaker is not closed)."""
+    breakers = breaker_states()
+    degraded = any(b["state"] != "closed" for b in breakers.values())
+    return {
+        "status": "degraded" if degraded else "healthy",
+        "timestamp": datetime.utcnow().isoformat(),
+        "circuit_breakers": breakers,
+    }
 
 
 # Admin DB utilities
@@ -86,6 +102,18 @@ async def admin_db_info(secret: str):
         raise HTTPException(status_code=500, detail="Failed to read DB info")
 
 
+@router.get("/admin/metrics")
+async def admin_metrics(secret: str, reset: bool = False):
+    """Return in-process performance metrics and pool usage (admin)."""
+    if secret != settings.webhook_secret_path:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    
+    data = {**metrics.snapshot(), "db_pool": pool_status(), "admission": query_admission.snapshot()}
+    if reset:
+        metrics.reset()
+    return data
+
+
 @router.post("/admin/db-init")
 async def admin_db_init(secret: str):
     """Ensure pgvector extension and create tables (admin)."""
@@ -105,47 +133,106 @@ async def admin_db_init(secret: str):
 
 
 @router.post("/admin/ingest", response_model=IngestResponse)
-async def admin_ingest(secret: str, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
-    """Trigger Notion database ingestion."""
+async def admin_ingest(secret: str, full: bool = False):
+    """Queue a background Notion ingestion job (incremental unless full=true)."""
     if secret != settings.webhook_secret_path:
         raise HTTPException(status_code=403, detail="Forbidden")
     
     try:
-        logger.info("Starting Notion ingestion")
-        stats = await ingest_all(db)
-        
-        return IngestResponse(
-            status="completed",
-            stats=stats
-        )
+        params = {"full": full}
+        job = await find_active_job(JOB_INGEST, params) or await enqueue_job(JOB_INGEST, params)
+        logger.info("Notion ingestion queued", job_id=job.id, full=full)
+        return IngestResponse(status=job.status, job_id=job.id)
     except Exception as e:
-        logger.error("Ingestion failed", error=str(e))
-        raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
+        logger.error("Failed to queue ingestion", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to queue ingestion: {str(e)}")
 
 
 @router.post("/query", response_model=QueryResponse)
-async def query_endpoint(request: QueryRequest, db: AsyncSession = Depends(get_db)):
-    """Process user query and return answer."""
+async def query_endpoint(request: QueryRequest):
+    """
+    Process user query and return answer; answers 503 right away when overloaded.
+    
+    No session is held across the request: the role lookup, retrieval and log
+    insert each check a connection out briefly, so the pool is not tied up
+    while OpenAI computes embeddings and completions.
+    """
     start_time = time.time()
     
+    # Role decides both document access and queue priority; it is looked up
+    # before admission, so its failures are handled here like answer_query's
+    try:
+        user_role = await get_user_role(request.telegram_user_id)
+    except Exception as e:
+        logger.error("Unexpected error in query", stage="role_lookup", error=str(e))
+        raise HTTPException(status_code=500, detail="Internal server error")
+    
+    try:
+        async with query_admission.slot(user_role):
+            return await answer_query(request, user_role, start_time)
+    except OverloadedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Service busy, retry shortly",
+            headers={"Retry-After": str(int(e.retry_after_s or settings.query_queue_timeout_s))}
+        )
+
+
+async def get_user_role(telegram_user_id: Optional[int]) -> Optional[str]:
+    """Look up the user's role in a short session of its own."""
+    if not telegram_user_id:
+        return None
+    
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(TelegramUser.role).where(TelegramUser.user_id == telegram_user_id)
+        )
+        user_role = result.scalar_one_or_none()
+    
+    if user_role:
+        logger.info("User role retrieved", user_id=telegram_user_id, role=user_role)
+    return user_role
+
+
+def save_query_log(query_log: QueryLog) -> None:
+    """Queue a query log row for the write-behind buffer (keyed by user, for feedback linking)."""
+    query_log_buffer.add(query_log, key=query_log.telegram_user_id)
+
+
+async def answer_query(request: QueryRequest, user_role: Optional[str], start_time: float) -> QueryResponse:
+    """Retrieve, answer and log one admitted query."""
     try:
         logger.info("Processing query", 
                    question=request.question[:100], 
                    user_id=request.telegram_user_id)
         
-        # Get user role from database for role-based filtering
-        user_role = None
-        if request.telegram_user_id:
-            result = await db.execute(
-                select(TelegramUser).where(TelegramUser.user_id == request.telegram_user_id)
+        # Retrieve relevant chunks with role filtering; the session connects lazily,
+        # so it holds a connection for the vector search only, not the embedding call
+        try:
+            async with AsyncSessionLocal() as session:
+                chunks = await retrieve(session, request.question, user_role=user_role)
+        except CircuitOpenError as e:
+            # Embeddings unavailable: fail fast, serving a recent answer if there is one
+            cached = answer_cache.get(request.question, user_role)
+            if cached is None:
+                raise
+            logger.warning("Serving cached answer, circuit breaker open", breaker=e.dependency)
+            processing_time = int((time.time() - start_time) * 1000)
+            save_query_log(QueryLog(
+                ts=datetime.utcnow(),
+                telegram_user_id=request.telegram_user_id,
+                question=request.question,
+                answer=cached["answer"],
+                model=CACHED_MODEL,
+                processing_time_ms=processing_time,
+                has_answer=True
+            ))
+            return QueryResponse(
+                answer=cached["answer"],
+                sources=cached["sources"] if request.include_sources else None,
+                processing_time_ms=processing_time,
+                tokens_used=0
             )
-            user = result.scalar_one_or_none()
-            if user:
-                user_role = user.role
-                logger.info("User role retrieved", user_id=request.telegram_user_id, role=user_role)
-        
-        # Retrieve relevant chunks with role filtering
-        chunks = await retrieve(db, request.question, user_role=user_role)
         
         if not chunks:
             logger.warning("No relevant chunks found", question=request.question[:100], user_role=user_role)
@@ -165,8 +252,7 @@ async def query_endpoint(request: QueryRequest, db: AsyncSession = Depends(get_d
                 has_answer=False,  # Mark as failed
                 processing_time_ms=processing_time
             )
-            db.add(query_log)
-            # Don't commit here - get_db() auto-commits at the end
+            save_query_log(query_log)
             
             return QueryResponse(
                 answer=answer,
@@ -174,20 +260,28 @@ async def query_endpoint(request: QueryRequest, db: AsyncSession = Depends(get_d
                 processing_time_ms=processing_time
             )
         
-        # Generate answer using LLM
-        llm_response = await answer_with_context(request.question, chunks)
+        # Serve a confident single-section match directly, otherwise generate answer using LLM
+        extractive = not request.full_answer and should_answer_extractively(chunks)
+        if extractive:
+            llm_response = build_extractive_answer(chunks)
+        else:
+            try:
+                llm_response = await route_answer(request.question, chunks)
+                answer_cache.put(request.question, user_role, {
+                    "answer": llm_response["answer"],
+                    "sources": format_sources(chunks),
+                })
+            except CircuitOpenError as e:
+                # Chat model unavailable: fall back to the best matching extract
+                logger.warning("Serving extractive answer, circuit breaker open", breaker=e.dependency)
+                llm_response = build_extractive_answer(chunks)
+                extractive = True
         
         # Format sources if requested
         sources = None
         if request.include_sources:
             sources = format_sources(chunks)
         
-        # Calculate cost
-        cost = calculate_cost(
-            llm_response.get("prompt_tokens", 0),
-            llm_response.get("completion_tokens", 0)
-        )
-        
         # Log query
         processing_time = int((time.time() - start_time) * 1000)
         query_log = QueryLog(
@@ -196,27 +290,42 @@ async def query_endpoint(request: QueryRequest, db: AsyncSession = Depends(get_d
             question=request.question,
             answer=llm_response["answer"],
             prompt_tokens=llm_response.get("prompt_tokens"),
+            cached_prompt_tokens=llm_response.get("cached_prompt_tokens"),
+            prompt_prefix_hash=llm_response.get("prompt_prefix_hash"),
             completion_tokens=llm_response.get("completion_tokens"),
             model=llm_response.get("model"),
-            cost_usd=cost,
+            cost_usd=llm_response.get("cost_usd"),
+            route=llm_response.get("route"),
+            route_reason=llm_response.get("route_reason"),
+            route_tiers=llm_response.get("route_tiers"),
             processing_time_ms=processing_time,
             has_answer=True
         )
-        db.add(query_log)
-        # Don't commit here - get_db() auto-commits at the end
+        save_query_log(query_log)
         
+        metrics.observe("query_ms", processing_time)
         logger.info("Query processed successfully", 
                    user_id=request.telegram_user_id,
                    tokens_used=llm_response.get("total_tokens", 0),
+                   model=llm_response.get("model"),
+                   route=llm_response.get("route"),
                    processing_time_ms=processing_time)
         
         return QueryResponse(
             answer=llm_response["answer"],
             sources=sources,
             processing_time_ms=processing_time,
-            tokens_used=llm_response.get("total_tokens")
+            tokens_used=llm_response.get("total_tokens"),
+            extractive=extractive
         )
         
+    except CircuitOpenError as e:
+        logger.error("Circuit breaker open", breaker=e.dependency)
+        raise HTTPException(
+            status_code=503,
+            detail="AI service temporarily unavailable",
+            headers={"Retry-After": str(int(e.retry_after_s or settings.breaker_open_s) + 1)}
+        )
     except RetrievalError as e:
         logger.error("Retrieval error", error=str(e))
         raise HTTPException(status_code=500, detail="Document retrieval failed")
@@ -239,27 +348,35 @@ async def submit_feedback(
 ):
     """Submit user feedback."""
     try:
-        # Find the most recent query_log for this user
-        query_log_id = None
-        result = await db.execute(
-            select(QueryLog)
-            .where(QueryLog.telegram_user_id == telegram_user_id)
-            .order_by(QueryLog.ts.desc())
-            .limit(1)
-        )
-        recent_log = result.scalar_one_or_none()
-        if recent_log:
-            query_log_id = recent_log.id
+        # Find the most recent query_log for this user: still buffered, or already written
+        pending_log = query_log_buffer.latest(telegram_user_id)
+        if pending_log is not None:
+            try:
+                # Shielded: timing out must not cancel the buffered row's future
+                query_log_id = await asyncio.wait_for(
+                    asyncio.shield(pending_log), timeout=settings.write_behind_link_timeout_s
+                )
+            except asyncio.TimeoutError:
+                # Flushes are failing; an older log would be the wrong link
+                metrics.incr("write_behind.query_logs.link_timeouts")
+                logger.warning("Query log not written in time, feedback left unlinked", user_id=telegram_user_id)
+                query_log_id = None
+        else:
+            result = await db.execute(
+                select(QueryLog.id)
+                .where(QueryLog.telegram_user_id == telegram_user_id)
+                .order_by(QueryLog.ts.desc())
+                .limit(1)
+            )
+            query_log_id = result.scalar_one_or_none()
         
-        feedback = Feedback(
+        feedback_buffer.add(Feedback(
             telegram_user_id=telegram_user_id,
             message_id=request.message_id,
             query_log_id=query_log_id,
             rating=request.rating,
             comment=request.comment
-        )
-        db.add(feedback)
-        # Don't commit here - get_db() auto-commits at the end
+        ))
         
         logger.info("Feedback submitted", 
                    user_id=telegram_user_id, 
@@ -274,10 +391,16 @@ async def submit_feedback(
 
 
 @router.get("/stats")
-async def get_stats(db: AsyncSession = Depends(get_db)):
-    """Get basic statistics (admin only)."""
-    # This would require additional implementation
-    return {"message": "Stats endpoint not implemented yet"}
+async def get_stats(days: int = Query(14, ge=1, le=90), db: AsyncSession = Depends(get_db)):
+    """
+    Dashboard statistics: totals from the stats counters plus daily and per-role
+    series for the last `days` days from the query_log_daily rollups.
+    """
+    try:
+        return await load_stats(db, days)
+    except Exception as e:
+        logger.error("Error loading stats", error=str(e))
+        raise HTTPException(status_code=500, detail="Failed to load stats")
 
 
 @router.post("/admin/test-start")
@@ -288,7 +411,6 @@ async def admin_test_start(secret: str):
     
     try:
         from bot.telegram import bot
-        import asyncio
         
         # Get first allowed user ID
         user_ids = settings.get_allowed_user_ids()
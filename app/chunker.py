@@ -0,0 +1,214 @@
+"""
+Structure- and token-aware chunking of Notion block trees.
+
+The tree is walked once as a stream of units (paragraphs, list items, toggles,
+tables, code blocks) tagged with their heading path. Units are packed into
+chunks of up to CHUNK_MAX_TOKENS embedding tokens without crossing a heading.
+A unit that does not fit on its own is split at sentence boundaries (Russian
+abbreviations and initials aware), tables at row boundaries with the header
+row repeated, code at line boundaries. Consecutive chunks of one section share
+up to CHUNK_OVERLAP_TOKENS of trailing sentences; a chunk is never emitted
+for overlap alone.
+"""
+from typing import Iterator, List, Optional, Tuple
+from .config import settings
+from .tokens import count_tokens, split_sentences
+
+HEADINGS = {"heading_1": 1, "heading_2": 2, "heading_3": 3}
+TEXT_BLOCKS = ("paragraph", "quote", "callout", "toggle", "to_do")
+LIST_BLOCKS = ("bulleted_list_item", "numbered_list_item")
+
+# Unit kinds
+HEADING = "heading"
+TEXT = "text"
+TABLE = "table"
+CODE = "code"
+
+
+def rich_text_to_plain(rt: Optional[List[dict]]) -> str:
+    """Convert Notion rich text to plain text."""
+    if not rt:
+        return ""
+    return "".join([seg.get("plain_text", "") for seg in rt]).strip()
+
+
+def iter_units(tree: List[dict]) -> Iterator[Tuple[str, str, str]]:
+    """
+    Stream (heading_path, kind, text) for a block tree in document order.
+
+    Headings are yielded as HEADING units (section breaks). Toggle summaries,
+    list items and to-dos are text units; nested items are indented under their
+    parent. Tables come as one unit of " | "-joined rows, code as one unit.
+    """
+
+    def walk(blocks: List[dict], path: List[str], depth: int) -> Iterator[Tuple[str, str, str]]:
+        number = 0
+        for block in blocks:
+            block_type = block.get("type")
+            body = block.get(block_type) or {}
+            children = block.get("children") or []
+            number = number + 1 if block_type == "numbered_list_item" else 0
+            indent = "  " * depth
+
+            if block_type in HEADINGS:
+                text = rich_text_to_plain(body.get("rich_text"))
+                if text:
+                    level = HEADINGS[block_type]
+                    path = path[:level - 1] + [text]
+                    yield " > ".join(path), HEADING, text
+                # Toggleable headings keep their content under the heading
+                yield from walk(children, path, depth)
+                continue
+
+            if block_type == "table":
+                rows = [
+                    " | ".join(rich_text_to_plain(cell) for cell in (row.get("table_row") or {}).get("cells", []))
+                    for row in children if row.get("type") == "table_row"
+                ]
+                rows = [row for row in rows if row.strip(" |")]
+                if rows:
+                    yield " > ".join(path), TABLE, "\n".join(rows)
+                continue
+
+            if block_type == "code":
+                text = "".join(seg.get("plain_text", "") for seg in body.get("rich_text") or []).rstrip()
+                if text.strip():
+                    yield " > ".join(path), CODE, text
+                continue
+
+            if block_type in TEXT_BLOCKS or block_type in LIST_BLOCKS:
+                text = rich_text_to_plain(body.get("rich_text"))
+                if text:
+                    if block_type == "bulleted_list_item":
+                        text = f"- {text}"
+                    elif block_type == "numbered_list_item":
+                        text = f"{number}. {text}"
+                    elif block_type == "to_do":
+                        text = f"[{'x' if body.get('checked') else ' '}] {text}"
+                    yield " > ".join(path), TEXT, indent + text
+
+            if children:
+                nested = block_type in LIST_BLOCKS or block_type in ("toggle", "to_do")
+                yield from walk(children, path, depth + 1 if nested else depth)
+
+    yield from walk(tree, [], 0)
+
+
+class Chunker:
+    """Packs a unit stream into token-bounded chunks; see the module docstring."""
+
+    def __init__(self, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None):
+        self.max_tokens = max_tokens or settings.chunk_max_tokens
+        self.overlap_tokens = settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+
+    def tokens(self, text: str) -> int:
+        return count_tokens(text, settings.openai_embed_model)
+
+    def pack(self, parts: List[str], sep: str, header: str = "") -> List[Tuple[str, int]]:
+        """Greedily join parts into pieces of up to max_tokens, each starting with `header`."""
+        header_tokens = self.tokens(header) + 1 if header else 0
+        pieces: List[Tuple[str, int]] = []
+        current: List[str] = []
+        used = header_tokens
+
+        def emit() -> None:
+            text = sep.join(current)
+            pieces.append((f"{header}\n{text}" if header else text, used))
+
+        for part in parts:
+            cost = self.tokens(part)
+            if cost + header_tokens > self.max_tokens and len(part.split()) > 1:
+                # Oversized sentence, row or line: fall back to words
+                if current:
+                    emit()
+                    current, used = [], header_tokens
+                pieces.extend(self.pack(part.split(), " ", header))
+                continue
+            if current and used + cost + 1 > self.max_tokens:
+                emit()
+                current, used = [], header_tokens
+            current.append(part)
+            used += cost + (1 if len(current) > 1 else 0)
+        if current:
+            emit()
+        return pieces
+
+    def split_unit(self, kind: str, text: str) -> List[Tuple[str, int, str]]:
+        """
+        A unit as (piece, tokens, separator) triples that each fit max_tokens:
+        the whole unit if it fits, else its sentences (joined back with spaces),
+        table row groups under a repeated header, or code line groups.
+        """
+        tokens = self.tokens(text)
+        if tokens <= self.max_tokens:
+            return [(text, tokens, "\n")]
+        if kind == TABLE:
+            header, *rows = text.split("\n")
+            return [(piece, cost, "\n") for piece, cost in self.pack(rows, "\n", header)]
+        if kind == CODE:
+            return [(piece, cost, "\n") for piece, cost in self.pack(text.split("\n"), "\n")]
+
+        pieces: List[Tuple[str, int, str]] = []
+        for sentence in split_sentences(text):
+            cost = self.tokens(sentence)
+            parts = [(sentence, cost)] if cost <= self.max_tokens else self.pack(sentence.split(), " ")
+            pieces.extend((part, part_cost, " " if pieces else "\n") for part, part_cost in parts)
+        return pieces
+
+    def overlap_tail(self, text: str) -> List[Tuple[str, int]]:
+        """Trailing sentences of a chunk that fit overlap_tokens."""
+        if self.overlap_tokens <= 0:
+            return []
+        tail: List[Tuple[str, int]] = []
+        used = 0
+        for sentence in reversed(split_sentences(text.split("\n")[-1])):
+            cost = self.tokens(sentence)
+            if used + cost > self.overlap_tokens:
+                break
+            tail.insert(0, (sentence, cost))
+            used += cost
+        return tail
+
+    def chunks(self, tree: List[dict]) -> Iterator[Tuple[str, str]]:
+        """Stream (heading_path, chunk_text) for a block tree."""
+        path = ""
+        buf: List[str] = []  # Pieces, each after the first prefixed with its separator
+        used = 0
+        fresh = False  # buf holds more than carried-over overlap
+        structured = False  # Last piece came from a table or code block
+
+        for unit_path, kind, text in iter_units(tree):
+            if kind == HEADING or unit_path != path:
+                if fresh:
+                    yield path, "".join(buf)
+                path, buf, used, fresh = unit_path, [], 0, False
+                if kind == HEADING:
+                    continue
+
+            for piece, cost, sep in self.split_unit(kind, text):
+                if fresh and used + cost + 1 > self.max_tokens:
+                    chunk = "".join(buf)
+                    yield path, chunk
+                    # Tables and code are neither repeated nor preceded by overlap
+                    tail = [] if structured or kind in (TABLE, CODE) else self.overlap_tail(chunk)
+                    buf = [" ".join(sentence for sentence, _ in tail)] if tail else []
+                    used = sum(tail_cost for _, tail_cost in tail)
+                    fresh = False
+                    if buf and used + cost + 1 > self.max_tokens:
+                        buf, used = [], 0
+                buf.append(sep + piece if buf else piece)
+                used += cost + (1 if len(buf) > 1 else 0)
+                fresh = True
+                structured = kind in (TABLE, CODE)
+
+        if fresh:
+            yield path, "".join(buf)
+
+
+def chunk_blocks(
+    tree: List[dict],
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None
+) -> Iterator[Tuple[str, str]]:
+    """Stream (heading_path, chunk_text) for a Notion block tree."""
+    return Chunker(max_tokens, overlap_tokens).chunks(tree)
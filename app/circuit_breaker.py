@@ -0,0 +1,190 @@
+"""Circuit breakers for external dependencies (OpenAI, Notion)."""
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from openai import APIStatusError
+from notion_client.errors import APIResponseError
+from .config import settings
+from .logger import get_logger
+from .exceptions import CircuitOpenError
+from . import metrics
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker with error-rate and slow-call-rate triggers.
+
+    While closed, outcomes of the last `window_s` seconds are tracked; once at
+    least `min_calls` calls were made and the failure or slow-call rate reaches
+    its threshold, the breaker opens and rejects calls for `open_s` seconds.
+    It then lets `half_open_calls` trial calls through: if all succeed it
+    closes, any failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        slow_call_ms: float,
+        failure_rate: float = 0.5,
+        slow_call_rate: float = 0.5,
+        min_calls: int = 10,
+        window_s: float = 60.0,
+        open_s: float = 30.0,
+        half_open_calls: int = 3,
+        is_failure: Optional[Callable[[BaseException], bool]] = None
+    ):
+        self.name = name
+        self.slow_call_ms = slow_call_ms
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.window_s = window_s
+        self.open_s = open_s
+        self.half_open_calls = half_open_calls
+        self.is_failure = is_failure or (lambda e: True)
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()  # (ts, failed, slow)
+        self._trials_started = 0
+        self._trials_succeeded = 0
+        self._half_open_round = 0  # Tells trials of an earlier half-open period apart
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_s:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        logger.warning("Circuit breaker state changed", breaker=self.name, old=self._state, new=state)
+        metrics.incr(f"breaker.{self.name}.{state}")
+        self._state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state == HALF_OPEN:
+            self._trials_started = 0
+            self._trials_succeeded = 0
+            self._half_open_round += 1
+        if state == CLOSED:
+            self._outcomes.clear()
+
+    def _before_call(self) -> Optional[int]:
+        """Reject the call while open; returns the half-open round if it is a trial call."""
+        state = self.state
+        if state == OPEN:
+            metrics.incr(f"breaker.{self.name}.rejected")
+            raise CircuitOpenError(self.name, self.open_s - (time.monotonic() - self._opened_at))
+        if state == HALF_OPEN:
+            if self._trials_started >= self.half_open_calls:
+                metrics.incr(f"breaker.{self.name}.rejected")
+                raise CircuitOpenError(self.name)
+            self._trials_started += 1
+            return self._half_open_round
+        return None
+
+    def _release_trial(self, trial: Optional[int]) -> None:
+        """Give back the slot of a trial call that ended without an outcome (cancelled)."""
+        if trial is not None and self._state == HALF_OPEN and trial == self._half_open_round:
+            self._trials_started -= 1
+
+    def _record(self, failed: bool, slow: bool) -> None:
+        if self._state == HALF_OPEN:
+            if failed or slow:
+                self._transition(OPEN)
+            else:
+                self._trials_succeeded += 1
+                if self._trials_succeeded >= self.half_open_calls:
+                    self._transition(CLOSED)
+            return
+
+        if self._state != CLOSED:
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, failed, slow))
+        while self._outcomes and now - self._outcomes[0][0] > self.window_s:
+            self._outcomes.popleft()
+
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        failures = sum(1 for _, f, _ in self._outcomes if f)
+        slow_calls = sum(1 for _, _, s in self._outcomes if s)
+        if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+            logger.error("Circuit breaker tripped", breaker=self.name, calls=calls,
+                         failures=failures, slow_calls=slow_calls)
+            self._transition(OPEN)
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Call func through the breaker; raises CircuitOpenError while open."""
+        trial = self._before_call()
+        start = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self._record(failed=self.is_failure(e), slow=False)
+            raise
+        except BaseException:
+            # Cancellation says nothing about the dependency, but must not leak a trial slot
+            self._release_trial(trial)
+            raise
+        self._record(failed=False, slow=(time.perf_counter() - start) * 1000 > self.slow_call_ms)
+        return result
+
+    def snapshot(self) -> Dict:
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "recent_calls": calls,
+            "recent_failures": sum(1 for _, f, _ in self._outcomes if f),
+            "recent_slow_calls": sum(1 for _, _, s in self._outcomes if s),
+        }
+
+
+def _openai_failure(e: BaseException) -> bool:
+    """Client errors (bad request, auth) say nothing about OpenAI's health."""
+    if isinstance(e, APIStatusError):
+        return e.status_code >= 500 or e.status_code == 429
+    return True
+
+
+def _notion_failure(e: BaseException) -> bool:
+    """Missing pages and permission errors say nothing about Notion's health."""
+    if isinstance(e, APIResponseError):
+        return e.status >= 500 or e.status == 429
+    return True
+
+
+def _breaker(name: str, slow_call_ms: float, is_failure: Callable[[BaseException], bool]) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        slow_call_ms=slow_call_ms,
+        failure_rate=settings.breaker_failure_rate,
+        slow_call_rate=settings.breaker_slow_call_rate,
+        min_calls=settings.breaker_min_calls,
+        window_s=settings.breaker_window_s,
+        open_s=settings.breaker_open_s,
+        half_open_calls=settings.breaker_half_open_calls,
+        is_failure=is_failure,
+    )
+
+
+openai_embeddings_breaker = _breaker("openai_embeddings", settings.breaker_embed_slow_ms, _openai_failure)
+openai_chat_breaker = _breaker("openai_chat", settings.breaker_chat_slow_ms, _openai_failure)
+notion_breaker = _breaker("notion", settings.breaker_notion_slow_ms, _notion_failure)
+
+BREAKERS = (openai_embeddings_breaker, openai_chat_breaker, notion_breaker)
+
+
+def breaker_states() -> Dict[str, Dict]:
+    """Snapshot of every breaker, for health endpoints."""
+    return {breaker.name: breaker.snapshot() for breaker in BREAKERS}
@@ -12,28 +12,128 @@ class Settings(BaseSettings):
     telegram_bot_token: str = Field(..., env="TELEGRAM_BOT_TOKEN")
     allowed_telegram_user_ids: str = Field(default="", env="ALLOWED_TELEGRAM_USER_IDS")
     webhook_secret_path: str = Field(..., env="WEBHOOK_SECRET_PATH")
+    telegram_api_url: Optional[str] = Field(default=None, env="TELEGRAM_API_URL")
     
     # Notion
     notion_token: str = Field(..., env="NOTION_TOKEN")
     notion_database_ids: str = Field(..., env="NOTION_DATABASE_IDS")
+    notion_base_url: Optional[str] = Field(default=None, env="NOTION_BASE_URL")
+    notion_fetch_concurrency: int = Field(default=4, env="NOTION_FETCH_CONCURRENCY", ge=1)  # Block requests in flight per page
+    notion_rate_per_s: float = Field(default=3.0, env="NOTION_RATE_PER_S", gt=0)  # Notion's average request limit
+    notion_burst: int = Field(default=3, env="NOTION_BURST", ge=1)
+    notion_max_retries: int = Field(default=5, env="NOTION_MAX_RETRIES", ge=0)
+    notion_max_connections: int = Field(default=10, env="NOTION_MAX_CONNECTIONS", ge=1)
+    
+    # Ingestion pipeline (fetch -> extract -> embed -> write)
+    ingest_page_concurrency: int = Field(default=5, env="INGEST_PAGE_CONCURRENCY", ge=1)  # Pages fetched at once
+    ingest_embed_batch: int = Field(default=100, env="INGEST_EMBED_BATCH", ge=1)  # Texts per embedding call, across pages
+    ingest_writers: int = Field(default=2, env="INGEST_WRITERS", ge=1)
+    ingest_queue_size: int = Field(default=10, env="INGEST_QUEUE_SIZE", ge=1)  # Pages buffered between stages
+    chunker: str = Field(default="structured", env="CHUNKER")  # structured (token-aware, app/chunker.py) or legacy (characters)
+    chunk_max_tokens: int = Field(default=400, env="CHUNK_MAX_TOKENS", ge=32)  # Embedding tokens per chunk
+    chunk_overlap_tokens: int = Field(default=40, env="CHUNK_OVERLAP_TOKENS", ge=0)  # Trailing sentences repeated in the next chunk
+    page_cache_enabled: bool = Field(default=True, env="PAGE_CACHE_ENABLED")  # Keep raw block trees for rechunk.py
+    
+    # Background sync jobs
+    sync_worker_enabled: bool = Field(default=True, env="SYNC_WORKER_ENABLED")
+    sync_poll_interval_s: float = Field(default=5.0, env="SYNC_POLL_INTERVAL_S", gt=0)
+    sync_job_lease_s: float = Field(default=300.0, env="SYNC_JOB_LEASE_S", gt=0)  # Running jobs whose lease expired are reclaimed
+    sync_job_heartbeat_s: float = Field(default=60.0, env="SYNC_JOB_HEARTBEAT_S", gt=0)  # Lease renewal interval
+    
+    # Notion webhooks (page events trigger debounced re-syncs)
+    notion_webhook_token: Optional[str] = Field(default=None, env="NOTION_WEBHOOK_TOKEN")  # verification_token of the subscription
+    notion_webhook_debounce_s: float = Field(default=5.0, env="NOTION_WEBHOOK_DEBOUNCE_S", ge=0)  # Quiet time before a re-sync
+    notion_webhook_max_wait_s: float = Field(default=60.0, env="NOTION_WEBHOOK_MAX_WAIT_S", gt=0)  # Re-sync at least this often during edits
+    
+    # Change-detection scheduler (polls Notion edit times, enqueues changed pages)
+    sync_scheduler_enabled: bool = Field(default=False, env="SYNC_SCHEDULER_ENABLED")  # Run in the web process
+    sync_scheduler_interval_s: float = Field(default=300.0, env="SYNC_SCHEDULER_INTERVAL_S", gt=0)
+    sync_scheduler_jitter: float = Field(default=0.1, env="SYNC_SCHEDULER_JITTER", ge=0, lt=1)  # +/- fraction of the interval
+    
+    # Distributed ingestion workers (per-page work items in ingest_items)
+    ingest_worker_enabled: bool = Field(default=True, env="INGEST_WORKER_ENABLED")  # Also claim items in the web process
+    ingest_claim_batch: int = Field(default=20, env="INGEST_CLAIM_BATCH", ge=1)  # Items leased per claim
+    ingest_lease_s: float = Field(default=300.0, env="INGEST_LEASE_S", gt=0)  # Lease length; expired leases are reclaimable
+    ingest_heartbeat_s: float = Field(default=60.0, env="INGEST_HEARTBEAT_S", gt=0)  # Lease renewal interval
+    ingest_max_attempts: int = Field(default=3, env="INGEST_MAX_ATTEMPTS", ge=1)
+    ingest_retry_backoff_s: float = Field(default=30.0, env="INGEST_RETRY_BACKOFF_S", ge=0)  # Times attempts before a retry
     
     # OpenAI
     openai_api_key: str = Field(..., env="OPENAI_API_KEY")
+    openai_base_url: Optional[str] = Field(default=None, env="OPENAI_BASE_URL")
     openai_chat_model: str = Field(default="gpt-4o-mini", env="OPENAI_CHAT_MODEL")
+    openai_fast_model: str = Field(default="gpt-4o-mini", env="OPENAI_FAST_MODEL")  # Router tier; set OPENAI_CHAT_MODEL to a stronger model
     openai_embed_model: str = Field(default="text-embedding-3-small", env="OPENAI_EMBED_MODEL")
+    openai_timeout_s: float = Field(default=30.0, env="OPENAI_TIMEOUT_S", gt=0)
     embedding_dim: int = Field(default=1536, env="EMBEDDING_DIM")
     
     # Database
     database_url: str = Field(..., env="DATABASE_URL")
+    db_pool_size: int = Field(default=5, env="DB_POOL_SIZE", ge=1, le=100)
+    db_max_overflow: int = Field(default=10, env="DB_MAX_OVERFLOW", ge=0, le=100)
     
     # Retrieval settings
     top_k: int = Field(default=6, env="TOP_K", ge=1, le=20)
     similarity_threshold: float = Field(default=0.25, env="SIMILARITY_THRESHOLD", ge=0.0, le=1.0)
-    max_context_chars: int = Field(default=12000, env="MAX_CONTEXT_CHARS", ge=1000, le=50000)
+    
+    # Token budgets (prompt = system prompt + question + packed context)
+    prompt_token_budget: int = Field(default=6000, env="PROMPT_TOKEN_BUDGET", ge=500, le=120000)
+    llm_token_budget: int = Field(default=8000, env="LLM_TOKEN_BUDGET", ge=1000, le=128000)
+    max_completion_tokens: int = Field(default=1000, env="MAX_COMPLETION_TOKENS", ge=100, le=16000)
+    
+    # Extractive fast path (answer with the top chunk, skip the LLM)
+    extractive_enabled: bool = Field(default=False, env="EXTRACTIVE_ENABLED")
+    extractive_min_similarity: float = Field(default=0.8, env="EXTRACTIVE_MIN_SIMILARITY", ge=0.0, le=1.0)
+    extractive_min_margin: float = Field(default=0.05, env="EXTRACTIVE_MIN_MARGIN", ge=0.0, le=1.0)
+    
+    # Model router (fast model first, escalate to OPENAI_CHAT_MODEL on low confidence);
+    # does nothing while OPENAI_CHAT_MODEL and OPENAI_FAST_MODEL are the same (the default)
+    model_router_enabled: bool = Field(default=False, env="MODEL_ROUTER_ENABLED")
+    router_min_similarity: float = Field(default=0.5, env="ROUTER_MIN_SIMILARITY", ge=0.0, le=1.0)
+    router_disagreement_margin: float = Field(default=0.03, env="ROUTER_DISAGREEMENT_MARGIN", ge=0.0, le=1.0)
     
     # Cost tracking
     price_prompt_per_1k: float = Field(default=0.005, env="PRICE_PROMPT_PER_1K", ge=0)
     price_completion_per_1k: float = Field(default=0.015, env="PRICE_COMPLETION_PER_1K", ge=0)
+    price_cached_prompt_per_1k: float = Field(default=0.0025, env="PRICE_CACHED_PROMPT_PER_1K", ge=0)
+    price_fast_prompt_per_1k: float = Field(default=0.00015, env="PRICE_FAST_PROMPT_PER_1K", ge=0)
+    price_fast_completion_per_1k: float = Field(default=0.0006, env="PRICE_FAST_COMPLETION_PER_1K", ge=0)
+    price_fast_cached_prompt_per_1k: float = Field(default=0.000075, env="PRICE_FAST_CACHED_PROMPT_PER_1K", ge=0)
+    
+    # Prompt caching: how often the popular-chunk ordering of the context is refreshed
+    prompt_cache_rank_refresh_s: int = Field(default=3600, env="PROMPT_CACHE_RANK_REFRESH_S", ge=60)
+    
+    # Admission control for /query
+    query_max_concurrency: int = Field(default=8, env="QUERY_MAX_CONCURRENCY", ge=1)
+    query_max_queue: int = Field(default=32, env="QUERY_MAX_QUEUE", ge=0)
+    query_queue_timeout_s: float = Field(default=10.0, env="QUERY_QUEUE_TIMEOUT_S", gt=0)
+    
+    # Write-behind buffers for QueryLog and Feedback rows
+    write_behind_batch: int = Field(default=100, env="WRITE_BEHIND_BATCH", ge=1)  # Rows per multi-row INSERT
+    write_behind_interval_s: float = Field(default=1.0, env="WRITE_BEHIND_INTERVAL_S", gt=0)  # Max delay before a flush
+    write_behind_max_pending: int = Field(default=10000, env="WRITE_BEHIND_MAX_PENDING", ge=1)  # Oldest rows dropped beyond this
+    write_behind_link_timeout_s: float = Field(default=5.0, env="WRITE_BEHIND_LINK_TIMEOUT_S", gt=0)  # Feedback waits this long for its query log
+    
+    # query_logs partitions, retention and daily rollups
+    log_maintenance_enabled: bool = Field(default=True, env="LOG_MAINTENANCE_ENABLED")  # Run in the web process
+    log_maintenance_interval_s: float = Field(default=3600.0, env="LOG_MAINTENANCE_INTERVAL_S", gt=0)
+    query_log_partitions_ahead: int = Field(default=2, env="QUERY_LOG_PARTITIONS_AHEAD", ge=1)  # Months created in advance
+    query_log_retention_months: int = Field(default=12, env="QUERY_LOG_RETENTION_MONTHS", ge=0)  # Raw logs kept; 0 keeps all
+    
+    # Circuit breakers (OpenAI embeddings, OpenAI chat, Notion)
+    breaker_failure_rate: float = Field(default=0.5, env="BREAKER_FAILURE_RATE", gt=0.0, le=1.0)
+    breaker_slow_call_rate: float = Field(default=0.5, env="BREAKER_SLOW_CALL_RATE", gt=0.0, le=1.0)
+    breaker_min_calls: int = Field(default=10, env="BREAKER_MIN_CALLS", ge=1)
+    breaker_window_s: float = Field(default=60.0, env="BREAKER_WINDOW_S", gt=0)
+    breaker_open_s: float = Field(default=30.0, env="BREAKER_OPEN_S", gt=0)
+    breaker_half_open_calls: int = Field(default=3, env="BREAKER_HALF_OPEN_CALLS", ge=1)
+    breaker_embed_slow_ms: float = Field(default=5000, env="BREAKER_EMBED_SLOW_MS", gt=0)
+    breaker_chat_slow_ms: float = Field(default=20000, env="BREAKER_CHAT_SLOW_MS", gt=0)
+    breaker_notion_slow_ms: float = Field(default=10000, env="BREAKER_NOTION_SLOW_MS", gt=0)
+    
+    # Recent answers served while OpenAI is unavailable
+    answer_cache_size: int = Field(default=1000, env="ANSWER_CACHE_SIZE", ge=0)
+    answer_cache_ttl_s: int = Field(default=86400, env="ANSWER_CACHE_TTL_S", ge=0)
     
     # API settings
     api_url: str = Field(default="http://localhost:8000", env="API_URL")
@@ -49,6 +149,13 @@ class Settings(BaseSettings):
             return []
         return [int(x.strip()) for x in self.allowed_telegram_user_ids.split(",") if x.strip()]
     
+    def get_notion_client_options(self) -> dict:
+        """Get notion_client options (custom base URL only when configured)."""
+        options = {"auth": self.notion_token}
+        if self.notion_base_url:
+            options["base_url"] = self.notion_base_url
+        return options
+    
     def get_database_ids(self) -> List[str]:
         """Get database IDs as a list."""
         return [x.strip() for x in self.notion_database_ids.split(",") if x.strip()]
@@ -1,12 +1,14 @@
 """CRUD API endpoints for admin panel."""
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, func
 from pydantic import BaseModel
 from .db import get_db
-from .models import Document, Chunk, QueryLog, Feedback, TelegramUser
+from .models import Document, Chunk, QueryLog, Feedback, TelegramUser, PageSnapshot
 from .logger import get_logger
+from .stats import bump, feedback_deltas, DOCUMENTS, CHUNKS
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/api")
@@ -38,10 +40,13 @@ class TelegramUserUpdate(BaseModel):
 
 # Documents endpoints
 @router.get("/documents")
-async def get_documents(db: AsyncSession = Depends(get_db)):
-    """Get all documents."""
+async def get_documents(limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    """Get all documents (most recently edited first)."""
     try:
-        result = await db.execute(select(Document).order_by(Document.last_edited.desc()))
+        query = select(Document).order_by(Document.last_edited.desc())
+        if limit:
+            query = query.limit(limit)
+        result = await db.execute(query)
         documents = result.scalars().all()
         
         return [
@@ -99,6 +104,10 @@ async def delete_document(document_id: str, db: AsyncSession = Depends(get_db)):
         if not doc:
             raise HTTPException(status_code=404, detail="Document not found")
         
+        chunks = await db.execute(select(func.count()).select_from(Chunk).where(Chunk.document_id == doc.id))
+        await bump(db, {DOCUMENTS: -1, CHUNKS: -chunks.scalar_one()})
+        # Cached block trees too, so rechunk.py cannot bring the page back
+        await db.execute(delete(PageSnapshot).where(PageSnapshot.page_id == doc.notion_page_id))
         await db.delete(doc)
         
         logger.info("Document deleted", document_id=document_id)
@@ -248,6 +257,7 @@ async def delete_chunk(chunk_id: str, db: AsyncSession = Depends(get_db)):
         if not chunk:
             raise HTTPException(status_code=404, detail="Chunk not found")
         
+        await bump(db, {CHUNKS: -1})
         await db.delete(chunk)
         
         logger.info("Chunk deleted", chunk_id=chunk_id)
@@ -300,9 +310,10 @@ async def update_chunk(
 async def get_query_logs(
     limit: Optional[int] = None, 
     failed_only: Optional[bool] = None,
+    days: Optional[int] = Query(None, ge=1),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all query logs with user info."""
+    """Get all query logs with user info (last `days` only if given, which scans only their partitions)."""
     try:
         from sqlalchemy.orm import selectinload
         
@@ -313,6 +324,9 @@ async def get_query_logs(
         if failed_only is not None:
             query = query.where(QueryLog.has_answer == (not failed_only))
         
+        if days:
+            query = query.where(QueryLog.ts >= datetime.now(timezone.utc) - timedelta(days=days))
+        
         if limit:
             query = query.limit(limit)
         
@@ -339,6 +353,7 @@ async def get_query_logs(
                 "question": log.question,
                 "answer": log.answer,
                 "prompt_tokens": log.prompt_tokens,
+                "cached_prompt_tokens": log.cached_prompt_tokens,
                 "completion_tokens": log.completion_tokens,
                 "model": log.model,
                 "cost_usd": str(log.cost_usd) if log.cost_usd else None,
@@ -380,6 +395,7 @@ async def get_query_log(log_id: int, db: AsyncSession = Depends(get_db)):
             "question": log.question,
             "answer": log.answer,
             "prompt_tokens": log.prompt_tokens,
+            "cached_prompt_tokens": log.cached_prompt_tokens,
             "completion_tokens": log.completion_tokens,
             "model": log.model,
             "cost_usd": str(log.cost_usd) if log.cost_usd else None,
@@ -524,6 +540,7 @@ async def delete_feedback(feedback_id: int, db: AsyncSession = Depends(get_db)):
         if not fb:
             raise HTTPException(status_code=404, detail="Feedback not found")
         
+        await bump(db, feedback_deltas([{"rating": fb.rating}], sign=-1))
         await db.delete(fb)
         
         logger.info("Feedback deleted", feedback_id=feedback_id)
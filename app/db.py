@@ -1,11 +1,13 @@
 """Database configuration and session management."""
+import time
 from typing import AsyncGenerator
 from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import StaticPool, AsyncAdaptedQueuePool
 from .config import settings
 from .logger import get_logger
+from . import metrics
 
 logger = get_logger(__name__)
 
@@ -24,8 +26,23 @@ elif database_url.startswith("postgresql+psycopg://"):
     # Psycopg format: postgresql+psycopg:// -> postgresql+asyncpg://
     database_url = database_url.replace("postgresql+psycopg://", "postgresql+asyncpg://", 1)
 
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait to check out a connection."""
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe("db_pool_wait_ms", (time.perf_counter() - start) * 1000)
+
+
 engine = create_async_engine(
     database_url,
+    poolclass=TimedQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
     pool_pre_ping=True,
     pool_recycle=300,
     echo=settings.log_level == "DEBUG",
@@ -62,6 +79,16 @@ async def init_db() -> None:
     logger.info("Database initialized")
 
 
+def pool_status() -> dict:
+    """Current connection pool usage."""
+    pool = engine.sync_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+
 async def close_db() -> None:
     """Close database connections."""
     await engine.dispose()
@@ -5,11 +5,16 @@ from openai import AsyncOpenAI, RateLimitError, APIError
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from .config import settings
 from .logger import get_logger
-from .exceptions import OpenAIError
+from .exceptions import OpenAIError, CircuitOpenError
+from .circuit_breaker import openai_embeddings_breaker
 
 logger = get_logger(__name__)
 
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+client = AsyncOpenAI(
+    api_key=settings.openai_api_key,
+    base_url=settings.openai_base_url,
+    timeout=settings.openai_timeout_s,
+)
 
 
 @retry(
@@ -43,7 +48,8 @@ async def embed_texts(texts: List[str]) -> List[List[float]]:
         
         for i in range(0, len(texts), max_batch_size):
             batch = texts[i:i + max_batch_size]
-            response = await client.embeddings.create(
+            response = await openai_embeddings_breaker.call(
+                client.embeddings.create,
                 model=settings.openai_embed_model,
                 input=batch
             )
@@ -57,6 +63,8 @@ async def embed_texts(texts: List[str]) -> List[List[float]]:
         logger.info("Embeddings created successfully", count=len(all_embeddings))
         return all_embeddings
         
+    except CircuitOpenError:
+        raise
     except RateLimitError as e:
         logger.error("Rate limit exceeded for embeddings", error=str(e))
         raise OpenAIError(f"Rate limit exceeded: {e}", "rate_limit")
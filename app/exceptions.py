@@ -25,3 +25,18 @@ class RetrievalError(NotionRAGError):
 class TelegramError(NotionRAGError):
     """Telegram bot related errors."""
     pass
+class ServiceBusyError(TelegramError):
+    """API shed the request (503); the user should simply retry shortly."""
+    pass
+class CircuitOpenError(NotionRAGError):
+    """Call rejected because the dependency's circuit breaker is open."""
+    def __init__(self, dependency: str, retry_after_s: Optional[float] = None):
+        super().__init__(f"Circuit breaker open for {dependency}")
+        self.dependency = dependency
+        self.retry_after_s = retry_after_s
+class OverloadedError(NotionRAGError):
+    """Request rejected by admission control (too many concurrent queries)."""
+    def __init__(self, reason: str, retry_after_s: Optional[float] = None):
+        super().__init__(f"Service overloaded: {reason}")
+        self.reason = reason
+        self.retry_after_s = retry_after_s
@@ -0,0 +1,292 @@
+"""Staged Notion ingestion: fetch -> extract -> embed -> write, connected by bounded queues."""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from .config import settings
+from .db import AsyncSessionLocal
+from .logger import get_logger
+from .exceptions import CircuitOpenError
+from .embeddings import embed_texts
+from .notion_api import notion, notion_call
+from .notion_sync import (
+    DATABASE_IDS,
+    fetch_page,
+    page_title_and_url,
+    extract_chunks,
+    content_hash,
+    stored_chunk_hashes,
+    write_page,
+    parse_notion_time,
+    load_stored_edit_times,
+    fetch_remote_edit_times,
+)
+from .page_cache import Snapshot, pack_snapshot, save_snapshot
+from . import metrics
+
+logger = get_logger(__name__)
+
+STAGES = ("fetch", "extract", "embed", "write")
+
+# End-of-stream marker passed down the queues
+DONE = object()
+
+
+class PageJob:
+    """One page travelling through the pipeline."""
+
+    def __init__(self, page_id: str):
+        self.page_id = page_id
+        self.last_edited: Optional[datetime] = None
+        self.page: Optional[dict] = None
+        self.tree: List[dict] = []
+        self.title = ""
+        self.url = ""
+        self.chunks_with_path: List = []
+        self.to_embed: Dict[str, str] = {}  # content hash -> text, for chunks not stored yet
+        self.embeddings: Dict[str, List[float]] = {}
+        self.snapshot: Optional[Snapshot] = None  # Compressed raw page and tree for the block cache
+
+
+class IngestPipeline:
+    """
+    Each stage runs its own workers and hands pages on through a bounded queue,
+    so fetching, chunking, embedding and writing overlap across pages:
+
+    - fetch: edit-time check, page object and block tree (INGEST_PAGE_CONCURRENCY workers)
+    - extract: walk and chunk the tree, find chunks not stored yet, pack the block cache snapshot
+    - embed: one embedding call per batch of up to INGEST_EMBED_BATCH texts, across pages
+    - write: diffing upsert plus snapshot, each page in its own session (INGEST_WRITERS workers)
+
+    A failure drops only the page it belongs to. `on_page_done(page_id, outcome,
+    error)` is awaited as each page is updated, skipped or failed (used for
+    job progress checkpoints).
+    """
+
+    def __init__(
+        self,
+        full: bool = False,
+        on_page_done: Optional[Callable[[str, str, Optional[str]], Awaitable[None]]] = None
+    ):
+        self.full = full
+        self.on_page_done = on_page_done
+        self.stored: Dict[str, datetime] = {}
+        self.remote: Dict[str, datetime] = {}
+        self.stats = {"processed": 0, "skipped": 0, "errors": 0, "pages": 0}
+        self.report: Dict[str, list] = {"updated": [], "skipped": [], "failed": []}
+        self.stage_stats = {name: {"pages": 0, "items": 0, "busy_s": 0.0} for name in STAGES}
+
+    def _record(self, stage: str, start: float, pages: int = 1, items: int = 0) -> None:
+        elapsed = time.perf_counter() - start
+        self.stage_stats[stage]["pages"] += pages
+        self.stage_stats[stage]["items"] += items
+        self.stage_stats[stage]["busy_s"] += elapsed
+        metrics.incr(f"ingest.{stage}.pages", pages)
+        metrics.observe(f"ingest_{stage}_ms", elapsed * 1000)
+
+    async def _page_done(self, page_id: str, outcome: str, error: Optional[str] = None) -> None:
+        if self.on_page_done is not None:
+            try:
+                await self.on_page_done(page_id, outcome, error)
+            except Exception as e:
+                logger.warning("Page progress callback failed", page_id=page_id, error=str(e))
+
+    async def _fail(self, job: PageJob, stage: str, error: Exception) -> None:
+        logger.error("✗ Error processing page", page_id=job.page_id, stage=stage, error=str(error))
+        metrics.incr(f"ingest.{stage}.errors")
+        self.stats["errors"] += 1
+        self.report["failed"].append({"page_id": job.page_id, "stage": stage, "error": str(error)})
+        await self._page_done(job.page_id, "failed", str(error))
+
+    async def fetch(self, job: PageJob) -> Optional[PageJob]:
+        job.last_edited = self.remote.get(job.page_id)
+        if job.last_edited is None:
+            job.page = await notion_call(notion.pages.retrieve, page_id=job.page_id)
+            if job.page.get("last_edited_time"):
+                job.last_edited = parse_notion_time(job.page["last_edited_time"])
+
+        stored = self.stored.get(job.page_id)
+        if job.last_edited is not None and stored is not None and stored >= job.last_edited:
+            self.stats["skipped"] += 1
+            self.report["skipped"].append(job.page_id)
+            logger.debug("Page unchanged, skipping", page_id=job.page_id)
+            await self._page_done(job.page_id, "skipped")
+            return None
+
+        if job.last_edited is None:
+            logger.warning("No last_edited_time for page", page_id=job.page_id)
+            job.last_edited = datetime.utcnow()
+
+        job.page, job.tree = await fetch_page(job.page_id, job.page)
+        return job
+
+    async def extract(self, job: PageJob) -> PageJob:
+        job.title, job.url = page_title_and_url(job.page)
+        job.chunks_with_path = extract_chunks(job.tree)
+        if settings.page_cache_enabled:
+            job.snapshot = pack_snapshot(job.page, job.tree)
+        job.tree = []
+
+        async with AsyncSessionLocal() as session:
+            stored = await stored_chunk_hashes(session, job.page_id)
+        for _, content in job.chunks_with_path:
+            digest = content_hash(content)
+            if digest not in stored:
+                job.to_embed[digest] = content
+
+        logger.info("Page content extracted", page_id=job.page_id, title=job.title,
+                    chunks=len(job.chunks_with_path), to_embed=len(job.to_embed))
+        return job
+
+    async def embed(self, jobs: List[PageJob], outbox: asyncio.Queue) -> None:
+        """Embed the new chunks of several pages in one call; retry page by page on failure."""
+        start = time.perf_counter()
+        digests = [digest for job in jobs for digest in job.to_embed]
+        texts = [text for job in jobs for text in job.to_embed.values()]
+        try:
+            vectors = await embed_texts(texts) if texts else []
+        except Exception as e:
+            if len(jobs) == 1 or isinstance(e, CircuitOpenError):
+                for job in jobs:
+                    await self._fail(job, "embed", e)
+                return
+            logger.warning("Embedding batch failed, retrying pages separately", pages=len(jobs), error=str(e))
+            for job in jobs:
+                await self.embed([job], outbox)
+            return
+
+        by_digest = dict(zip(digests, vectors))
+        for job in jobs:
+            job.embeddings = {digest: by_digest[digest] for digest in job.to_embed}
+        self._record("embed", start, pages=len(jobs), items=len(texts))
+        for job in jobs:
+            await outbox.put(job)
+
+    async def write(self, job: PageJob) -> None:
+        async with AsyncSessionLocal() as session:
+            counts = await write_page(
+                session, job.page_id, job.last_edited, job.title, job.url,
+                job.chunks_with_path, embeddings=job.embeddings
+            )
+            if job.snapshot is not None:
+                await save_snapshot(session, job.page_id, job.last_edited, job.snapshot)
+            await session.commit()
+
+        self.stats["processed"] += 1
+        self.report["updated"].append(job.page_id)
+        logger.info("✓ Page processed successfully", page_id=job.page_id, **counts)
+        await self._page_done(job.page_id, "updated")
+
+    async def run_stage(
+        self,
+        name: str,
+        handler: Callable[[PageJob], Awaitable[Optional[PageJob]]],
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        workers: int
+    ) -> None:
+        """Run `workers` consumers of inbox; signal DONE downstream once all of them finish."""
+
+        async def worker() -> None:
+            while True:
+                job = await inbox.get()
+                if job is DONE:
+                    await inbox.put(DONE)  # Let sibling workers see it too
+                    return
+                start = time.perf_counter()
+                try:
+                    result = await handler(job)
+                except Exception as e:
+                    await self._fail(job, name, e)
+                    continue
+                self._record(name, start, items=len(job.chunks_with_path))
+                if result is not None and outbox is not None:
+                    await outbox.put(result)
+
+        await asyncio.gather(*[worker() for _ in range(workers)])
+        if outbox is not None:
+            await outbox.put(DONE)
+
+    async def run_embed_stage(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        """Group pages already waiting in inbox into batches of up to ingest_embed_batch texts."""
+        finished = False
+        while not finished:
+            batch = [await inbox.get()]
+            while (batch[-1] is not DONE and not inbox.empty()
+                   and sum(len(job.to_embed) for job in batch) < settings.ingest_embed_batch):
+                batch.append(inbox.get_nowait())
+            if batch[-1] is DONE:
+                batch.pop()
+                finished = True
+            if batch:
+                await self.embed(batch, outbox)
+        await outbox.put(DONE)
+
+    async def run(self, page_ids: List[str]) -> Dict[str, Any]:
+        self.stats["pages"] = len(page_ids)
+        started = time.perf_counter()
+        logger.info("Starting Notion pages ingestion", pages=len(page_ids), full=self.full)
+
+        if not self.full:
+            async with AsyncSessionLocal() as session:
+                self.stored = await load_stored_edit_times(session, page_ids)
+            try:
+                self.remote = await fetch_remote_edit_times(page_ids, self.stored)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                # Search may be unavailable to the integration; fall back to per-page lookups
+                logger.warning("Bulk edit-time lookup failed, retrieving pages one by one", error=str(e))
+            logger.info("Edit times loaded", stored=len(self.stored), remote=len(self.remote))
+
+        pages: asyncio.Queue = asyncio.Queue()
+        for page_id in page_ids:
+            pages.put_nowait(PageJob(page_id))
+        pages.put_nowait(DONE)
+        fetched: asyncio.Queue = asyncio.Queue(maxsize=settings.ingest_queue_size)
+        extracted: asyncio.Queue = asyncio.Queue(maxsize=settings.ingest_queue_size)
+        embedded: asyncio.Queue = asyncio.Queue(maxsize=settings.ingest_queue_size)
+
+        await asyncio.gather(
+            self.run_stage("fetch", self.fetch, pages, fetched, settings.ingest_page_concurrency),
+            self.run_stage("extract", self.extract, fetched, extracted, 1),
+            self.run_embed_stage(extracted, embedded),
+            self.run_stage("write", self.write, embedded, None, settings.ingest_writers),
+        )
+
+        stages = {
+            name: {
+                **data,
+                "busy_s": round(data["busy_s"], 2),
+                "pages_per_s": round(data["pages"] / data["busy_s"], 2) if data["busy_s"] else None,
+            }
+            for name, data in self.stage_stats.items()
+        }
+        wall_s = round(time.perf_counter() - started, 2)
+        logger.info("Notion pages ingestion completed", stats=self.stats, wall_s=wall_s, stages=stages)
+        return {**self.stats, "report": {**self.report, "stages": stages, "wall_s": wall_s}}
+
+
+async def ingest_all(
+    full: bool = False,
+    page_ids: Optional[List[str]] = None,
+    on_page_done: Optional[Callable[[str, str, Optional[str]], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """
+    Ingest configured Notion pages through the staged pipeline.
+
+    By default the sync is incremental: pages whose Notion last_edited_time
+    equals the stored Document.last_edited are skipped without walking their
+    blocks or re-embedding. `full=True` re-ingests every page.
+
+    Args:
+        full: Re-ingest unchanged pages too
+        page_ids: Pages to ingest (default: all configured pages)
+        on_page_done: Awaited with (page_id, outcome, error) as each page finishes
+
+    Returns:
+        Counts (pages, processed, skipped, errors) plus a "report" with the
+        updated, skipped and failed page IDs and per-stage throughput
+    """
+    pipeline = IngestPipeline(full, on_page_done)
+    return await pipeline.run(DATABASE_IDS if page_ids is None else page_ids)
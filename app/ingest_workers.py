@@ -0,0 +1,250 @@
+"""
+Distributed ingestion: one ingest_items row per page, leased by any number of workers.
+
+Workers claim items with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent
+claims never block on or double-book the same rows. A claim leases the items
+for INGEST_LEASE_S and the holder renews the lease every INGEST_HEARTBEAT_S
+while it works. A worker that dies stops renewing: its leases expire and the
+items become claimable again. Every claim counts as an attempt; a page that
+fails INGEST_MAX_ATTEMPTS times is marked failed.
+"""
+import asyncio
+import os
+import socket
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select, update, func, and_, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from .config import settings
+from .db import AsyncSessionLocal
+from .logger import get_logger
+from .models import IngestItem
+from .ingest_pipeline import ingest_all
+from . import metrics
+
+logger = get_logger(__name__)
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+OPEN_STATUSES = (PENDING, LEASED)
+
+# Identifies this process in ingest_items.lease_owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Set by enqueue_items() so an in-process worker does not wait for its next poll
+_wakeup = asyncio.Event()
+
+
+def lease_deadline():
+    """Lease expiry computed on the database clock, shared by every worker host."""
+    return func.now() + timedelta(seconds=settings.ingest_lease_s)
+
+
+async def enqueue_items(job_id: Optional[int], page_ids: List[str], full: bool = False) -> int:
+    """Add one pending item per page; pages the job already has are left as they are."""
+    rows = [{"job_id": job_id, "page_id": page_id, "full_sync": full} for page_id in dict.fromkeys(page_ids)]
+    if not rows:
+        return 0
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            pg_insert(IngestItem).values(rows).on_conflict_do_nothing(index_elements=["job_id", "page_id"])
+        )
+        await session.commit()
+    _wakeup.set()
+    logger.info("Ingest items queued", job_id=job_id, pages=len(rows), new=result.rowcount)
+    return result.rowcount
+
+
+async def claim_items(owner: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Lease up to `limit` claimable items: pending ones whose retry backoff has
+    passed, and leased ones whose holder let the lease expire.
+    """
+    claimable = (
+        select(IngestItem.id)
+        .where(
+            IngestItem.attempts < settings.ingest_max_attempts,
+            or_(
+                and_(IngestItem.status == PENDING, IngestItem.available_at <= func.now()),
+                and_(IngestItem.status == LEASED, IngestItem.lease_expires_at < func.now()),
+            ),
+        )
+        .order_by(IngestItem.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(IngestItem)
+            .where(IngestItem.id.in_(claimable.scalar_subquery()))
+            .values(
+                status=LEASED,
+                lease_owner=owner,
+                lease_expires_at=lease_deadline(),
+                attempts=IngestItem.attempts + 1,
+                updated_at=func.now(),
+            )
+            .returning(IngestItem.id, IngestItem.job_id, IngestItem.page_id, IngestItem.full_sync, IngestItem.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        items = [dict(row._mapping) for row in result]
+        await session.commit()
+    if items:
+        metrics.incr("ingest.items.claimed", len(items))
+        logger.info("Ingest items claimed", worker=owner, items=len(items))
+    return items
+
+
+async def renew_leases(owner: str, item_ids: List[int]) -> int:
+    """Heartbeat: push back the expiry of the items this worker still holds."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(IngestItem)
+            .where(IngestItem.id.in_(item_ids), IngestItem.lease_owner == owner, IngestItem.status == LEASED)
+            .values(lease_expires_at=lease_deadline(), updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    return result.rowcount
+
+
+async def reap_expired_items() -> int:
+    """Fail items whose last allowed attempt ended with an expired lease."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(IngestItem)
+            .where(
+                IngestItem.status == LEASED,
+                IngestItem.lease_expires_at < func.now(),
+                IngestItem.attempts >= settings.ingest_max_attempts,
+            )
+            .values(
+                status=FAILED, outcome="failed", lease_owner=None, updated_at=func.now(),
+                last_error=func.coalesce(IngestItem.last_error, "lease expired"),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    if result.rowcount:
+        metrics.incr("ingest.items.dead", result.rowcount)
+        logger.warning("Ingest items failed after expired leases", items=result.rowcount)
+    return result.rowcount
+
+
+async def finish_item(item: Dict[str, Any], owner: str, outcome: str, error: Optional[str] = None) -> None:
+    """Record a page outcome; failures go back to pending with backoff until attempts run out."""
+    if outcome == "failed" and item["attempts"] < settings.ingest_max_attempts:
+        delay = timedelta(seconds=settings.ingest_retry_backoff_s * item["attempts"])
+        values = {"status": PENDING, "available_at": func.now() + delay, "last_error": error}
+        metrics.incr("ingest.items.retried")
+    else:
+        values = {"status": FAILED if outcome == "failed" else DONE, "outcome": outcome, "last_error": error}
+        if outcome == "failed":
+            metrics.incr("ingest.items.dead")
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(IngestItem)
+            .where(IngestItem.id == item["id"], IngestItem.lease_owner == owner, IngestItem.status == LEASED)
+            .values(lease_owner=None, lease_expires_at=None, updated_at=func.now(), **values)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    if not result.rowcount:
+        # The lease expired and another worker took the item over; its result wins
+        logger.warning("Lease lost before ingest item finished", item_id=item["id"], page_id=item["page_id"])
+
+
+async def process_items(owner: str, items: List[Dict[str, Any]]) -> None:
+    """Run claimed items through the ingestion pipeline while a heartbeat keeps them leased."""
+
+    async def heartbeat() -> None:
+        while True:
+            await asyncio.sleep(settings.ingest_heartbeat_s)
+            try:
+                await renew_leases(owner, [item["id"] for item in items])
+            except Exception as e:
+                logger.warning("Failed to renew ingest leases", worker=owner, error=str(e))
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        for full in (False, True):
+            group = [item for item in items if item["full_sync"] == full]
+            if group:
+                await process_group(owner, group, full)
+    finally:
+        beat.cancel()
+
+
+async def process_group(owner: str, items: List[Dict[str, Any]], full: bool) -> None:
+    by_page: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        by_page.setdefault(item["page_id"], []).append(item)
+
+    async def on_page_done(page_id: str, outcome: str, error: Optional[str]) -> None:
+        for item in by_page.pop(page_id, []):
+            await finish_item(item, owner, outcome, error)
+
+    try:
+        await ingest_all(full=full, page_ids=list(by_page), on_page_done=on_page_done)
+        error = "no outcome reported"
+    except Exception as e:
+        logger.error("Ingest batch failed", worker=owner, pages=len(by_page), error=str(e))
+        error = str(e)
+
+    # Pages the pipeline never reached count as a failed attempt
+    for page_id in list(by_page):
+        await on_page_done(page_id, "failed", error)
+
+
+async def job_item_progress(job_id: int) -> Dict[str, Any]:
+    """Item counts and the updated/skipped/failed report of one ingest job."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(IngestItem.page_id, IngestItem.status, IngestItem.outcome, IngestItem.last_error)
+            .where(IngestItem.job_id == job_id)
+            .order_by(IngestItem.id)
+        )
+        rows = result.all()
+
+    report: Dict[str, list] = {"updated": [], "skipped": [], "failed": []}
+    completed: List[str] = []
+    for page_id, status, outcome, error in rows:
+        if status in OPEN_STATUSES:
+            continue
+        completed.append(page_id)
+        if status == FAILED:
+            report["failed"].append({"page_id": page_id, "error": error})
+        else:
+            report[outcome].append(page_id)
+    return {
+        "total": len(rows),
+        "done": len(completed),
+        "open": len(rows) - len(completed),
+        "completed_pages": completed,
+        "report": report,
+    }
+
+
+async def run_item_worker(owner: str = WORKER_ID) -> None:
+    """Claim and process ingest items until cancelled (lifespan task or ingest_worker.py)."""
+    logger.info("Ingest worker started", worker=owner)
+    while True:
+        _wakeup.clear()
+        try:
+            await reap_expired_items()
+            items = await claim_items(owner, settings.ingest_claim_batch)
+        except Exception as e:
+            logger.error("Failed to claim ingest items", worker=owner, error=str(e))
+            items = []
+
+        if items:
+            await process_items(owner, items)
+            continue
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.sync_poll_interval_s)
+        except asyncio.TimeoutError:
+            pass
@@ -1,16 +1,26 @@
 """LLM service with improved prompt engineering and error handling."""
+import hashlib
+import math
 import time
-from typing import List, Dict, Optional
+from collections import Counter
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 from openai import AsyncOpenAI, RateLimitError, APIError
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 import os
 from .config import settings
 from .logger import get_logger
-from .exceptions import OpenAIError
+from .exceptions import OpenAIError, CircuitOpenError
+from .circuit_breaker import openai_chat_breaker
+from .tokens import count_tokens, count_message_tokens, truncate_to_tokens
 
 logger = get_logger(__name__)
 
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+client = AsyncOpenAI(
+    api_key=settings.openai_api_key,
+    base_url=settings.openai_base_url,
+    timeout=settings.openai_timeout_s,
+)
 
 # Enhanced system prompt for better responses
 SYSTEM_PROMPT = """Ты корпоративный ассистент, который отвечает на вопросы сотрудников на основе регламентов и документации компании.
@@ -30,54 +40,245 @@ SYSTEM_PROMPT = """Ты корпоративный ассистент, кото
 - Выделяй важную информацию жирным шрифтом
 - Если нужно, используй эмодзи для лучшего восприятия (но умеренно)"""
 
+# Appended after every context block
+CONTEXT_BLOCK_SEPARATOR = "\n\n---\n"
+
+# Context used when retrieval found nothing
+EMPTY_CONTEXT = "Контекст не найден."
+
+# Source headers are not tokenized per request: the fixed template is counted
+# once and the variable text (index, title, heading path, URL) is estimated at
+# this many characters per token, which overestimates for Russian text and URLs
+HEADER_CHARS_PER_TOKEN = 2
+
+# Model name recorded in QueryLog for answers served without the LLM
+EXTRACTIVE_MODEL = "extractive"
+
+# Answer fragments meaning the model found nothing in the context
+NOT_FOUND_SENTINELS = ("не нашел", "не нашла")
+
+# Model router outcomes and reasons recorded in QueryLog
+ROUTE_DIRECT = "direct"
+ROUTE_FAST = "fast"
+ROUTE_STRONG = "strong"
+ROUTE_ESCALATED = "escalated"
+ROUTE_REASON_LOW_SIMILARITY = "low_similarity"
+ROUTE_REASON_DISAGREEMENT = "chunk_disagreement"
+ROUTE_REASON_NOT_FOUND = "not_found"
+
+# How many of the most frequently retrieved chunks get a fixed context position
+POPULAR_CHUNKS_RANKED = 200
+
+_chunk_hits: Counter = Counter()
+_popular_rank: Dict[str, int] = {}
+_popular_rank_built_at = 0.0
 
-def build_context_snippets(chunks: List[Dict]) -> str:
+
+def record_chunk_hits(chunks: List[Dict]) -> None:
+    """
+    Count retrieval hits per chunk and periodically refresh the popularity ranking.
+    
+    The ranking is a snapshot so that context ordering stays stable (and the
+    prompt prefix byte-identical) between refreshes.
     """
-    Build context snippets from retrieved chunks.
+    global _popular_rank_built_at
+    
+    _chunk_hits.update(str(chunk["id"]) for chunk in chunks if chunk.get("id") is not None)
+    
+    now = time.time()
+    if now - _popular_rank_built_at >= settings.prompt_cache_rank_refresh_s:
+        _popular_rank.clear()
+        for rank, (chunk_id, _) in enumerate(_chunk_hits.most_common(POPULAR_CHUNKS_RANKED)):
+            _popular_rank[chunk_id] = rank
+        _popular_rank_built_at = now
+
+
+def context_order_key(chunk: Dict) -> Tuple:
+    """Deterministic context position: popular chunks first, then document order."""
+    return (
+        _popular_rank.get(str(chunk.get("id")), POPULAR_CHUNKS_RANKED),
+        chunk.get("url", ""),
+        chunk.get("chunk_index") or 0,
+        str(chunk.get("id", "")),
+    )
+
+
+def build_context_snippets(chunks: List[Dict], token_budget: int) -> Tuple[str, int]:
+    """
+    Pack retrieved chunks into a context string that fits a token budget.
+    
+    Chunks are selected by similarity score using the token counts stored at
+    ingest; the first chunk that does not fit is truncated at a sentence
+    boundary and selection stops there. Selected chunks are then laid out in a
+    deterministic order so that repeated context produces the same prompt prefix.
     
     Args:
         chunks: List of chunk dictionaries
+        token_budget: Maximum number of context tokens
         
     Returns:
-        Formatted context string
+        Tuple of (formatted context string, context tokens)
     """
     if not chunks:
-        return "Контекст не найден."
+        return EMPTY_CONTEXT, static_token_counts()["empty_context"]
     
-    pieces = []
-    total_chars = 0
+    ranked = sorted(chunks, key=lambda c: c.get('cosine_similarity', 0), reverse=True)
+    separator_tokens = static_token_counts()["separator"]
     
-    for i, chunk in enumerate(chunks, 1):
-        # Build header with source information
-        header = f"## Источник {i}: {chunk['title']}"
-        if chunk.get('heading_path'):
-            header += f" — {chunk['heading_path']}"
-        
-        header += f"\n**Ссылка:** {chunk['url']}\n"
-        
-        # Add content
+    selected = []  # (chunk, content, content tokens)
+    total_tokens = 0
+    
+    for i, chunk in enumerate(ranked, 1):
         content = chunk['content'].strip()
+        content_tokens = chunk.get('token_count')
+        if content_tokens is None:
+            # Legacy chunk ingested before token counts were stored
+            content_tokens = count_tokens(content)
         
-        # Add similarity score for debugging (in development)
-        if settings.log_level == "DEBUG":
-            similarity = chunk.get('cosine_similarity', 0)
-            header += f"**Релевантность:** {similarity:.2f}\n"
-        
-        block = f"{header}\n{content}\n\n---\n"
+        overhead = estimate_header_tokens(i, chunk) + separator_tokens + (1 if selected else 0)
+        remaining = token_budget - total_tokens - overhead
         
-        # Check if adding this block would exceed the limit
-        if total_chars + len(block) > settings.max_context_chars:
-            logger.warning("Context truncated due to size limit", 
-                         current_size=total_chars, 
-                         max_size=settings.max_context_chars)
+        if content_tokens > remaining:
+            content = truncate_to_tokens(content, remaining)
+            logger.warning("Context truncated due to token budget", 
+                         chunks_used=len(selected), 
+                         budget=token_budget)
+            if content:
+                selected.append((chunk, content, count_tokens(content)))
             break
         
-        pieces.append(block)
-        total_chars += len(block)
+        selected.append((chunk, content, content_tokens))
+        total_tokens += overhead + content_tokens
+    
+    selected.sort(key=lambda item: context_order_key(item[0]))
+    pieces = []
+    total_tokens = max(0, len(selected) - 1)  # Newlines joining the blocks
+    for i, (chunk, content, content_tokens) in enumerate(selected, 1):
+        # Counted with the final index: headers are renumbered after reordering
+        total_tokens += estimate_header_tokens(i, chunk) + content_tokens + separator_tokens
+        pieces.append(f"{build_context_header(i, chunk)}\n{content}{CONTEXT_BLOCK_SEPARATOR}")
     
     context = "\n".join(pieces)
-    logger.info("Context built", chunks_used=len(pieces), total_chars=total_chars)
-    return context
+    logger.info("Context built", chunks_used=len(pieces), context_tokens=total_tokens, budget=token_budget)
+    return context, total_tokens
+
+
+@lru_cache(maxsize=1)
+def static_token_counts() -> Dict[str, int]:
+    """Token counts of the fixed prompt parts, computed once instead of per request."""
+    template = build_context_header(0, {"title": "", "url": ""})
+    return {
+        "separator": count_tokens(CONTEXT_BLOCK_SEPARATOR),
+        "empty_context": count_tokens(EMPTY_CONTEXT),
+        "header_template": count_tokens(f"{template}\n"),
+        "header_template_chars": len(template),
+        # System prompt and user message around an empty question and context
+        "base_prompt": count_message_tokens([SYSTEM_PROMPT, build_user_message("", "")]),
+    }
+
+
+def estimate_header_tokens(index: int, chunk: Dict) -> int:
+    """Tokens of a context header plus its newline, without running the tokenizer."""
+    static = static_token_counts()
+    variable_chars = len(build_context_header(index, chunk)) - static["header_template_chars"]
+    return static["header_template"] + math.ceil(max(0, variable_chars) / HEADER_CHARS_PER_TOKEN)
+
+
+def build_context_header(index: int, chunk: Dict) -> str:
+    """Build the source header for a context block."""
+    header = f"## Источник {index}: {chunk['title']}"
+    if chunk.get('heading_path'):
+        header += f" — {chunk['heading_path']}"
+    
+    header += f"\n**Ссылка:** {chunk['url']}\n"
+    
+    # Add similarity score for debugging (in development; defeats prompt caching)
+    if settings.log_level == "DEBUG":
+        similarity = chunk.get('cosine_similarity', 0)
+        header += f"**Релевантность:** {similarity:.2f}\n"
+    
+    return header
+
+
+def build_user_message(question: str, context: str) -> str:
+    """
+    Build the user message from the packed context and the question.
+    
+    The context goes first and the question last so that requests sharing
+    context share a long, cacheable prompt prefix.
+    """
+    return f"""Контекст из регламентов:
+{context}
+
+Вопрос: {question}
+
+Ответ:"""
+
+
+def prompt_prefix_hash(context: str) -> str:
+    """Short hash of the stable prompt prefix (system prompt + context)."""
+    return hashlib.sha256(f"{SYSTEM_PROMPT}\x00{context}".encode("utf-8")).hexdigest()[:16]
+
+
+def should_answer_extractively(chunks: List[Dict]) -> bool:
+    """
+    Check whether the top chunk is a confident enough match to be returned as is.
+
+    The top chunk must exceed the similarity threshold and beat the runner-up
+    by at least the configured margin.
+
+    Args:
+        chunks: Retrieved chunks ordered by similarity
+
+    Returns:
+        True if the extractive fast path can be used
+    """
+    if not settings.extractive_enabled or not chunks:
+        return False
+
+    top_similarity = chunks[0].get("cosine_similarity", 0)
+    if top_similarity < settings.extractive_min_similarity:
+        return False
+
+    if len(chunks) > 1:
+        runner_up_similarity = chunks[1].get("cosine_similarity", 0)
+        if top_similarity - runner_up_similarity < settings.extractive_min_margin:
+            return False
+
+    return True
+
+
+def build_extractive_answer(chunks: List[Dict]) -> Dict:
+    """
+    Build an answer from the top chunk without calling the LLM.
+
+    Args:
+        chunks: Retrieved chunks ordered by similarity
+
+    Returns:
+        Dictionary with the same shape as answer_with_context() output
+    """
+    chunk = chunks[0]
+
+    header = f"**{chunk['title']}**"
+    if chunk.get("heading_path"):
+        header += f" — {chunk['heading_path']}"
+
+    answer = f"{header}\n\n{chunk['content'].strip()}\n\n🔗 {chunk['url']}"
+
+    logger.info("Extractive answer built",
+               chunk_id=str(chunk.get("id")),
+               similarity=chunk.get("cosine_similarity"))
+
+    return {
+        "answer": answer,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+        "model": EXTRACTIVE_MODEL,
+        "cost_usd": calculate_cost(0, 0),
+        "processing_time_ms": 0
+    }
 
 
 @retry(
@@ -86,13 +287,14 @@ def build_context_snippets(chunks: List[Dict]) -> str:
     retry=retry_if_exception_type((RateLimitError, APIError)),
     reraise=True
 )
-async def answer_with_context(question: str, chunks: List[Dict]) -> Dict:
+async def answer_with_context(question: str, chunks: List[Dict], model: Optional[str] = None) -> Dict:
     """
     Generate answer using LLM with context from retrieved chunks.
     
     Args:
         question: User question
         chunks: Retrieved document chunks
+        model: Chat model to use (defaults to settings.openai_chat_model)
         
     Returns:
         Dictionary with answer and metadata
@@ -101,56 +303,70 @@ async def answer_with_context(question: str, chunks: List[Dict]) -> Dict:
         OpenAIError: If LLM generation fails
     """
     start_time = time.time()
+    model = model or settings.openai_chat_model
     
     try:
-        logger.info("Generating answer", question=question[:100], chunks_count=len(chunks))
+        logger.info("Generating answer", question=question[:100], chunks_count=len(chunks), model=model)
+        
+        # Tokens used by everything except the packed context (only the question is tokenized)
+        base_prompt_tokens = static_token_counts()["base_prompt"] + count_tokens(question)
+        context_budget = max(0, settings.prompt_token_budget - base_prompt_tokens)
         
         # Build context from chunks
-        context = build_context_snippets(chunks)
+        record_chunk_hits(chunks)
+        context, context_tokens = build_context_snippets(chunks, context_budget)
+        
+        # Completion gets whatever the overall budget leaves after the prompt
+        max_tokens = max(1, min(
+            settings.max_completion_tokens,
+            settings.llm_token_budget - base_prompt_tokens - context_tokens
+        ))
         
         # Prepare messages
         messages = [
             {"role": "system", "content": SYSTEM_PROMPT},
-            {
-                "role": "user", 
-                "content": f"""Вопрос: {question}
-
-Контекст из регламентов:
-{context}
-
-Ответ:"""
-            }
+            {"role": "user", "content": build_user_message(question, context)}
         ]
         
         # Generate response
-        response = await client.chat.completions.create(
-            model=settings.openai_chat_model,
+        response = await openai_chat_breaker.call(
+            client.chat.completions.create,
+            model=model,
             messages=messages,
             temperature=0.1,  # Low temperature for consistent, factual responses
-            max_tokens=1000,  # Reasonable limit for responses
+            max_tokens=max_tokens,
             top_p=0.9
         )
         
         choice = response.choices[0].message
         usage = response.usage
+        cached_prompt_tokens = get_cached_prompt_tokens(usage)
         
         processing_time = int((time.time() - start_time) * 1000)  # Convert to milliseconds
         
         result = {
             "answer": choice.content.strip(),
             "prompt_tokens": usage.prompt_tokens,
+            "cached_prompt_tokens": cached_prompt_tokens,
             "completion_tokens": usage.completion_tokens,
             "total_tokens": usage.total_tokens,
-            "model": settings.openai_chat_model,
+            "model": model,
+            "cost_usd": calculate_cost(
+                usage.prompt_tokens, usage.completion_tokens, cached_prompt_tokens, model=model
+            ),
+            "prompt_prefix_hash": prompt_prefix_hash(context),
             "processing_time_ms": processing_time
         }
         
         logger.info("Answer generated", 
                    tokens_used=usage.total_tokens, 
+                   cached_prompt_tokens=cached_prompt_tokens,
                    processing_time_ms=processing_time)
         
         return result
         
+    except CircuitOpenError:
+        raise
     except RateLimitError as e:
         logger.error("Rate limit exceeded for LLM", error=str(e))
         raise OpenAIError(f"Rate limit exceeded: {e}", "rate_limit")
@@ -162,13 +378,26 @@ async def answer_with_context(question: str, chunks: List[Dict]) -> Dict:
         raise OpenAIError(f"Unexpected error: {e}", "unknown")
 
 
-def calculate_cost(prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+def get_cached_prompt_tokens(usage) -> int:
+    """Extract provider-cached prompt tokens from a usage payload (0 if not reported)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+
+def calculate_cost(
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_prompt_tokens: int = 0,
+    model: Optional[str] = None
+) -> Optional[float]:
     """
     Calculate cost based on token usage.
     
     Args:
-        prompt_tokens: Number of prompt tokens
+        prompt_tokens: Number of prompt tokens (including cached ones)
         completion_tokens: Number of completion tokens
+        cached_prompt_tokens: Number of prompt tokens served from the provider cache
+        model: Model that served the request; the router's fast model has its own prices
         
     Returns:
         Cost in USD or None if pricing not configured
@@ -176,10 +405,117 @@ def calculate_cost(prompt_tokens: int, completion_tokens: int) -> Optional[float
     if not settings.price_prompt_per_1k and not settings.price_completion_per_1k:
         return None
     
-    prompt_cost = (prompt_tokens / 1000.0) * settings.price_prompt_per_1k
-    completion_cost = (completion_tokens / 1000.0) * settings.price_completion_per_1k
+    if settings.model_router_enabled and model == settings.openai_fast_model and model != settings.openai_chat_model:
+        prompt_price = settings.price_fast_prompt_per_1k
+        cached_price = settings.price_fast_cached_prompt_per_1k
+        completion_price = settings.price_fast_completion_per_1k
+    else:
+        prompt_price = settings.price_prompt_per_1k
+        cached_price = settings.price_cached_prompt_per_1k
+        completion_price = settings.price_completion_per_1k
+    
+    cached_prompt_tokens = min(cached_prompt_tokens or 0, prompt_tokens)
+    uncached_prompt_tokens = prompt_tokens - cached_prompt_tokens
+    
+    prompt_cost = (uncached_prompt_tokens / 1000.0) * prompt_price
+    cached_cost = (cached_prompt_tokens / 1000.0) * cached_price
+    completion_cost = (completion_tokens / 1000.0) * completion_price
+    
+    return round(prompt_cost + cached_cost + completion_cost, 4)
+
+
+def escalation_reason(chunks: List[Dict]) -> Optional[str]:
+    """
+    Check retrieval-side confidence signals that call for the strong model.
+    
+    Args:
+        chunks: Retrieved chunks
+        
+    Returns:
+        Reason string if the question should skip the fast model, otherwise None
+    """
+    ranked = sorted(chunks, key=lambda c: c.get("cosine_similarity", 0), reverse=True)
+    if not ranked:
+        return None
+    
+    if ranked[0].get("cosine_similarity", 0) < settings.router_min_similarity:
+        return ROUTE_REASON_LOW_SIMILARITY
+    
+    # Near-tied top chunks from different documents: sources may disagree
+    if len(ranked) > 1 and ranked[0].get("url") != ranked[1].get("url"):
+        margin = ranked[0].get("cosine_similarity", 0) - ranked[1].get("cosine_similarity", 0)
+        if margin < settings.router_disagreement_margin:
+            return ROUTE_REASON_DISAGREEMENT
+    
+    return None
+
+
+def is_not_found_answer(answer: str) -> bool:
+    """Check whether the model answered with the "not found" sentinel."""
+    answer = answer.lower()
+    return any(sentinel in answer for sentinel in NOT_FOUND_SENTINELS)
+
+
+def route_tier(response: Dict) -> Dict:
+    """Per-tier routing record stored in QueryLog.route_tiers."""
+    return {
+        "model": response["model"],
+        "latency_ms": response["processing_time_ms"],
+        "prompt_tokens": response["prompt_tokens"],
+        "completion_tokens": response["completion_tokens"],
+        "cost_usd": response["cost_usd"],
+    }
+
+
+async def route_answer(question: str, chunks: List[Dict]) -> Dict:
+    """
+    Generate an answer through the model cascade.
+    
+    The fast model answers first; the strong model (settings.openai_chat_model)
+    is used directly when retrieval confidence is low, or as an escalation when
+    the fast model reports that it found nothing.
+    
+    Args:
+        question: User question
+        chunks: Retrieved document chunks
+        
+    Returns:
+        answer_with_context() result of the final tier, with token counts, cost
+        and latency summed over all tiers plus route, route_reason and route_tiers
+    """
+    if not settings.model_router_enabled:
+        response = await answer_with_context(question, chunks)
+        return {**response, "route": ROUTE_DIRECT, "route_reason": None, "route_tiers": [route_tier(response)]}
+    
+    reason = escalation_reason(chunks)
+    if reason:
+        response = await answer_with_context(question, chunks, model=settings.openai_chat_model)
+        logger.info("Routed to strong model", reason=reason, model=response["model"])
+        return {**response, "route": ROUTE_STRONG, "route_reason": reason, "route_tiers": [route_tier(response)]}
+    
+    fast = await answer_with_context(question, chunks, model=settings.openai_fast_model)
+    if not is_not_found_answer(fast["answer"]):
+        logger.info("Answered by fast model", model=fast["model"])
+        return {**fast, "route": ROUTE_FAST, "route_reason": None, "route_tiers": [route_tier(fast)]}
+    
+    strong = await answer_with_context(question, chunks, model=settings.openai_chat_model)
+    tiers = [route_tier(fast), route_tier(strong)]
+    logger.info("Escalated to strong model", reason=ROUTE_REASON_NOT_FOUND,
+               fast_latency_ms=fast["processing_time_ms"], strong_latency_ms=strong["processing_time_ms"])
     
-    return round(prompt_cost + completion_cost, 4)
+    costs = [t["cost_usd"] for t in tiers if t["cost_usd"] is not None]
+    return {
+        **strong,
+        "prompt_tokens": fast["prompt_tokens"] + strong["prompt_tokens"],
+        "cached_prompt_tokens": fast["cached_prompt_tokens"] + strong["cached_prompt_tokens"],
+        "completion_tokens": fast["completion_tokens"] + strong["completion_tokens"],
+        "total_tokens": fast["total_tokens"] + strong["total_tokens"],
+        "cost_usd": round(sum(costs), 4) if costs else None,
+        "processing_time_ms": fast["processing_time_ms"] + strong["processing_time_ms"],
+        "route": ROUTE_ESCALATED,
+        "route_reason": ROUTE_REASON_NOT_FOUND,
+        "route_tiers": tiers,
+    }
 
 
 async def generate_summary(text: str, max_length: int = 200) -> str:
@@ -0,0 +1,215 @@
+"""
+query_logs partition maintenance: monthly partitions, daily rollups and retention.
+
+query_logs is range-partitioned by month of ts (query_logs_pYYYYMM, UTC), with
+a DEFAULT partition (query_logs_default) catching rows outside every month, so
+an insert never fails for lack of a partition. Each pass creates the partitions
+for the current month and QUERY_LOG_PARTITIONS_AHEAD months ahead (moving their
+rows out of the default partition), refreshes query_log_daily for yesterday and
+today, and drops partitions older than QUERY_LOG_RETENTION_MONTHS after rolling
+them up one last time. Rollups are kept forever; they are a few rows per user and day. The
+pass also reconciles the dashboard counters (app/stats.py).
+"""
+import asyncio
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from .config import settings
+from .db import engine
+from .logger import get_logger
+from .stats import reconcile_counters
+from . import metrics
+
+logger = get_logger(__name__)
+
+PARTITION_NAME = re.compile(r"^query_logs_p(\d{4})(\d{2})$")
+DEFAULT_PARTITION = "query_logs_default"
+
+# pg_try_advisory_xact_lock key, so only one process maintains partitions at a time
+MAINTENANCE_LOCK_KEY = 0x71_6C_6F_67  # "qlog"
+
+ROLLUP_SQL = text("""
+    INSERT INTO query_log_daily (
+        day, telegram_user_id, role, queries, failed, prompt_tokens, cached_prompt_tokens,
+        completion_tokens, cost_usd, latency_avg_ms, latency_p50_ms, latency_p95_ms, updated_at
+    )
+    SELECT
+        (q.ts AT TIME ZONE 'UTC')::date,
+        COALESCE(q.telegram_user_id, 0),
+        COALESCE(u.role, ''),
+        count(*),
+        count(*) FILTER (WHERE NOT q.has_answer),
+        COALESCE(sum(q.prompt_tokens), 0),
+        COALESCE(sum(q.cached_prompt_tokens), 0),
+        COALESCE(sum(q.completion_tokens), 0),
+        COALESCE(sum(q.cost_usd), 0),
+        round(avg(q.processing_time_ms)),
+        round(percentile_cont(0.5) WITHIN GROUP (ORDER BY q.processing_time_ms)),
+        round(percentile_cont(0.95) WITHIN GROUP (ORDER BY q.processing_time_ms)),
+        NOW()
+    FROM query_logs q
+    LEFT JOIN telegram_users u ON u.user_id = q.telegram_user_id
+    WHERE q.ts >= :start AND q.ts < :end
+    GROUP BY 1, 2, 3
+""")
+
+
+def month_start(day: date, months: int = 0) -> date:
+    """First day of the month `months` after the month of `day`."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"query_logs_p{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month a partition covers, from its name; None for tables not named by this module."""
+    match = PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def utc_midnight(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+async def create_partition(conn: AsyncConnection, month: date) -> bool:
+    """
+    Create one monthly partition unless it exists; returns whether it was created.
+
+    Rows of that month already in the default partition would make a plain
+    CREATE ... PARTITION OF fail, so the table is created detached, the rows
+    are moved into it and it is attached.
+    """
+    name = partition_name(month)
+    exists = await conn.execute(text("SELECT to_regclass(:name)"), {"name": name})
+    if exists.scalar() is not None:
+        return False
+    bounds = {"start": utc_midnight(month), "end": utc_midnight(month_start(month, 1))}
+    await conn.execute(text(f"CREATE TABLE {name} (LIKE query_logs INCLUDING DEFAULTS)"))
+    moved = await conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE ts >= :start AND ts < :end RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds)
+    # DDL takes no bind parameters; bounds are formatted dates
+    await conn.execute(text(
+        f"ALTER TABLE query_logs ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+    ))
+    logger.info("Query log partition created", partition=name, moved_rows=moved.rowcount)
+    return True
+
+
+async def create_partitions(conn: AsyncConnection) -> List[str]:
+    """
+    Create the default partition, this month's partition and
+    QUERY_LOG_PARTITIONS_AHEAD more; returns the monthly names.
+    """
+    # Processes starting together would race between the existence check and CREATE
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF query_logs DEFAULT"))
+    this_month = month_start(datetime.now(timezone.utc).date())
+    names = []
+    for offset in range(settings.query_log_partitions_ahead + 1):
+        month = month_start(this_month, offset)
+        await create_partition(conn, month)
+        names.append(partition_name(month))
+    return names
+
+
+async def ensure_query_log_partitions() -> None:
+    """Create upcoming partitions (startup, after init_db; inserts fail without one)."""
+    async with engine.begin() as conn:
+        names = await create_partitions(conn)
+    logger.info("Query log partitions ensured", through=names[-1])
+
+
+async def rollup_days(conn: AsyncConnection, start: date, end: date) -> int:
+    """Recompute query_log_daily for UTC days in [start, end); returns rows written."""
+    await conn.execute(
+        text("DELETE FROM query_log_daily WHERE day >= :start AND day < :end"),
+        {"start": start, "end": end},
+    )
+    result = await conn.execute(ROLLUP_SQL, {"start": utc_midnight(start), "end": utc_midnight(end)})
+    return result.rowcount
+
+
+async def list_partitions(conn: AsyncConnection) -> List[Tuple[str, date]]:
+    """(name, month) of every monthly query_logs partition, oldest first (not the default one)."""
+    result = await conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'query_logs'
+    """))
+    partitions = [(name, partition_month(name)) for name in result.scalars().all()]
+    return sorted((name, month) for name, month in partitions if month is not None)
+
+
+async def drop_expired_partitions(conn: AsyncConnection) -> List[str]:
+    """
+    Roll up, detach and drop partitions that ended more than
+    QUERY_LOG_RETENTION_MONTHS ago (0 keeps everything).
+    """
+    if settings.query_log_retention_months <= 0:
+        return []
+    cutoff = month_start(datetime.now(timezone.utc).date(), -settings.query_log_retention_months)
+    dropped = []
+    for name, month in await list_partitions(conn):
+        if month >= cutoff:
+            break
+        rows = await rollup_days(conn, month, month_start(month, 1))
+        await conn.execute(text(f"ALTER TABLE query_logs DETACH PARTITION {name}"))
+        await conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+        logger.info("Query log partition dropped", partition=name, rollup_rows=rows)
+
+    # Late or replayed rows of months already dropped land in the default partition;
+    # their days were rolled up with the partition, so they are discarded
+    stale = await conn.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE ts < :cutoff"), {"cutoff": utc_midnight(cutoff)}
+    )
+    if stale.rowcount:
+        logger.info("Expired query logs removed from the default partition", rows=stale.rowcount)
+    return dropped
+
+
+async def maintain_query_logs() -> Optional[dict]:
+    """One maintenance pass; None if another process holds the lock."""
+    start = time.perf_counter()
+    async with engine.begin() as conn:
+        locked = await conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+        if not locked.scalar():
+            return None
+        created = await create_partitions(conn)
+        today = datetime.now(timezone.utc).date()
+        # Yesterday too, so late rows of the previous day are counted once it is over
+        rolled_up = await rollup_days(conn, today - timedelta(days=1), today + timedelta(days=1))
+        dropped = await drop_expired_partitions(conn)
+    await reconcile_counters()
+
+    metrics.incr("log_maintenance.runs")
+    metrics.incr("log_maintenance.partitions_dropped", len(dropped))
+    metrics.observe("log_maintenance_ms", (time.perf_counter() - start) * 1000)
+    summary = {"partitions_through": created[-1], "rollup_rows": rolled_up, "dropped": dropped}
+    logger.info("Query log maintenance completed", **summary)
+    return summary
+
+
+async def run_log_maintenance() -> None:
+    """Maintain query_logs every LOG_MAINTENANCE_INTERVAL_S until cancelled (lifespan task)."""
+    logger.info("Query log maintenance started", interval_s=settings.log_maintenance_interval_s)
+    while True:
+        try:
+            await maintain_query_logs()
+        except Exception as e:
+            metrics.incr("log_maintenance.errors")
+            logger.error("Query log maintenance failed", error=str(e))
+        await asyncio.sleep(settings.log_maintenance_interval_s)
@@ -0,0 +1,94 @@
+"""In-process performance metrics: counters, latency windows and event-loop lag."""
+import asyncio
+import math
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Recent samples kept per histogram
+SAMPLE_WINDOW = 10000
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile (p in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(p / 100.0 * len(ordered))))
+    return round(ordered[rank - 1], 1)
+
+
+class Histogram:
+    """Bounded window of recent samples plus lifetime count, total and max."""
+
+    def __init__(self, window: int = SAMPLE_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> Dict:
+        values = list(self.samples)
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 2) if self.count else None,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": round(self.max, 1),
+        }
+
+
+counters: Dict[str, int] = {}
+gauges: Dict[str, float] = {}
+histograms: Dict[str, Histogram] = {}
+
+
+def incr(name: str, amount: int = 1) -> None:
+    """Increment a counter."""
+    counters[name] = counters.get(name, 0) + amount
+
+
+def set_gauge(name: str, value: float) -> None:
+    """Set a point-in-time value (queue depth, in-flight requests)."""
+    gauges[name] = value
+
+
+def observe(name: str, value: float) -> None:
+    """Record a sample (milliseconds by convention) in a histogram."""
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = Histogram()
+    histogram.observe(value)
+
+
+def snapshot() -> Dict:
+    """All counters and histogram summaries."""
+    return {
+        "counters": dict(counters),
+        "gauges": dict(gauges),
+        "histograms": {name: h.snapshot() for name, h in histograms.items()},
+    }
+
+
+def reset() -> None:
+    """Clear counters and histograms (used between benchmark runs); gauges stay current."""
+    counters.clear()
+    histograms.clear()
+
+
+async def monitor_event_loop_lag(interval: float = 0.1) -> None:
+    """Sample event-loop lag: how late a periodic sleep wakes up."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        observe("event_loop_lag_ms", max(0.0, (loop.time() - expected) * 1000))
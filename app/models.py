@@ -3,8 +3,8 @@ import os
 import uuid
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, DateTime, BigInteger, Numeric, Index, Boolean, ARRAY
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, DateTime, Date, BigInteger, Numeric, Index, Boolean, ARRAY, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from pgvector.sqlalchemy import Vector
 from .db import Base
@@ -42,6 +42,8 @@ class Chunk(Base):
     chunk_index = Column(Integer, nullable=False)
     heading_path = Column(Text)
     content = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=True)  # Content tokens, computed once at ingest
+    content_hash = Column(Text, nullable=True)  # SHA-256 of content, matches rows across re-syncs
     embedding = Column(Vector(EMBEDDING_DIM), nullable=True)
     allowed_roles = Column(ARRAY(String), nullable=True)  # Roles that can access this chunk
     created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
@@ -61,21 +63,29 @@ class Chunk(Base):
 
 
 class QueryLog(Base):
-    """Query log for tracking usage and costs."""
+    """Query log for tracking usage and costs, partitioned by month of ts (see app/log_maintenance.py)."""
     __tablename__ = "query_logs"
     
+    # The partition key has to be part of the primary key
     id = Column(BigInteger, primary_key=True, autoincrement=True)
-    ts = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow, index=True)
+    ts = Column(DateTime(timezone=True), primary_key=True, nullable=False, default=datetime.utcnow, index=True)
     telegram_user_id = Column(BigInteger, nullable=True, index=True)
     question = Column(Text, nullable=False)
     answer = Column(Text, nullable=False)
     prompt_tokens = Column(Integer, nullable=True)
+    cached_prompt_tokens = Column(Integer, nullable=True)  # Prompt tokens served from provider cache
+    prompt_prefix_hash = Column(String, nullable=True)  # Hash of system prompt + context prefix
     completion_tokens = Column(Integer, nullable=True)
     model = Column(String, nullable=True)
     cost_usd = Column(Numeric(10, 4), nullable=True)
+    route = Column(String, nullable=True)  # Model router outcome: direct, fast, strong, escalated
+    route_reason = Column(String, nullable=True)  # Why the strong model was used
+    route_tiers = Column(JSONB, nullable=True)  # Per-tier model, latency, tokens and cost
     processing_time_ms = Column(Integer, nullable=True)  # Processing time in milliseconds
     has_answer = Column(Boolean, default=True, nullable=False, index=True)  # Track if bot found answer
     
+    __table_args__ = {"postgresql_partition_by": "RANGE (ts)"}
+    
     def __repr__(self) -> str:
         return f"<QueryLog(id={self.id}, user={self.telegram_user_id}, tokens={self.prompt_tokens})>"
 
@@ -88,17 +98,40 @@ class Feedback(Base):
     ts = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow, index=True)
     telegram_user_id = Column(BigInteger, nullable=False, index=True)
     message_id = Column(BigInteger, nullable=True)
-    query_log_id = Column(BigInteger, ForeignKey("query_logs.id", ondelete="SET NULL"), nullable=True)
+    # No foreign key: query_logs is partitioned and its rows expire with their partition
+    query_log_id = Column(BigInteger, nullable=True)
     rating = Column(String, nullable=False)  # 'good' or 'bad'
     comment = Column(Text, nullable=True)
     
     # Relationships
-    query_log = relationship("QueryLog", foreign_keys=[query_log_id])
+    query_log = relationship("QueryLog", primaryjoin="foreign(Feedback.query_log_id) == QueryLog.id", viewonly=True)
     
     def __repr__(self) -> str:
         return f"<Feedback(id={self.id}, user={self.telegram_user_id}, rating={self.rating})>"
 
 
+class QueryLogDaily(Base):
+    """Daily rollup of query_logs per user and role, kept after raw partitions expire."""
+    __tablename__ = "query_log_daily"
+    
+    day = Column(Date, primary_key=True)  # UTC day
+    telegram_user_id = Column(BigInteger, primary_key=True)  # 0 for queries without a user
+    role = Column(String, primary_key=True)  # Role at rollup time, '' if unknown
+    queries = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)  # has_answer = false
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    cached_prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
+    cost_usd = Column(Numeric(12, 4), nullable=False, default=0)
+    latency_avg_ms = Column(Integer, nullable=True)
+    latency_p50_ms = Column(Integer, nullable=True)
+    latency_p95_ms = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self) -> str:
+        return f"<QueryLogDaily(day={self.day}, user={self.telegram_user_id}, queries={self.queries})>"
+
+
 class TelegramUser(Base):
     """Telegram user model for access control."""
     __tablename__ = "telegram_users"
@@ -131,3 +164,99 @@ class NotionPage(Base):
     
     def __repr__(self) -> str:
         return f"<NotionPage(id={self.id}, title='{self.title}', status='{self.status}')>"
+
+
+class SyncJob(Base):
+    """Background Notion sync job with per-page progress checkpoints."""
+    __tablename__ = "sync_jobs"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)  # ingest (configured pages), page (one managed NotionPage)
+    params = Column(JSONB, nullable=True)  # {"full": bool, "page_ids": [...]} or {"notion_page_id": int}
+    status = Column(String, default="queued", nullable=False, index=True)  # queued, running, completed, failed
+    total = Column(Integer, nullable=True)  # Pages to process
+    done = Column(Integer, default=0, nullable=False)  # Pages finished so far
+    completed_pages = Column(ARRAY(String), nullable=True)  # Checkpoint: pages a resumed job skips
+    report = Column(JSONB, nullable=True)  # Updated, skipped and failed pages
+    error = Column(Text, nullable=True)
+    lease_owner = Column(String, nullable=True)  # host:pid of the worker running the job
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self) -> str:
+        return f"<SyncJob(id={self.id}, kind='{self.kind}', status='{self.status}', done={self.done}/{self.total})>"
+
+
+class IngestItem(Base):
+    """One page of an ingest job, claimed by workers with FOR UPDATE SKIP LOCKED."""
+    __tablename__ = "ingest_items"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    job_id = Column(Integer, ForeignKey("sync_jobs.id", ondelete="CASCADE"), nullable=True)
+    page_id = Column(String, nullable=False)
+    full_sync = Column(Boolean, default=False, nullable=False)  # Re-ingest even if unchanged
+    status = Column(String, default="pending", nullable=False)  # pending, leased, done, failed
+    outcome = Column(String, nullable=True)  # updated, skipped, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    lease_owner = Column(String, nullable=True)  # host:pid of the worker holding the lease
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    available_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)  # Retry backoff
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("idx_ingest_items_claim", "status", "available_at"),
+        Index("uq_ingest_items_job_page", "job_id", "page_id", unique=True),
+    )
+    
+    def __repr__(self) -> str:
+        return f"<IngestItem(id={self.id}, page_id='{self.page_id}', status='{self.status}', attempts={self.attempts})>"
+
+
+class PageSnapshot(Base):
+    """Compressed raw Notion page object and block tree, for re-chunking without refetching."""
+    __tablename__ = "page_snapshots"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    page_id = Column(String, nullable=False)
+    last_edited = Column(DateTime(timezone=True), nullable=False)  # Notion last_edited_time of the snapshot
+    content_hash = Column(Text, nullable=False)  # SHA-256 of the uncompressed JSON
+    data = Column(LargeBinary, nullable=False)  # zlib-compressed {"page": ..., "tree": ...}
+    raw_bytes = Column(Integer, nullable=False)
+    stored_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("uq_page_snapshots_page_edited", "page_id", "last_edited", unique=True),
+    )
+    
+    def __repr__(self) -> str:
+        return f"<PageSnapshot(page_id='{self.page_id}', last_edited={self.last_edited}, stored_bytes={self.stored_bytes})>"
+
+
+class StatCounter(Base):
+    """Dashboard counter, bumped in the transaction that changes what it counts (see app/stats.py)."""
+    __tablename__ = "stats_counters"
+    
+    name = Column(String, primary_key=True)  # documents, chunks, queries, feedback_good, cost_usd, ...
+    value = Column(Numeric(20, 4), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self) -> str:
+        return f"<StatCounter(name='{self.name}', value={self.value})>"
+
+
+class SyncCheckpoint(Base):
+    """Named high-water mark of a periodic sync task, e.g. the start of the last successful change check."""
+    __tablename__ = "sync_checkpoints"
+    
+    name = Column(String, primary_key=True)
+    checked_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self) -> str:
+        return f"<SyncCheckpoint(name='{self.name}', checked_at={self.checked_at})>"
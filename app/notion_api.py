@@ -0,0 +1,114 @@
+"""Shared Notion client: one connection pool, a process-wide rate limiter and 429-aware retries."""
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable
+import httpx
+from notion_client import AsyncClient
+from notion_client.errors import APIResponseError, RequestTimeoutError
+from .config import settings
+from .logger import get_logger
+from .circuit_breaker import notion_breaker
+from . import metrics
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket shared by every caller: `rate` requests per second on average,
+    bursts of up to `capacity`. Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds` (the server asked us to back off)."""
+        self._tokens = 0.0
+        self._updated = max(self._updated, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._updated:
+                    await asyncio.sleep(self._updated - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def retry_after_s(e: APIResponseError, default: float = 1.0) -> float:
+    """Seconds from the Retry-After header of a 429, if Notion sent one."""
+    headers = getattr(e, "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after", default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def backoff_s(attempt: int) -> float:
+    """Exponential backoff with full jitter: up to 0.5s, 1s, 2s, ... capped at 30s."""
+    return random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+
+
+# One pooled HTTP client for every Notion call site (sync, page management, scripts)
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=settings.notion_max_connections,
+        max_keepalive_connections=settings.notion_max_connections,
+    ),
+)
+notion = AsyncClient(client=http_client, **settings.get_notion_client_options())
+rate_limiter = TokenBucket(settings.notion_rate_per_s, settings.notion_burst)
+
+
+async def notion_call(func: Callable[..., Awaitable[Any]], **kwargs) -> Any:
+    """
+    Call a notion_client endpoint (e.g. notion.pages.retrieve) under the shared limiter.
+
+    A 429 pauses the whole bucket for Retry-After seconds, so every caller backs
+    off together; 5xx responses and timeouts are retried with exponential
+    backoff. Calls also go through the Notion circuit breaker.
+    """
+    for attempt in range(settings.notion_max_retries + 1):
+        start = time.perf_counter()
+        await rate_limiter.acquire()
+        metrics.observe("notion_throttle_ms", (time.perf_counter() - start) * 1000)
+        metrics.incr("notion.requests")
+
+        try:
+            return await notion_breaker.call(func, **kwargs)
+        except APIResponseError as e:
+            if attempt == settings.notion_max_retries or not (e.status == 429 or e.status >= 500):
+                raise
+            if e.status == 429:
+                delay = retry_after_s(e)
+                metrics.incr("notion.rate_limited")
+                rate_limiter.pause(delay)
+                logger.warning("Notion rate limited, pausing", retry_after_s=delay, attempt=attempt + 1)
+                continue
+            delay = backoff_s(attempt)
+            logger.warning("Notion server error, retrying", status=e.status, delay_s=round(delay, 2), attempt=attempt + 1)
+        except (RequestTimeoutError, httpx.TransportError) as e:
+            if attempt == settings.notion_max_retries:
+                raise
+            delay = backoff_s(attempt)
+            logger.warning("Notion request failed, retrying", error=str(e), delay_s=round(delay, 2), attempt=attempt + 1)
+
+        metrics.incr("notion.retries")
+        await asyncio.sleep(delay)
+
+
+async def close_notion() -> None:
+    """Close the pooled HTTP connections."""
+    await http_client.aclose()
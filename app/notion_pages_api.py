@@ -1,7 +1,9 @@
 """API для управления отдельными страницами Notion."""
+import asyncio
+import json
 from typing import Optional
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel
@@ -9,13 +11,22 @@ import re
 from .db import get_db
 from .models import NotionPage
 from .logger import get_logger
-from .notion_sync import upsert_page
-from notion_client import AsyncClient
-from .config import settings
+from .sync_jobs import (
+    JOB_PAGE,
+    TERMINAL_STATUSES,
+    enqueue_job,
+    find_active_job,
+    get_job,
+    job_to_dict,
+    list_jobs,
+)
+from .notion_api import notion, notion_call
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/api")
-notion = AsyncClient(auth=settings.notion_token)
+
+# How often the SSE stream re-reads job progress
+SSE_POLL_INTERVAL_S = 1.0
 
 
 class NotionPageCreate(BaseModel):
@@ -100,7 +111,7 @@ async def create_notion_page(data: NotionPageCreate, db: AsyncSession = Depends(
         # Try to get page title from Notion
         title = None
         try:
-            page_data = await notion.pages.retrieve(page_id=page_id)
+            page_data = await notion_call(notion.pages.retrieve, page_id=page_id)
             title_prop = page_data["properties"].get("Name") or page_data["properties"].get("title")
             if title_prop:
                 title = "".join([seg.get("plain_text", "") for seg in title_prop.get("title", [])]).strip()
@@ -142,7 +153,7 @@ async def create_notion_page(data: NotionPageCreate, db: AsyncSession = Depends(
 
 @router.post("/notion-pages/{page_id}/sync")
 async def sync_notion_page(page_id: int, db: AsyncSession = Depends(get_db)):
-    """Sync specific notion page."""
+    """Queue a background sync of a notion page; progress via /api/sync-jobs/{job_id}."""
     try:
         # Get page from DB
         result = await db.execute(select(NotionPage).where(NotionPage.id == page_id))
@@ -151,55 +162,35 @@ async def sync_notion_page(page_id: int, db: AsyncSession = Depends(get_db)):
         if not page:
             raise HTTPException(status_code=404, detail="Page not found")
         
-        # Update status to syncing
-        page.status = "syncing"
-        page.error_message = None
-        await db.commit()
-        
-        try:
-            # Get page metadata from Notion
-            page_data = await notion.pages.retrieve(page_id=page.page_id)
-            last_edited_str = page_data.get("last_edited_time")
-            last_edited = datetime.fromisoformat(last_edited_str.replace("Z", "+00:00")) if last_edited_str else datetime.utcnow()
-            
-            # Update title if changed
-            title_prop = page_data["properties"].get("Name") or page_data["properties"].get("title")
-            if title_prop:
-                new_title = "".join([seg.get("plain_text", "") for seg in title_prop.get("title", [])]).strip()
-                if new_title:
-                    page.title = new_title
-            
-            # Sync page content with allowed roles
-            await upsert_page(db, page.page_id, last_edited, allowed_roles=page.allowed_roles)
-            
-            # Update status to synced
-            page.status = "synced"
-            page.last_synced = datetime.utcnow()
-            await db.commit()
-            await db.refresh(page)
-            
-            logger.info("Notion page synced successfully", page_id=page.page_id)
-            
-            return {
-                "id": page.id,
-                "page_url": page.page_url,
-                "page_id": page.page_id,
-                "title": page.title,
-                "allowed_roles": page.allowed_roles,
-                "status": page.status,
-                "last_synced": page.last_synced.isoformat() if page.last_synced else None,
-                "error_message": page.error_message,
-                "created_at": page.created_at.isoformat(),
-                "updated_at": page.updated_at.isoformat(),
-            }
-            
-        except Exception as e:
-            # Update status to error
-            page.status = "error"
-            page.error_message = str(e)
+        params = {"notion_page_id": page.id}
+        job = await find_active_job(JOB_PAGE, params)
+        if job is None:
+            # Committed before the job exists, so the job's final synced/error always wins
+            page.status = "syncing"
+            page.error_message = None
             await db.commit()
-            logger.error("Error syncing notion page", page_id=page.page_id, error=str(e))
-            raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
+            try:
+                job = await enqueue_job(JOB_PAGE, params)
+            except Exception as e:
+                page.status = "error"
+                page.error_message = f"Failed to queue sync: {e}"
+                await db.commit()
+                raise
+        await db.refresh(page)
+        
+        return {
+            "id": page.id,
+            "page_url": page.page_url,
+            "page_id": page.page_id,
+            "title": page.title,
+            "allowed_roles": page.allowed_roles,
+            "status": page.status,
+            "last_synced": page.last_synced.isoformat() if page.last_synced else None,
+            "error_message": page.error_message,
+            "created_at": page.created_at.isoformat(),
+            "updated_at": page.updated_at.isoformat(),
+            "job_id": job.id,
+        }
             
     except HTTPException:
         raise
@@ -208,6 +199,48 @@ async def sync_notion_page(page_id: int, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Failed to sync page")
 
 
+@router.get("/sync-jobs")
+async def get_sync_jobs(limit: int = 50):
+    """Recent background sync jobs."""
+    return [job_to_dict(job) for job in await list_jobs(limit)]
+
+
+@router.get("/sync-jobs/{job_id}")
+async def get_sync_job(job_id: int):
+    """Status and progress of a sync job."""
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+
+@router.get("/sync-jobs/{job_id}/events")
+async def sync_job_events(job_id: int, request: Request):
+    """Server-sent events with the job's state on every change, until it finishes."""
+    if await get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        last = None
+        while not await request.is_disconnected():
+            job = await get_job(job_id)
+            if job is None:
+                return
+            payload = json.dumps(job_to_dict(job))
+            if payload != last:
+                last = payload
+                yield f"data: {payload}\n\n"
+            if job.status in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(SSE_POLL_INTERVAL_S)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.delete("/notion-pages/{page_id}")
 async def delete_notion_page(page_id: int, db: AsyncSession = Depends(get_db)):
     """Delete notion page from management (doesn't delete from documents)."""
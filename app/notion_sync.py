@@ -1,117 +1,91 @@
 """Notion synchronization with improved error handling and chunking."""
 import asyncio
+import hashlib
+import uuid
 from datetime import datetime
 from typing import List, Tuple, Dict, Optional
-from notion_client import AsyncClient
 from notion_client.errors import APIResponseError, RequestTimeoutError
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, insert, update, text
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 import os
 from .config import settings
 from .logger import get_logger
-from .exceptions import NotionAPIError
+from .exceptions import NotionAPIError, CircuitOpenError
+from .notion_api import notion, notion_call
 from .models import Document, Chunk
-from .embeddings import embed_text_batch
+from .embeddings import embed_texts
+from .tokens import count_tokens
+from .page_cache import pack_snapshot, save_snapshot
+from .chunker import chunk_blocks, rich_text_to_plain
+from .stats import bump, DOCUMENTS, CHUNKS
 
 logger = get_logger(__name__)
 
-notion = AsyncClient(auth=settings.notion_token)
-
 # Parse database IDs from settings
 DATABASE_IDS = settings.get_database_ids()
 
+# First key of the two-key pg_advisory_xact_lock taken per page by write_page()
+PAGE_LOCK_CLASS = 0x70_61_67_65  # "page"
 
-def rich_text_to_plain(rt: List[dict]) -> str:
-    """Convert Notion rich text to plain text."""
-    if not rt:
-        return ""
-    return "".join([seg.get("plain_text", "") for seg in rt]).strip()
 
+async def list_children(block_id: str) -> List[dict]:
+    """All child blocks of a page or block, following next_cursor past 100 results."""
+    children: List[dict] = []
+    cursor = None
+    while True:
+        params = {"block_id": block_id, "page_size": 100}
+        if cursor:
+            params["start_cursor"] = cursor
+        response = await notion_call(notion.blocks.children.list, **params)
+        children.extend(response.get("results", []))
+        cursor = response.get("next_cursor")
+        if not response.get("has_more") or not cursor:
+            return children
 
-async def extract_page_text(page_id: str) -> Tuple[str, str, List[Tuple[str, str]]]:
+
+async def fetch_block_tree(block_id: str, semaphore: asyncio.Semaphore, strict: bool = False) -> List[dict]:
     """
-    Extract text content from a Notion page.
+    Child blocks of block_id, with nested children loaded into block["children"].
     
-    Returns:
-        Tuple of (title, url, [(heading_path, chunk_text), ...])
+    Sibling subtrees are fetched concurrently; the semaphore bounds requests in
+    flight across the whole tree, and results keep Notion's order regardless of
+    completion order. A failing subtree is logged and left empty, except with
+    strict=True (the page root), where the error propagates.
     """
     try:
-        logger.info("Extracting page content", page_id=page_id)
-        
-        # Get page metadata
-        page = await notion.pages.retrieve(page_id=page_id)
-        title_prop = page["properties"].get("Name") or page["properties"].get("title")
-        title = rich_text_to_plain(title_prop.get("title", [])) if title_prop else "Untitled"
-        url = page.get("url", "")
-        
-        # Extract blocks content
-        blocks = await notion.blocks.children.list(block_id=page_id)
-        texts: List[Tuple[str, str]] = []  # (heading_path, text)
-        heading_stack: List[str] = []
-        
-        def flush_paragraph(buf: List[str], path: str):
-            """Flush accumulated paragraph text."""
-            chunk = "\n".join([x for x in buf if x])
-            if chunk.strip():
-                texts.append((path, chunk.strip()))
-        
-        async def walk_blocks(block_id: str, heading_path: List[str]):
-            """Recursively walk through blocks."""
-            try:
-                results = await notion.blocks.children.list(block_id=block_id)
-                results = results.get("results", [])
-                para_buf: List[str] = []
-                
-                for block in results:
-                    block_type = block.get("type")
-                    
-                    if block_type in ("heading_1", "heading_2", "heading_3"):
-                        # Flush accumulated paragraph
-                        flush_paragraph(para_buf, " > ".join(heading_path))
-                        para_buf.clear()
-                        
-                        # Extract heading text
-                        txt = rich_text_to_plain(block[block_type].get("rich_text", []))
-                        if not txt:
-                            continue
-                            
-                        # Update heading path based on level
-                        if block_type == "heading_1":
-                            new_path = [txt]
-                        elif block_type == "heading_2":
-                            new_path = heading_path[:1] + [txt]
-                        else:  # heading_3
-                            new_path = heading_path[:2] + [txt]
-                        
-                        heading_path = new_path
-                        
-                    elif block_type in ("paragraph", "bulleted_list_item", "numbered_list_item", "quote", "callout"):
-                        # Accumulate paragraph text
-                        txt = rich_text_to_plain(block[block_type].get("rich_text", []))
-                        if txt:
-                            para_buf.append(txt)
-                    
-                    # Recursively process children
-                    if block.get("has_children"):
-                        await walk_blocks(block["id"], heading_path)
-                
-                # Flush remaining paragraph
-                flush_paragraph(para_buf, " > ".join(heading_path))
-                
-            except Exception as e:
-                logger.warning("Error processing blocks", block_id=block_id, error=str(e))
-        
-        await walk_blocks(page_id, [])
-        
-        # Chunk the extracted text
-        chunks_with_path = []
-        for path, paragraph in texts:
-            for chunk in chunk_text(paragraph):
-                chunks_with_path.append((path, chunk))
-        
-        logger.info("Page content extracted", page_id=page_id, title=title, chunks=len(chunks_with_path))
-        return title, url, chunks_with_path
+        async with semaphore:
+            children = await list_children(block_id)
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        if strict:
+            raise
+        logger.warning("Error processing blocks", block_id=block_id, error=str(e))
+        return []
+    
+    nested = [block for block in children if block.get("has_children")]
+    subtrees = await asyncio.gather(*[fetch_block_tree(block["id"], semaphore) for block in nested])
+    for block, subtree in zip(nested, subtrees):
+        block["children"] = subtree
+    return children
+
+
+async def fetch_page(page_id: str, page: Optional[dict] = None) -> Tuple[dict, List[dict]]:
+    """
+    Fetch a page object (unless already retrieved) and its complete block tree.
+    
+    Raises:
+        NotionAPIError: If Notion calls fail
+    """
+    try:
+        if page is None:
+            page = await notion_call(notion.pages.retrieve, page_id=page_id)
+        tree = await fetch_block_tree(page_id, asyncio.Semaphore(settings.notion_fetch_concurrency), strict=True)
+        return page, tree
         
+    except CircuitOpenError:
+        raise
     except APIResponseError as e:
         logger.error("Notion API error", page_id=page_id, error=str(e), status_code=e.status)
         raise NotionAPIError(f"Notion API error: {e}", e.status)
@@ -123,6 +97,108 @@ async def extract_page_text(page_id: str) -> Tuple[str, str, List[Tuple[str, str
         raise NotionAPIError(f"Unexpected error: {e}")
 
 
+def page_title_and_url(page: dict) -> Tuple[str, str]:
+    """Title and URL of a page object."""
+    title_prop = page["properties"].get("Name") or page["properties"].get("title")
+    title = rich_text_to_plain(title_prop.get("title", [])) if title_prop else "Untitled"
+    return title, page.get("url", "")
+
+
+def extract_chunks(tree: List[dict]) -> List[Tuple[str, str]]:
+    """
+    Chunk a block tree with the configured chunker (CHUNKER).
+    
+    Returns:
+        [(heading_path, chunk_text), ...]
+    """
+    if settings.chunker == "legacy":
+        return extract_chunks_legacy(tree)
+    return list(chunk_blocks(tree))
+
+
+def extract_chunks_legacy(tree: List[dict]) -> List[Tuple[str, str]]:
+    """
+    Walk a block tree in document order and chunk its text by characters
+    (paragraph runs through chunk_text).
+    
+    Returns:
+        [(heading_path, chunk_text), ...]
+    """
+    texts: List[Tuple[str, str]] = []  # (heading_path, text)
+    
+    def flush_paragraph(buf: List[str], path: str):
+        """Flush accumulated paragraph text."""
+        chunk = "\n".join([x for x in buf if x])
+        if chunk.strip():
+            texts.append((path, chunk.strip()))
+    
+    def walk_blocks(blocks: List[dict], heading_path: List[str]):
+        """Recursively walk through blocks."""
+        para_buf: List[str] = []
+        
+        for block in blocks:
+            block_type = block.get("type")
+            
+            if block_type in ("heading_1", "heading_2", "heading_3"):
+                # Flush accumulated paragraph
+                flush_paragraph(para_buf, " > ".join(heading_path))
+                para_buf.clear()
+                
+                # Extract heading text
+                txt = rich_text_to_plain(block[block_type].get("rich_text", []))
+                if not txt:
+                    continue
+                    
+                # Update heading path based on level
+                if block_type == "heading_1":
+                    new_path = [txt]
+                elif block_type == "heading_2":
+                    new_path = heading_path[:1] + [txt]
+                else:  # heading_3
+                    new_path = heading_path[:2] + [txt]
+                
+                heading_path = new_path
+                
+            elif block_type in ("paragraph", "bulleted_list_item", "numbered_list_item", "quote", "callout"):
+                # Accumulate paragraph text
+                txt = rich_text_to_plain(block[block_type].get("rich_text", []))
+                if txt:
+                    para_buf.append(txt)
+            
+            # Recursively process children
+            if block.get("children"):
+                walk_blocks(block["children"], heading_path)
+        
+        # Flush remaining paragraph
+        flush_paragraph(para_buf, " > ".join(heading_path))
+    
+    walk_blocks(tree, [])
+    
+    # Chunk the extracted text
+    chunks_with_path = []
+    for path, paragraph in texts:
+        for chunk in chunk_text(paragraph):
+            chunks_with_path.append((path, chunk))
+    return chunks_with_path
+
+
+async def extract_page_text(page_id: str) -> Tuple[str, str, List[Tuple[str, str]]]:
+    """
+    Extract text content from a Notion page.
+    
+    Returns:
+        Tuple of (title, url, [(heading_path, chunk_text), ...])
+    """
+    logger.info("Extracting page content", page_id=page_id)
+    
+    page, tree = await fetch_page(page_id)
+    title, url = page_title_and_url(page)
+    chunks_with_path = extract_chunks(tree)
+    
+    logger.info("Page content extracted", page_id=page_id, title=title, chunks=len(chunks_with_path))
+    return title, url, chunks_with_path
+
+
 def chunk_text(text: str, size: int = 1000, overlap: int = 200) -> List[str]:
     """
     Split text into overlapping chunks.
@@ -164,19 +240,112 @@ def chunk_text(text: str, size: int = 1000, overlap: int = 200) -> List[str]:
     return chunks
 
 
+def content_hash(content: str) -> str:
+    """SHA-256 of chunk content (same as the backfill in migration 009)."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def match_chunks(existing: List[Row], new_hashes: List[str]) -> Tuple[Dict[int, Row], List[Row]]:
+    """
+    Pair new chunk positions with existing rows of identical content.
+    
+    A row at the same position wins; otherwise the nearest unused row with the
+    same hash is taken, so repeated paragraphs keep stable rows.
+    
+    Returns:
+        ({new_index: existing_chunk}, existing chunks that vanished)
+    """
+    by_hash: Dict[str, List[Row]] = {}
+    for chunk in existing:
+        by_hash.setdefault(chunk.content_hash or content_hash(chunk.content), []).append(chunk)
+    
+    matches: Dict[int, Row] = {}
+    for idx, digest in enumerate(new_hashes):
+        candidates = by_hash.get(digest, [])
+        same_position = next((c for c in candidates if c.chunk_index == idx), None)
+        if same_position is not None:
+            matches[idx] = same_position
+            candidates.remove(same_position)
+    
+    for idx, digest in enumerate(new_hashes):
+        candidates = by_hash.get(digest)
+        if idx in matches or not candidates:
+            continue
+        nearest = min(candidates, key=lambda c: abs(c.chunk_index - idx))
+        matches[idx] = nearest
+        candidates.remove(nearest)
+    
+    kept = {id(chunk) for chunk in matches.values()}
+    vanished = [chunk for chunk in existing if id(chunk) not in kept]
+    return matches, vanished
+
+
 async def upsert_page(db: AsyncSession, page_id: str, last_edited: datetime, allowed_roles: Optional[List[str]] = None) -> None:
-    """Update or create a document and its chunks."""
+    """Extract a page from Notion and write its document, chunks and block snapshot (see write_page)."""
     try:
         logger.info("Upserting page", page_id=page_id, allowed_roles=allowed_roles)
+        page, tree = await fetch_page(page_id)
+        title, url = page_title_and_url(page)
+        chunks_with_path = extract_chunks(tree)
+        await write_page(db, page_id, last_edited, title, url, chunks_with_path, allowed_roles)
+        if settings.page_cache_enabled:
+            await save_snapshot(db, page_id, last_edited, pack_snapshot(page, tree))
+    except Exception as e:
+        logger.error("Error upserting page", page_id=page_id, error=str(e))
+        raise
+
+
+async def stored_chunk_hashes(db: AsyncSession, page_id: str) -> set:
+    """Content hashes of a page's stored chunks (empty for new pages)."""
+    result = await db.execute(
+        select(Chunk.content_hash)
+        .join(Document, Document.id == Chunk.document_id)
+        .where(Document.notion_page_id == page_id)
+    )
+    return {digest for digest in result.scalars().all() if digest}
+
+
+async def write_page(
+    db: AsyncSession,
+    page_id: str,
+    last_edited: datetime,
+    title: str,
+    url: str,
+    chunks_with_path: List[Tuple[str, str]],
+    allowed_roles: Optional[List[str]] = None,
+    embeddings: Optional[Dict[str, List[float]]] = None
+) -> Dict[str, int]:
+    """
+    Create or update a document and diff its chunks.
+    
+    Chunks are matched to the stored ones by content hash and position:
+    unchanged chunks keep their rows (only chunk_index, heading_path and roles
+    are updated), new chunks are inserted, vanished ones deleted. Embeddings of
+    new chunks are taken from `embeddings` (keyed by content hash) and computed
+    for any that are missing. Nothing is committed here, so the caller's commit
+    applies it atomically.
+    
+    The same page can be queued by several jobs and written by several workers
+    at once, so a transaction-level advisory lock on the page serializes
+    writers: the second one diffs against the chunks the first committed.
+    
+    Returns:
+        Counts of unchanged, updated, inserted and deleted chunks
+    """
+    embeddings = embeddings or {}
+    try:
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(:lock_class, hashtext(:page_id))"),
+            {"lock_class": PAGE_LOCK_CLASS, "page_id": normalize_page_id(page_id)},
+        )
         
         # Check if document exists
         result = await db.execute(select(Document).where(Document.notion_page_id == page_id))
         doc = result.scalar_one_or_none()
         
-        # Extract page content
-        title, url, chunks_with_path = await extract_page_text(page_id)
-        
-        if doc is None:
+        existing: List[Row] = []
+        created = doc is None
+        if created:
             # Create new document
             doc = Document(
                 notion_page_id=page_id,
@@ -196,84 +365,155 @@ async def upsert_page(db: AsyncSession, page_id: str, last_edited: datetime, all
             doc.last_edited = last_edited
             doc.updated_at = datetime.utcnow()
             
-            # Remove old chunks
-            await db.execute(delete(Chunk).where(Chunk.document_id == doc.id))
-            await db.flush()
+            # Current chunks as plain rows, without their embeddings
+            result = await db.execute(
+                select(Chunk.id, Chunk.chunk_index, Chunk.heading_path, Chunk.content,
+                       Chunk.content_hash, Chunk.allowed_roles, Chunk.token_count)
+                .where(Chunk.document_id == doc.id)
+            )
+            existing = list(result.all())
             logger.info("Updated document", document_id=doc.id, title=title)
         
-        # Process chunks in batches
-        if chunks_with_path:
-            contents = [content for _, content in chunks_with_path]
-            embeddings = await embed_text_batch(contents, batch_size=20)
-            
-            # Create chunk records
-            for idx, ((path, content), embedding) in enumerate(zip(chunks_with_path, embeddings)):
-                chunk = Chunk(
-                    document_id=doc.id,
-                    chunk_index=idx,
-                    heading_path=path,
-                    content=content,
-                    embedding=embedding,
-                    allowed_roles=allowed_roles  # Set roles for chunk
-                )
-                db.add(chunk)
-            
-            await db.flush()
-            logger.info("Created chunks", document_id=doc.id, count=len(chunks_with_path))
+        hashes = [content_hash(content) for _, content in chunks_with_path]
+        matches, vanished = match_chunks(existing, hashes)
+        
+        # Delete chunks whose content is gone
+        if vanished:
+            await db.execute(delete(Chunk).where(Chunk.id.in_([chunk.id for chunk in vanished])))
+        
+        # Move or relabel kept chunks (one executemany UPDATE by primary key);
+        # legacy rows without a token count get one here
+        moved = []
+        for idx, chunk in matches.items():
+            path, content = chunks_with_path[idx]
+            needs_count = chunk.token_count is None
+            if needs_count or (chunk.chunk_index, chunk.heading_path, chunk.content_hash, chunk.allowed_roles) != (idx, path, hashes[idx], allowed_roles):
+                row = {
+                    "id": chunk.id,
+                    "chunk_index": idx,
+                    "heading_path": path,
+                    "content_hash": hashes[idx],
+                    "allowed_roles": allowed_roles,
+                }
+                if needs_count:
+                    row["token_count"] = count_tokens(content)
+                moved.append(row)
+        if moved:
+            await db.execute(update(Chunk), moved)
+        updated = len(moved)
+        
+        # Insert new chunks only, embedding any not embedded by the caller
+        new_positions = [idx for idx in range(len(chunks_with_path)) if idx not in matches]
+        missing = [idx for idx in new_positions if hashes[idx] not in embeddings]
+        if missing:
+            vectors = await embed_texts([chunks_with_path[idx][1] for idx in missing])
+            embeddings = {**embeddings, **{hashes[idx]: vector for idx, vector in zip(missing, vectors)}}
+        
+        # Plain row dicts through a Core executemany, which SQLAlchemy sends as
+        # multi-row INSERT statements instead of per-object unit-of-work flushes
+        now = datetime.utcnow()
+        rows = []
+        for idx in new_positions:
+            path, content = chunks_with_path[idx]
+            rows.append({
+                "id": uuid.uuid4(),
+                "document_id": doc.id,
+                "chunk_index": idx,
+                "heading_path": path,
+                "content": content,
+                "content_hash": hashes[idx],
+                "token_count": count_tokens(content),
+                "embedding": embeddings[hashes[idx]],
+                "allowed_roles": allowed_roles,  # Set roles for chunk
+                "created_at": now,
+            })
+        if rows:
+            await db.execute(insert(Chunk.__table__), rows)
+        
+        await db.flush()
+        counts = {
+            "unchanged": len(matches) - updated,
+            "updated": updated,
+            "inserted": len(new_positions),
+            "deleted": len(vanished),
+        }
+        await bump(db, {DOCUMENTS: 1 if created else 0, CHUNKS: len(new_positions) - len(vanished)})
+        logger.info("Chunks synced", document_id=doc.id, **counts)
+        return counts
         
     except Exception as e:
-        logger.error("Error upserting page", page_id=page_id, error=str(e))
+        logger.error("Error writing page", page_id=page_id, error=str(e))
         raise
 
 
-async def ingest_all(db: AsyncSession) -> Dict[str, int]:
+def parse_notion_time(value: str) -> datetime:
+    """Parse Notion's ISO timestamp ("2024-01-01T10:00:00.000Z") into an aware datetime."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def normalize_page_id(page_id: str) -> str:
+    """Page IDs come both with and without dashes."""
+    return page_id.replace("-", "").lower()
+
+
+async def load_stored_edit_times(db: AsyncSession, page_ids: List[str]) -> Dict[str, datetime]:
+    """last_edited of already ingested pages, keyed by page ID."""
+    result = await db.execute(
+        select(Document.notion_page_id, Document.last_edited).where(Document.notion_page_id.in_(page_ids))
+    )
+    return {page_id: last_edited for page_id, last_edited in result.all()}
+
+
+async def fetch_remote_edit_times(
+    page_ids: List[str],
+    stored: Dict[str, datetime],
+    since: Optional[datetime] = None
+) -> Dict[str, datetime]:
     """
-    Ingest all pages from configured Notion page IDs.
+    Notion's last_edited_time for many pages at once, via search.
     
-    Returns:
-        Dictionary with ingestion statistics
+    Search results come newest first, 100 per call, so the walk stops as soon as
+    every page is found or results get older than `since` (default: the oldest
+    stored edit time): a stored page not seen by then has not changed and gets
+    its stored time.
+    Pages missing from the result (e.g. not visible to search) are left out and
+    should be retrieved one by one.
     """
-    stats = {"processed": 0, "errors": 0, "pages": len(DATABASE_IDS)}
+    wanted = {normalize_page_id(page_id): page_id for page_id in page_ids}
+    cutoff = since if since is not None else (min(stored.values()) if stored else None)
+    found: Dict[str, datetime] = {}
+    cursor = None
+    reached_cutoff = False
     
-    logger.info("Starting Notion pages ingestion", pages=len(DATABASE_IDS))
-    
-    # Process each page ID directly (not as database)
-    semaphore = asyncio.Semaphore(5)  # Limit concurrent requests
-    
-    async def process_single_page(page_id: str):
-        """Process a single Notion page."""
-        async with semaphore:
-            try:
-                logger.info("Processing page", page_id=page_id)
-                
-                # Get page metadata to retrieve last_edited_time
-                page_data = await notion.pages.retrieve(page_id=page_id)
-                last_edited_str = page_data.get("last_edited_time")
-                
-                if not last_edited_str:
-                    logger.warning("No last_edited_time for page", page_id=page_id)
-                    last_edited = datetime.utcnow()
-                else:
-                    last_edited = datetime.fromisoformat(last_edited_str.replace("Z", "+00:00"))
-                
-                # Upsert the page and its content
-                await upsert_page(db, page_id, last_edited)
-                await db.commit()
-                
-                stats["processed"] += 1
-                logger.info("✓ Page processed successfully", page_id=page_id)
-                
-            except Exception as e:
-                logger.error("✗ Error processing page", page_id=page_id, error=str(e))
-                stats["errors"] += 1
-                # Rollback on error
-                await db.rollback()
+    while len(found) < len(wanted):
+        params = {
+            "filter": {"property": "object", "value": "page"},
+            "sort": {"direction": "descending", "timestamp": "last_edited_time"},
+            "page_size": 100,
+        }
+        if cursor:
+            params["start_cursor"] = cursor
+        response = await notion_call(notion.search, **params)
+        
+        for page in response.get("results", []):
+            edited = page.get("last_edited_time")
+            if not edited:
+                continue
+            edited_at = parse_notion_time(edited)
+            if cutoff is not None and edited_at < cutoff:
+                reached_cutoff = True
+                break
+            page_id = wanted.get(normalize_page_id(page.get("id", "")))
+            if page_id:
+                found[page_id] = edited_at
+        
+        cursor = response.get("next_cursor")
+        if reached_cutoff or not response.get("has_more") or not cursor:
+            break
     
-    # Process all pages in parallel with concurrency limit
-    await asyncio.gather(
-        *[process_single_page(page_id) for page_id in DATABASE_IDS],
-        return_exceptions=True
-    )
+    if reached_cutoff:
+        for page_id in page_ids:
+            if page_id not in found and page_id in stored:
+                found[page_id] = stored[page_id]
     
-    logger.info("Notion pages ingestion completed", stats=stats)
-    return stats
+    return found
@@ -0,0 +1,183 @@
+"""Notion integration webhooks: signed page events trigger debounced re-syncs and deletions."""
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request
+from sqlalchemy import select, update, delete, func
+from .config import settings
+from .db import AsyncSessionLocal
+from .logger import get_logger
+from .models import Document, Chunk, NotionPage, PageSnapshot
+from .notion_sync import DATABASE_IDS, normalize_page_id
+from .sync_jobs import JOB_INGEST, JOB_PAGE, enqueue_job, find_active_job
+from .stats import bump, DOCUMENTS, CHUNKS
+from . import metrics
+
+logger = get_logger(__name__)
+router = APIRouter()
+
+SIGNATURE_HEADER = "X-Notion-Signature"
+
+SYNC = "sync"
+DELETE = "delete"
+PAGE_EVENTS = {
+    "page.created": SYNC,
+    "page.content_updated": SYNC,
+    "page.properties_updated": SYNC,
+    "page.moved": SYNC,
+    "page.undeleted": SYNC,
+    "page.deleted": DELETE,
+}
+
+
+def sign(body: bytes, token: str) -> str:
+    """X-Notion-Signature value: HMAC-SHA256 of the raw body keyed with the verification token."""
+    return "sha256=" + hmac.new(token.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body: bytes, signature: Optional[str], token: str) -> bool:
+    return bool(signature) and hmac.compare_digest(sign(body, token), signature)
+
+
+class Debouncer:
+    """
+    Coalesce bursts of events per key: `handler(key, action)` runs once the key
+    has been quiet for `delay_s`, with the latest action. A key that keeps
+    receiving events is still handled `max_wait_s` after its first one.
+    """
+
+    def __init__(self, delay_s: float, max_wait_s: float, handler: Callable[[str, str], Awaitable[None]]):
+        self.delay_s = delay_s
+        self.max_wait_s = max_wait_s
+        self.handler = handler
+        self._pending: Dict[str, Tuple[float, str, asyncio.Task]] = {}
+
+    def schedule(self, key: str, action: str) -> None:
+        now = time.monotonic()
+        first_seen = now
+        if key in self._pending:
+            first_seen, _, task = self._pending[key]
+            task.cancel()
+            metrics.incr("notion_webhook.coalesced")
+        delay = max(0.0, min(self.delay_s, first_seen + self.max_wait_s - now))
+        self._pending[key] = (first_seen, action, asyncio.create_task(self._fire(key, action, delay)))
+
+    async def _fire(self, key: str, action: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # From here on a new event starts a new timer instead of cancelling this run
+        self._pending.pop(key, None)
+        try:
+            await self.handler(key, action)
+        except Exception as e:
+            metrics.incr("notion_webhook.errors")
+            logger.error("Failed to apply Notion page event", page_id=key, action=action, error=str(e))
+
+    def cancel_all(self) -> List[asyncio.Task]:
+        """Cancel every scheduled call; returns the tasks so shutdown can await them."""
+        tasks = [task for _, _, task in self._pending.values()]
+        for task in tasks:
+            task.cancel()
+        self._pending.clear()
+        return tasks
+
+
+def matches_page(column, page_id: str):
+    """SQL condition comparing a stored page ID with `page_id`, ignoring dashes and case."""
+    return func.lower(func.replace(column, "-", "")) == normalize_page_id(page_id)
+
+
+async def apply_page_event(page_id: str, action: str) -> None:
+    """
+    Re-sync or delete one page after its events settled.
+
+    Configured pages are re-ingested by a targeted ingest job and managed
+    pages by a page job (which upserts with their allowed roles); a deleted
+    page loses its document and chunks. Pages the bot does not know are ignored.
+    """
+    configured = [pid for pid in DATABASE_IDS if normalize_page_id(pid) == normalize_page_id(page_id)]
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(NotionPage.id).where(matches_page(NotionPage.page_id, page_id)))
+        managed: List[int] = list(result.scalars().all())
+
+        if action == DELETE:
+            chunks = await session.execute(
+                select(func.count()).select_from(Chunk).join(Document, Chunk.document_id == Document.id)
+                .where(matches_page(Document.notion_page_id, page_id))
+            )
+            chunk_count = chunks.scalar_one()
+            deleted = await session.execute(delete(Document).where(matches_page(Document.notion_page_id, page_id)))
+            await bump(session, {DOCUMENTS: -deleted.rowcount, CHUNKS: -chunk_count})
+            await session.execute(delete(PageSnapshot).where(matches_page(PageSnapshot.page_id, page_id)))
+            if managed:
+                await session.execute(
+                    update(NotionPage)
+                    .where(NotionPage.id.in_(managed))
+                    .values(status="error", error_message="Page deleted in Notion", updated_at=datetime.utcnow())
+                )
+            await session.commit()
+            metrics.incr("notion_webhook.applied")
+            logger.info("Notion page deleted via webhook", page_id=page_id, documents=deleted.rowcount)
+            return
+
+    if not configured and not managed:
+        logger.debug("Webhook event for unknown page ignored", page_id=page_id)
+        return
+
+    for notion_page_id in managed:
+        params = {"notion_page_id": notion_page_id}
+        if await find_active_job(JOB_PAGE, params) is None:
+            await enqueue_job(JOB_PAGE, params)
+    if configured:
+        params = {"full": False, "page_ids": configured}
+        if await find_active_job(JOB_INGEST, params) is None:
+            await enqueue_job(JOB_INGEST, params)
+    metrics.incr("notion_webhook.applied")
+    logger.info("Notion page re-sync queued via webhook", page_id=page_id, configured=bool(configured), managed=len(managed))
+
+
+page_events = Debouncer(settings.notion_webhook_debounce_s, settings.notion_webhook_max_wait_s, apply_page_event)
+
+
+@router.post("/notion/webhook")
+async def notion_webhook(request: Request):
+    """Receive Notion integration webhook events."""
+    body = await request.body()
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Expected a JSON object")
+
+    # Subscription handshake: Notion sends the token once, unsigned, so it is
+    # only accepted (and logged) while no token is configured
+    if "verification_token" in payload:
+        if settings.notion_webhook_token:
+            metrics.incr("notion_webhook.rejected")
+            logger.warning("Notion webhook verification ignored: NOTION_WEBHOOK_TOKEN is already set")
+            raise HTTPException(status_code=403, detail="Webhook already verified")
+        logger.warning("Notion webhook verification token received; set NOTION_WEBHOOK_TOKEN to it",
+                       verification_token=payload["verification_token"])
+        return {"status": "ok"}
+
+    if not settings.notion_webhook_token:
+        raise HTTPException(status_code=503, detail="Notion webhook not configured")
+    if not verify_signature(body, request.headers.get(SIGNATURE_HEADER), settings.notion_webhook_token):
+        metrics.incr("notion_webhook.rejected")
+        logger.warning("Notion webhook signature mismatch")
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    metrics.incr("notion_webhook.received")
+    event_type = payload.get("type")
+    entity = payload.get("entity")
+    action = PAGE_EVENTS.get(event_type) if isinstance(event_type, str) else None
+    if action is None or not isinstance(entity, dict) or entity.get("type") != "page" or not entity.get("id"):
+        return {"status": "ignored"}
+
+    page_events.schedule(entity["id"], action)
+    logger.info("Notion webhook event accepted", event_type=event_type, page_id=entity["id"])
+    return {"status": "accepted"}
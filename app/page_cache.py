@@ -0,0 +1,87 @@
+"""Raw Notion block cache: compressed page snapshots keyed by page and last_edited_time."""
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .logger import get_logger
+from .models import PageSnapshot, Document
+from . import metrics
+
+logger = get_logger(__name__)
+
+COMPRESSION_LEVEL = 6
+
+
+class Snapshot:
+    """A packed page: compressed JSON plus its digest and sizes."""
+
+    def __init__(self, data: bytes, content_hash: str, raw_bytes: int):
+        self.data = data
+        self.content_hash = content_hash
+        self.raw_bytes = raw_bytes
+
+
+def pack_snapshot(page: dict, tree: List[dict]) -> Snapshot:
+    """Serialize and compress a page object and its block tree."""
+    raw = json.dumps({"page": page, "tree": tree}, ensure_ascii=False, separators=(",", ":")).encode()
+    return Snapshot(zlib.compress(raw, COMPRESSION_LEVEL), hashlib.sha256(raw).hexdigest(), len(raw))
+
+
+def unpack_snapshot(data: bytes) -> Tuple[dict, List[dict]]:
+    """(page, tree) back from a stored snapshot."""
+    payload = json.loads(zlib.decompress(data))
+    return payload["page"], payload["tree"]
+
+
+async def save_snapshot(db: AsyncSession, page_id: str, last_edited: datetime, snapshot: Snapshot) -> None:
+    """
+    Store the snapshot of a page revision and drop older revisions of the page.
+    Nothing is committed here, so it lands together with the caller's chunk writes.
+    """
+    values = {
+        "page_id": page_id,
+        "last_edited": last_edited,
+        "content_hash": snapshot.content_hash,
+        "data": snapshot.data,
+        "raw_bytes": snapshot.raw_bytes,
+        "stored_bytes": len(snapshot.data),
+        "created_at": datetime.utcnow(),
+    }
+    stmt = pg_insert(PageSnapshot.__table__).values(**values)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=["page_id", "last_edited"],
+        set_={key: stmt.excluded[key] for key in ("content_hash", "data", "raw_bytes", "stored_bytes", "created_at")},
+    ))
+    await db.execute(
+        delete(PageSnapshot).where(PageSnapshot.page_id == page_id, PageSnapshot.last_edited < last_edited)
+    )
+    metrics.incr("page_cache.saved")
+    metrics.incr("page_cache.raw_bytes", snapshot.raw_bytes)
+    metrics.incr("page_cache.stored_bytes", len(snapshot.data))
+
+
+async def iter_snapshots(
+    db: AsyncSession,
+    page_ids: Optional[List[str]] = None
+) -> AsyncIterator[Tuple[str, datetime, bytes]]:
+    """
+    Stream (page_id, last_edited, data) of the newest snapshot of each page.
+
+    Only pages that still have a Document: snapshots of deleted pages must not
+    bring them back.
+    """
+    query = (
+        select(PageSnapshot.page_id, PageSnapshot.last_edited, PageSnapshot.data)
+        .join(Document, Document.notion_page_id == PageSnapshot.page_id)
+        .distinct(PageSnapshot.page_id)
+        .order_by(PageSnapshot.page_id, PageSnapshot.last_edited.desc())
+    )
+    if page_ids:
+        query = query.where(PageSnapshot.page_id.in_(page_ids))
+    result = await db.stream(query)
+    async for page_id, last_edited, data in result:
+        yield page_id, last_edited, data
@@ -0,0 +1,230 @@
+"""Offline replay of historical QueryLog traffic through the retrieval + LLM pipeline."""
+import asyncio
+import difflib
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .db import AsyncSessionLocal
+from .logger import get_logger
+from .metrics import percentile
+from .models import QueryLog, Feedback, TelegramUser
+from .retrieval import retrieve
+from .llm import route_answer, should_answer_extractively, build_extractive_answer
+
+logger = get_logger(__name__)
+
+# Stages timed for every replayed question
+STAGES = ("retrieval", "generation", "total")
+
+
+async def load_queries(
+    db: AsyncSession,
+    failed_only: bool = False,
+    bad_feedback_only: bool = False,
+    since: Optional[datetime] = None,
+    limit: Optional[int] = None
+) -> List[Dict]:
+    """
+    Load logged questions to replay, with the asking user's current role.
+
+    Args:
+        db: Database session
+        failed_only: Only questions logged with has_answer = false
+        bad_feedback_only: Only questions that received a 'bad' feedback rating
+        since: Only questions asked at or after this time
+        limit: Maximum number of questions (most recent first)
+
+    Returns:
+        List of dicts with log_id, question, user_role, logged answer and usage
+    """
+    query = (
+        select(QueryLog, TelegramUser.role)
+        .outerjoin(TelegramUser, TelegramUser.user_id == QueryLog.telegram_user_id)
+        .order_by(QueryLog.ts.desc())
+    )
+
+    if failed_only:
+        query = query.where(QueryLog.has_answer == False)
+    if bad_feedback_only:
+        bad_log_ids = select(Feedback.query_log_id).where(Feedback.rating == "bad")
+        query = query.where(QueryLog.id.in_(bad_log_ids))
+    if since:
+        query = query.where(QueryLog.ts >= since)
+    if limit:
+        query = query.limit(limit)
+
+    result = await db.execute(query)
+    return [
+        {
+            "log_id": log.id,
+            "question": log.question,
+            "user_role": role,
+            "logged_answer": log.answer,
+            "logged_has_answer": log.has_answer,
+            "logged_model": log.model,
+            "logged_processing_time_ms": log.processing_time_ms,
+            "logged_cost_usd": float(log.cost_usd) if log.cost_usd is not None else None,
+        }
+        for log, role in result.all()
+    ]
+
+
+async def replay_one(query: Dict) -> Dict:
+    """
+    Run one logged question through retrieval and answer generation.
+
+    Nothing is written to the database; each replay uses its own session.
+
+    Returns:
+        The query dict extended with stage timings, usage and the new answer
+    """
+    timings = {}
+    result = {**query, "error": None}
+    start = time.perf_counter()
+
+    try:
+        async with AsyncSessionLocal() as db:
+            stage_start = time.perf_counter()
+            chunks = await retrieve(db, query["question"], user_role=query["user_role"])
+            timings["retrieval"] = (time.perf_counter() - stage_start) * 1000
+
+        result["chunk_ids"] = [str(chunk["id"]) for chunk in chunks]
+        result["top_similarity"] = chunks[0]["cosine_similarity"] if chunks else None
+
+        if not chunks:
+            result.update(answer=None, has_answer=False, model=None,
+                          prompt_tokens=0, completion_tokens=0, cost_usd=None)
+        else:
+            stage_start = time.perf_counter()
+            if should_answer_extractively(chunks):
+                response = build_extractive_answer(chunks)
+            else:
+                response = await route_answer(query["question"], chunks)
+            timings["generation"] = (time.perf_counter() - stage_start) * 1000
+
+            result.update(
+                answer=response["answer"],
+                has_answer=True,
+                model=response.get("model"),
+                route=response.get("route"),
+                prompt_tokens=response.get("prompt_tokens", 0),
+                completion_tokens=response.get("completion_tokens", 0),
+                cost_usd=response.get("cost_usd"),
+            )
+    except Exception as e:
+        logger.warning("Replay failed", log_id=query["log_id"], error=str(e))
+        result["error"] = str(e)
+
+    timings["total"] = (time.perf_counter() - start) * 1000
+    result["timings_ms"] = timings
+    return result
+
+
+async def replay(queries: List[Dict], concurrency: int = 4, rate: Optional[float] = None) -> List[Dict]:
+    """
+    Replay queries with bounded concurrency and an optional Poisson arrival rate.
+
+    Args:
+        queries: Queries from load_queries()
+        concurrency: Maximum number of questions in flight
+        rate: Mean arrivals per second (None sends as fast as concurrency allows)
+
+    Returns:
+        Replay results in the order of the input queries
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(query: Dict) -> Dict:
+        async with semaphore:
+            return await replay_one(query)
+
+    logger.info("Starting replay", queries=len(queries), concurrency=concurrency, rate=rate)
+
+    tasks = []
+    for query in queries:
+        tasks.append(asyncio.create_task(run(query)))
+        if rate:
+            await asyncio.sleep(random.expovariate(rate))
+
+    results = await asyncio.gather(*tasks)
+    logger.info("Replay completed", queries=len(results))
+    return list(results)
+
+
+def summarize(results: List[Dict], baseline: Optional[List[Dict]] = None) -> Dict:
+    """
+    Build the replay report: latency percentiles per stage, usage and diffs.
+
+    Answer diffs compare against the logged answers; retrieval diffs compare
+    chunk IDs against a previous replay run when one is given.
+
+    Args:
+        results: Results from replay()
+        baseline: Optional results of an earlier replay to diff retrieval against
+
+    Returns:
+        Report dictionary
+    """
+    ok = [r for r in results if not r["error"]]
+
+    latency = {}
+    for stage in STAGES:
+        values = [r["timings_ms"][stage] for r in ok if stage in r["timings_ms"]]
+        latency[stage] = {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+
+    costs = [r["cost_usd"] for r in ok if r.get("cost_usd") is not None]
+    logged_costs = [r["logged_cost_usd"] for r in ok if r.get("logged_cost_usd") is not None]
+    logged_latency = [r["logged_processing_time_ms"] for r in ok if r.get("logged_processing_time_ms")]
+
+    answer_similarity = [
+        difflib.SequenceMatcher(None, r["logged_answer"] or "", r["answer"] or "").ratio()
+        for r in ok
+    ]
+
+    report = {
+        "queries": len(results),
+        "errors": len(results) - len(ok),
+        "latency_ms": latency,
+        "logged_latency_ms": {
+            "p50": percentile(logged_latency, 50),
+            "p95": percentile(logged_latency, 95),
+            "p99": percentile(logged_latency, 99),
+        },
+        "tokens": {
+            "prompt": sum(r.get("prompt_tokens") or 0 for r in ok),
+            "completion": sum(r.get("completion_tokens") or 0 for r in ok),
+        },
+        "cost_usd": round(sum(costs), 4),
+        "logged_cost_usd": round(sum(logged_costs), 4),
+        "answers": {
+            "changed": sum(1 for ratio in answer_similarity if ratio < 1.0),
+            "mean_similarity": round(sum(answer_similarity) / len(answer_similarity), 3) if answer_similarity else None,
+            "newly_answered": sum(1 for r in ok if r["has_answer"] and not r["logged_has_answer"]),
+            "newly_unanswered": sum(1 for r in ok if not r["has_answer"] and r["logged_has_answer"]),
+        },
+    }
+
+    if baseline is not None:
+        previous = {b["log_id"]: b for b in baseline if not b.get("error")}
+        compared = [r for r in ok if r["log_id"] in previous]
+        overlap = []
+        for r in compared:
+            old_ids = set(previous[r["log_id"]].get("chunk_ids") or [])
+            new_ids = set(r.get("chunk_ids") or [])
+            union = old_ids | new_ids
+            overlap.append(len(old_ids & new_ids) / len(union) if union else 1.0)
+        report["retrieval"] = {
+            "compared": len(compared),
+            "changed": sum(1 for o in overlap if o < 1.0),
+            "mean_jaccard": round(sum(overlap) / len(overlap), 3) if overlap else None,
+        }
+
+    return report
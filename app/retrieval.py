@@ -5,7 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 import os
 from .config import settings
 from .logger import get_logger
-from .exceptions import RetrievalError
+from .exceptions import RetrievalError, CircuitOpenError
 from .embeddings import embed_query
 
 logger = get_logger(__name__)
@@ -44,6 +44,8 @@ async def retrieve(db: AsyncSession, question: str, user_role: Optional[str] = N
             SELECT 
                 c.id,
                 c.content,
+                c.chunk_index,
+                c.token_count,
                 c.heading_path,
                 c.allowed_roles,
                 d.title,
@@ -92,6 +94,8 @@ async def retrieve(db: AsyncSession, question: str, user_role: Optional[str] = N
         
         return filtered_chunks
         
+    except CircuitOpenError:
+        raise
     except Exception as e:
         logger.error("Retrieval failed", question=question[:100], error=str(e))
         raise RetrievalError(f"Failed to retrieve documents: {e}")
@@ -145,6 +149,7 @@ async def retrieve_with_filters(
             SELECT 
                 c.id,
                 c.content,
+                c.token_count,
                 c.heading_path,
                 d.title,
                 d.url,
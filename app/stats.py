@@ -0,0 +1,191 @@
+"""
+Dashboard statistics from incrementally maintained counters and daily rollups.
+
+Counters live in stats_counters, one row each, and are bumped in the same
+transaction as the writes they count: document and chunk rows by write_page()
+and the delete endpoints, queries and feedback once per write-behind flush.
+Document, chunk and feedback counters track current rows and are recomputed
+by reconcile_counters() on every log maintenance pass (bulk deletes such as
+cascades are not counted one by one). Query counters are all-time totals and
+survive retention. Time series come from query_log_daily.
+"""
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Mapping, Union
+from sqlalchemy import select, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from .db import engine
+from .logger import get_logger
+from .models import StatCounter, QueryLogDaily
+from . import metrics
+
+logger = get_logger(__name__)
+
+Number = Union[int, float, Decimal]
+
+# Counter names
+DOCUMENTS = "documents"
+CHUNKS = "chunks"
+QUERIES = "queries"
+QUERIES_FAILED = "queries_failed"
+PROMPT_TOKENS = "prompt_tokens"
+CACHED_PROMPT_TOKENS = "cached_prompt_tokens"
+COMPLETION_TOKENS = "completion_tokens"
+COST_USD = "cost_usd"
+FEEDBACK = "feedback"
+FEEDBACK_GOOD = "feedback_good"
+
+DECIMAL_COUNTERS = (COST_USD,)
+
+# Exact values of the counters that track current rows
+RECONCILE_SQL = {
+    DOCUMENTS: "SELECT count(*) FROM documents",
+    CHUNKS: "SELECT count(*) FROM chunks",
+    FEEDBACK: "SELECT count(*) FROM feedback",
+    FEEDBACK_GOOD: "SELECT count(*) FROM feedback WHERE rating = 'good'",
+}
+
+
+async def bump(db: Union[AsyncSession, AsyncConnection], deltas: Mapping[str, Number]) -> None:
+    """Add deltas to counters in the caller's transaction (one upsert; zero deltas skipped)."""
+    now = datetime.utcnow()
+    # Sorted so concurrent transactions lock counter rows in the same order
+    rows = [{"name": name, "value": delta, "updated_at": now} for name, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+    stmt = pg_insert(StatCounter.__table__).values(rows)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"value": StatCounter.__table__.c.value + stmt.excluded.value, "updated_at": stmt.excluded.updated_at},
+    ))
+
+
+def query_log_deltas(rows: List[Dict[str, Any]]) -> Dict[str, Number]:
+    """Counter deltas for a batch of inserted query_logs rows."""
+    return {
+        QUERIES: len(rows),
+        QUERIES_FAILED: sum(1 for row in rows if row.get("has_answer") is False),
+        PROMPT_TOKENS: sum(row.get("prompt_tokens") or 0 for row in rows),
+        CACHED_PROMPT_TOKENS: sum(row.get("cached_prompt_tokens") or 0 for row in rows),
+        COMPLETION_TOKENS: sum(row.get("completion_tokens") or 0 for row in rows),
+        COST_USD: sum((Decimal(str(row["cost_usd"])) for row in rows if row.get("cost_usd")), Decimal(0)),
+    }
+
+
+def feedback_deltas(rows: List[Dict[str, Any]], sign: int = 1) -> Dict[str, Number]:
+    """Counter deltas for inserted (or, with sign=-1, deleted) feedback rows."""
+    return {
+        FEEDBACK: sign * len(rows),
+        FEEDBACK_GOOD: sign * sum(1 for row in rows if row.get("rating") == "good"),
+    }
+
+
+async def reconcile_counters() -> Dict[str, int]:
+    """
+    Correct the row-tracking counters to exact counts; returns the corrections made.
+
+    Counter rows and counts are read in one REPEATABLE READ snapshot, which is
+    consistent because bumps commit with the rows they count, and nothing is
+    locked during the scans. The differences are then added in a short
+    transaction of their own, so bumps committed meanwhile are kept.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="REPEATABLE READ")
+        async with conn.begin():
+            result = await conn.execute(
+                select(StatCounter.name, StatCounter.value).where(StatCounter.name.in_(RECONCILE_SQL))
+            )
+            stored = {name: int(value) for name, value in result.all()}
+            exact = {name: (await conn.execute(text(sql))).scalar_one() for name, sql in RECONCILE_SQL.items()}
+
+    corrections = {name: exact[name] - stored.get(name, 0) for name in RECONCILE_SQL if stored.get(name) != exact[name]}
+    if corrections:
+        async with engine.begin() as conn:
+            await bump(conn, corrections)
+        metrics.incr("stats.reconciled", len(corrections))
+        logger.info("Stats counters reconciled", **corrections)
+    return corrections
+
+
+def counter_value(name: str, value: Decimal) -> Number:
+    return float(value) if name in DECIMAL_COUNTERS else int(value)
+
+
+async def load_stats(db: AsyncSession, days: int) -> Dict[str, Any]:
+    """
+    Everything the dashboard shows, from a fixed number of small reads: the
+    counter rows plus query_log_daily for the last `days` days (today's row
+    lags by up to LOG_MAINTENANCE_INTERVAL_S).
+    """
+    result = await db.execute(select(StatCounter.name, StatCounter.value, StatCounter.updated_at))
+    counters: Dict[str, Number] = {}
+    updated_at = None
+    for name, value, changed in result.all():
+        counters[name] = counter_value(name, value)
+        updated_at = max(updated_at, changed) if updated_at else changed
+
+    def count(name: str) -> Number:
+        return counters.get(name, 0)
+
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    latency_weight = func.sum(QueryLogDaily.latency_avg_ms * QueryLogDaily.queries)
+    latency_count = func.sum(QueryLogDaily.queries).filter(QueryLogDaily.latency_avg_ms.isnot(None))
+    result = await db.execute(
+        select(
+            QueryLogDaily.day,
+            func.sum(QueryLogDaily.queries),
+            func.sum(QueryLogDaily.failed),
+            func.sum(QueryLogDaily.prompt_tokens + QueryLogDaily.completion_tokens),
+            func.sum(QueryLogDaily.cost_usd),
+            latency_weight / func.nullif(latency_count, 0),
+            func.count(func.distinct(QueryLogDaily.telegram_user_id)),
+        )
+        .where(QueryLogDaily.day >= since)
+        .group_by(QueryLogDaily.day)
+        .order_by(QueryLogDaily.day)
+    )
+    daily = [
+        {
+            "day": day.isoformat(),
+            "queries": int(queries),
+            "failed": int(failed),
+            "tokens": int(tokens),
+            "cost_usd": float(cost),
+            "latency_avg_ms": round(float(latency)) if latency is not None else None,
+            "users": users,
+        }
+        for day, queries, failed, tokens, cost, latency, users in result.all()
+    ]
+
+    result = await db.execute(
+        select(QueryLogDaily.role, func.sum(QueryLogDaily.queries), func.sum(QueryLogDaily.failed), func.sum(QueryLogDaily.cost_usd))
+        .where(QueryLogDaily.day >= since)
+        .group_by(QueryLogDaily.role)
+        .order_by(func.sum(QueryLogDaily.queries).desc())
+    )
+    by_role = [
+        {"role": role or None, "queries": int(queries), "failed": int(failed), "cost_usd": float(cost)}
+        for role, queries, failed, cost in result.all()
+    ]
+
+    feedback = count(FEEDBACK)
+    queries = count(QUERIES)
+    return {
+        "documents": count(DOCUMENTS),
+        "chunks": count(CHUNKS),
+        "queries": queries,
+        "queries_failed": count(QUERIES_FAILED),
+        "failure_rate": round(count(QUERIES_FAILED) / queries, 4) if queries else None,
+        "prompt_tokens": count(PROMPT_TOKENS),
+        "cached_prompt_tokens": count(CACHED_PROMPT_TOKENS),
+        "completion_tokens": count(COMPLETION_TOKENS),
+        "cost_usd": round(count(COST_USD), 4),
+        "feedback": feedback,
+        "feedback_good": count(FEEDBACK_GOOD),
+        "satisfaction": round(count(FEEDBACK_GOOD) / feedback, 4) if feedback else None,
+        "days": days,
+        "daily": daily,
+        "by_role": by_role,
+        "updated_at": updated_at.isoformat() if updated_at else None,
+    }
@@ -0,0 +1,275 @@
+"""
+Durable background sync jobs: a persistent queue in sync_jobs and an in-process worker.
+
+Any number of processes may run the worker. A claimed job is leased for
+SYNC_JOB_LEASE_S and its worker renews the lease every SYNC_JOB_HEARTBEAT_S
+while it runs; a job whose worker died keeps status running until the lease
+expires, then any worker claims it and resumes it from its checkpoint.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select, update, func, and_, or_
+from .config import settings
+from .db import AsyncSessionLocal
+from .logger import get_logger
+from .models import SyncJob, NotionPage
+from .notion_api import notion, notion_call
+from .notion_sync import DATABASE_IDS, upsert_page, parse_notion_time, page_title_and_url
+from .ingest_workers import WORKER_ID, enqueue_items, job_item_progress
+
+logger = get_logger(__name__)
+
+JOB_INGEST = "ingest"
+JOB_PAGE = "page"
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+TERMINAL_STATUSES = (COMPLETED, FAILED)
+
+# Set by enqueue_job() so the worker does not wait for its next poll
+_wakeup = asyncio.Event()
+
+
+def job_to_dict(job: SyncJob) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "params": job.params or {},
+        "status": job.status,
+        "total": job.total,
+        "done": job.done,
+        "report": job.report,
+        "error": job.error,
+        "lease_owner": job.lease_owner,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+async def enqueue_job(kind: str, params: Optional[Dict[str, Any]] = None) -> SyncJob:
+    """Persist a queued job and wake the worker."""
+    async with AsyncSessionLocal() as session:
+        job = SyncJob(kind=kind, params=params or {}, status=QUEUED, done=0)
+        session.add(job)
+        await session.commit()
+    _wakeup.set()
+    logger.info("Sync job queued", job_id=job.id, kind=kind, params=params)
+    return job
+
+
+async def get_job(job_id: int) -> Optional[SyncJob]:
+    async with AsyncSessionLocal() as session:
+        return await session.get(SyncJob, job_id)
+
+
+async def find_active_job(kind: str, params: Optional[Dict[str, Any]] = None) -> Optional[SyncJob]:
+    """A queued or running job with the same kind and params (any params if None), to avoid duplicates."""
+    query = select(SyncJob).where(SyncJob.kind == kind, SyncJob.status.in_([QUEUED, RUNNING]))
+    if params is not None:
+        query = query.where(SyncJob.params == params)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(query.order_by(SyncJob.created_at).limit(1))
+        return result.scalar_one_or_none()
+
+
+async def list_jobs(limit: int = 50) -> List[SyncJob]:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(SyncJob).order_by(SyncJob.created_at.desc()).limit(limit))
+        return list(result.scalars().all())
+
+
+async def update_job(job_id: int, **values) -> None:
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(SyncJob).where(SyncJob.id == job_id).values(updated_at=datetime.utcnow(), **values)
+        )
+        await session.commit()
+
+
+def lease_deadline():
+    """Lease expiry computed on the database clock, shared by every worker host."""
+    return func.now() + timedelta(seconds=settings.sync_job_lease_s)
+
+
+async def claim_next_job(owner: str) -> Optional[SyncJob]:
+    """
+    Lease the oldest claimable job and return it: queued jobs, and running
+    ones whose worker let the lease expire (resumed from their checkpoint).
+    """
+    claimable = (
+        select(SyncJob.id)
+        .where(or_(
+            SyncJob.status == QUEUED,
+            and_(
+                SyncJob.status == RUNNING,
+                # Running jobs from before leases existed have none
+                or_(SyncJob.lease_expires_at.is_(None), SyncJob.lease_expires_at < func.now()),
+            ),
+        ))
+        .order_by(SyncJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(SyncJob)
+            .where(SyncJob.id == claimable.scalar_subquery())
+            .values(
+                status=RUNNING,
+                lease_owner=owner,
+                lease_expires_at=lease_deadline(),
+                started_at=func.coalesce(SyncJob.started_at, func.now()),
+                updated_at=func.now(),
+            )
+            .returning(SyncJob)
+            .execution_options(synchronize_session=False)
+        )
+        job = result.scalar_one_or_none()
+        await session.commit()
+    return job
+
+
+async def renew_job_lease(job_id: int, owner: str) -> bool:
+    """Heartbeat: push back the job's lease expiry; False if this worker no longer holds it."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            update(SyncJob)
+            .where(SyncJob.id == job_id, SyncJob.lease_owner == owner, SyncJob.status == RUNNING)
+            .values(lease_expires_at=lease_deadline(), updated_at=func.now())
+        )
+        await session.commit()
+    return result.rowcount > 0
+
+
+async def run_ingest_job(job: SyncJob) -> None:
+    """
+    Fan the job out into one ingest_items row per page (params["page_ids"], by
+    default every configured page) and follow them to the end.
+
+    The pages are processed by ingest workers (this process and any standalone
+    ingest_worker.py), so pages finished before an interruption keep their
+    outcome and a resumed job only waits for the rest.
+    """
+    params = job.params or {}
+    await enqueue_items(job.id, params.get("page_ids") or DATABASE_IDS, params.get("full", False))
+
+    while True:
+        progress = await job_item_progress(job.id)
+        await update_job(
+            job.id, total=progress["total"], done=progress["done"],
+            completed_pages=progress["completed_pages"], report=progress["report"],
+        )
+        if not progress["open"]:
+            break
+        await asyncio.sleep(settings.sync_poll_interval_s)
+
+    await update_job(job.id, status=COMPLETED, finished_at=datetime.utcnow())
+
+
+async def run_page_job(job: SyncJob) -> None:
+    """Sync one managed NotionPage with its allowed roles, keeping its status in step."""
+    notion_page_id = (job.params or {}).get("notion_page_id")
+    await update_job(job.id, total=1)
+
+    async with AsyncSessionLocal() as session:
+        page = await session.get(NotionPage, notion_page_id)
+        if page is None:
+            raise ValueError(f"Notion page {notion_page_id} not found")
+        notion_page = page.page_id
+        page.status = "syncing"
+        page.error_message = None
+        await session.commit()
+
+        try:
+            # Get page metadata from Notion
+            page_data = await notion_call(notion.pages.retrieve, page_id=notion_page)
+            last_edited_str = page_data.get("last_edited_time")
+            last_edited = parse_notion_time(last_edited_str) if last_edited_str else datetime.utcnow()
+
+            # Update title if changed
+            new_title, _ = page_title_and_url(page_data)
+            if new_title and new_title != "Untitled":
+                page.title = new_title
+
+            # Sync page content with allowed roles
+            await upsert_page(session, notion_page, last_edited, allowed_roles=page.allowed_roles)
+
+            page.status = "synced"
+            page.last_synced = datetime.utcnow()
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            await session.execute(
+                update(NotionPage)
+                .where(NotionPage.id == notion_page_id)
+                .values(status="error", error_message=str(e), updated_at=datetime.utcnow())
+            )
+            await session.commit()
+            raise
+
+    await update_job(
+        job.id, status=COMPLETED, finished_at=datetime.utcnow(), done=1,
+        report={"updated": [notion_page], "skipped": [], "failed": []},
+    )
+    logger.info("Notion page synced successfully", page_id=notion_page)
+
+
+JOB_RUNNERS = {
+    JOB_INGEST: run_ingest_job,
+    JOB_PAGE: run_page_job,
+}
+
+
+async def run_job(job: SyncJob, owner: str) -> None:
+    """Run a claimed job while a heartbeat keeps it leased."""
+
+    async def heartbeat() -> None:
+        while True:
+            await asyncio.sleep(settings.sync_job_heartbeat_s)
+            try:
+                if not await renew_job_lease(job.id, owner):
+                    logger.warning("Sync job lease lost", job_id=job.id, worker=owner)
+            except Exception as e:
+                logger.warning("Failed to renew sync job lease", job_id=job.id, error=str(e))
+
+    logger.info("Sync job started", job_id=job.id, kind=job.kind, worker=owner)
+    beat = asyncio.create_task(heartbeat())
+    try:
+        runner = JOB_RUNNERS.get(job.kind)
+        if runner is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        await runner(job)
+        logger.info("Sync job completed", job_id=job.id)
+    except asyncio.CancelledError:
+        # Shutdown: the job stays running and is reclaimed once its lease expires
+        raise
+    except Exception as e:
+        logger.error("Sync job failed", job_id=job.id, error=str(e))
+        await update_job(job.id, status=FAILED, finished_at=datetime.utcnow(), error=str(e))
+    finally:
+        beat.cancel()
+
+
+async def run_worker(owner: str = WORKER_ID) -> None:
+    """Run claimed jobs one at a time until cancelled (started from the app lifespan)."""
+    while True:
+        _wakeup.clear()
+        try:
+            job = await claim_next_job(owner)
+        except Exception as e:
+            logger.error("Failed to claim sync job", error=str(e))
+            job = None
+
+        if job is not None:
+            await run_job(job, owner)
+            continue
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.sync_poll_interval_s)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,141 @@
+"""Change-detection scheduler: poll Notion edit times and enqueue sync jobs for changed pages."""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from .config import settings
+from .db import AsyncSessionLocal
+from .logger import get_logger
+from .models import NotionPage, SyncCheckpoint
+from .notion_sync import DATABASE_IDS, load_stored_edit_times, fetch_remote_edit_times
+from .sync_jobs import JOB_INGEST, JOB_PAGE, enqueue_job, find_active_job
+from . import metrics
+
+logger = get_logger(__name__)
+
+CHECKPOINT = "change_detection"
+
+# Notion truncates last_edited_time to the minute, so the walk goes a little past the mark
+EDIT_TIME_SLACK = timedelta(minutes=2)
+
+
+def changed_pages(page_ids: List[str], stored: Dict[str, datetime], remote: Dict[str, datetime]) -> List[str]:
+    """
+    Pages edited in Notion after their stored time, plus pages never stored.
+
+    Pages search did not return are left alone: they cannot be checked without
+    a per-page request, and the next full ingest picks them up.
+    """
+    changed = []
+    for page_id in page_ids:
+        edited = remote.get(page_id)
+        if edited is None:
+            continue
+        known = stored.get(page_id)
+        if known is None or edited > known:
+            changed.append(page_id)
+    return changed
+
+
+async def load_managed_pages() -> Dict[str, NotionPage]:
+    """Managed NotionPages that are not syncing right now, keyed by Notion page ID."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(NotionPage).where(NotionPage.status != "syncing"))
+        return {page.page_id: page for page in result.scalars().all()}
+
+
+async def load_checkpoint() -> Optional[datetime]:
+    """Start of the last successful change check, if any."""
+    async with AsyncSessionLocal() as session:
+        return await session.scalar(select(SyncCheckpoint.checked_at).where(SyncCheckpoint.name == CHECKPOINT))
+
+
+async def save_checkpoint(checked_at: datetime) -> None:
+    async with AsyncSessionLocal() as session:
+        stmt = pg_insert(SyncCheckpoint.__table__).values(name=CHECKPOINT, checked_at=checked_at, updated_at=datetime.utcnow())
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"checked_at": stmt.excluded.checked_at, "updated_at": stmt.excluded.updated_at},
+        ))
+        await session.commit()
+
+
+async def check_for_changes() -> Dict[str, List[str]]:
+    """
+    One scheduler pass: compare Notion's last_edited_time with what is stored
+    and enqueue only what changed.
+
+    Configured pages are compared with Document.last_edited and go into one
+    ingest job; managed pages are compared with their last_synced time and get
+    a page job each (so their allowed roles are applied). All edit times come
+    from one newest-first search walk that stops at the start of the last
+    successful pass (the oldest stored time on the first pass), so a pass only
+    reads what was edited since. A pass that defers changed pages does not
+    advance that mark, so the next pass sees them again.
+    """
+    start = time.perf_counter()
+    started_at = datetime.now(timezone.utc)
+    checkpoint = await load_checkpoint()
+    async with AsyncSessionLocal() as session:
+        stored_docs = await load_stored_edit_times(session, DATABASE_IDS)
+    managed = await load_managed_pages()
+    stored_managed = {page_id: page.last_synced for page_id, page in managed.items() if page.last_synced}
+
+    stored = dict(stored_docs)
+    for page_id, synced in stored_managed.items():
+        stored[page_id] = min(synced, stored[page_id]) if page_id in stored else synced
+    remote = await fetch_remote_edit_times(
+        list(dict.fromkeys([*DATABASE_IDS, *managed])),
+        stored,
+        since=checkpoint - EDIT_TIME_SLACK if checkpoint else None,
+    )
+
+    changed_configured = changed_pages(DATABASE_IDS, stored_docs, remote)
+    # Managed pages never synced yet wait for their first manual sync
+    changed_managed = changed_pages(list(stored_managed), stored_managed, remote)
+
+    deferred = False
+    if changed_configured:
+        # Pages still in flight from an earlier pass are detected again once it finishes
+        if await find_active_job(JOB_INGEST) is None:
+            await enqueue_job(JOB_INGEST, {"full": False, "page_ids": changed_configured})
+        else:
+            logger.info("Ingest job already active, deferring changed pages", pages=len(changed_configured))
+            changed_configured = []
+            deferred = True
+
+    for page_id in changed_managed:
+        params = {"notion_page_id": managed[page_id].id}
+        if await find_active_job(JOB_PAGE, params) is None:
+            await enqueue_job(JOB_PAGE, params)
+
+    if not deferred:
+        await save_checkpoint(started_at)
+
+    metrics.incr("scheduler.runs")
+    metrics.incr("scheduler.changed_pages", len(changed_configured) + len(changed_managed))
+    metrics.observe("scheduler_check_ms", (time.perf_counter() - start) * 1000)
+    logger.info("Change detection completed", checked=len(remote),
+                changed=len(changed_configured), changed_managed=len(changed_managed))
+    return {"configured": changed_configured, "managed": changed_managed}
+
+
+def next_delay_s() -> float:
+    """The poll interval with +/- SYNC_SCHEDULER_JITTER spread, so processes do not poll in step."""
+    jitter = settings.sync_scheduler_jitter
+    return settings.sync_scheduler_interval_s * random.uniform(1 - jitter, 1 + jitter)
+
+
+async def run_scheduler() -> None:
+    """Check for changes every interval until cancelled (lifespan task or sync_daemon.py)."""
+    logger.info("Sync scheduler started", interval_s=settings.sync_scheduler_interval_s)
+    while True:
+        await asyncio.sleep(next_delay_s())
+        try:
+            await check_for_changes()
+        except Exception as e:
+            metrics.incr("scheduler.errors")
+            logger.error("Change detection failed", error=str(e))
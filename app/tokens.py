@@ -0,0 +1,100 @@
+"""Token counting helpers for prompt budgeting."""
+import re
+from functools import lru_cache
+from typing import List, Optional
+import tiktoken
+from .config import settings
+
+# Candidate sentence end: terminal punctuation (incl. Russian ellipsis), closing
+# quotes, whitespace, then a capital letter, digit, opening quote or dash
+SENTENCE_END = re.compile(r"[.!?…]+[\"»”)]*\s+(?=[\"«„(\-–—]?[A-ZА-ЯЁ0-9])")
+
+# Words ending in a dot that do not end a sentence
+ABBREVIATIONS = {
+    "т.е", "т.д", "т.п", "т.к", "т.н", "и.о", "др", "пр", "г", "гг", "в", "вв", "см", "ср", "стр", "рис",
+    "табл", "руб", "тыс", "млн", "млрд", "коп", "им", "ул", "д", "кв", "напр", "прим", "англ", "рус",
+    "e.g", "i.e", "etc", "vs", "mr", "mrs", "dr", "fig",
+}
+# Abbreviations only when a number follows ("No. 5", but "said no. Then")
+NUMBER_ABBREVIATIONS = {"no", "nos"}
+
+# Per-message overhead of the chat format (role markers and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Tokens the API adds to prime the assistant reply
+REPLY_PRIMING_TOKENS = 3
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model: Optional[str] = None) -> tiktoken.Encoding:
+    """Get tokenizer for a chat model, falling back to the o200k base encoding."""
+    try:
+        return tiktoken.encoding_for_model(model or settings.openai_chat_model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens in text for the given chat model."""
+    if not text:
+        return 0
+    return len(get_encoding(model).encode(text))
+
+
+def count_message_tokens(contents: List[str], model: Optional[str] = None) -> int:
+    """Count prompt tokens for a list of chat message contents."""
+    return sum(count_tokens(c, model) + MESSAGE_OVERHEAD_TOKENS for c in contents) + REPLY_PRIMING_TOKENS
+
+
+def split_line(line: str) -> List[str]:
+    """Sentences of one line of text."""
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(line):
+        if line[match.start()] == ".":
+            words = line[start:match.start() + 1].split()
+            last = words[-1].rstrip(".").lower() if words else ""
+            if last in ABBREVIATIONS or (len(last) == 1 and last.isalpha()):
+                continue
+            if last in NUMBER_ABBREVIATIONS and line[match.end()].isdigit():
+                continue
+        sentences.append(line[start:match.end()].strip())
+        start = match.end()
+    if line[start:].strip():
+        sentences.append(line[start:].strip())
+    return sentences
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences at terminal punctuation and line breaks (Russian
+    and English), keeping abbreviations ("т.е.", "г.") and initials ("А. С.") intact.
+    """
+    return [sentence for line in text.split("\n") for sentence in split_line(line)]
+
+
+def truncate_to_tokens(text: str, budget: int, model: Optional[str] = None) -> str:
+    """
+    Truncate text to a token budget at a sentence boundary.
+
+    Args:
+        text: Text to truncate
+        budget: Maximum number of tokens
+        model: Chat model whose tokenizer to use
+
+    Returns:
+        Longest sentence prefix that fits the budget (may be empty)
+    """
+    if budget <= 0:
+        return ""
+
+    kept: List[str] = []
+    used = 0
+    for sentence in split_sentences(text):
+        # Sentences are re-joined with a single space
+        cost = count_tokens(sentence, model) + (1 if kept else 0)
+        if used + cost > budget:
+            break
+        kept.append(sentence)
+        used += cost
+
+    return " ".join(kept)
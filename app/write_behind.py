@@ -0,0 +1,217 @@
+"""Write-behind buffers: QueryLog and Feedback rows batched off the request path."""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from .config import settings
+from .db import AsyncSessionLocal
+from .logger import get_logger
+from .models import QueryLog, Feedback
+from .stats import bump, query_log_deltas, feedback_deltas
+from . import metrics
+
+logger = get_logger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Rows of one model queued in memory and inserted in batches.
+
+    `add()` returns at once with a future for the row's assigned ID. A flusher
+    task writes up to `max_batch` rows per multi-row INSERT ... RETURNING id,
+    as soon as a batch is full or `flush_interval_s` after the oldest row.
+    A batch that fails on the connection goes back to the front of the queue.
+    One rejected for its data (constraint, type or missing partition errors) is
+    retried row by row and only the rejected rows are dropped and logged
+    (`write_behind.<name>.rejected`), so one bad row never blocks the rest.
+    The queue holds at most
+    `max_pending` rows: beyond that the oldest are dropped (counted in
+    `write_behind.<name>.dropped`) and their futures resolve to None.
+    `counters` maps a batch to stats counter deltas, applied in the batch's
+    transaction.
+    """
+
+    def __init__(
+        self,
+        model,
+        name: str,
+        max_batch: int,
+        flush_interval_s: float,
+        max_pending: int,
+        counters: Optional[Callable[[List[Dict[str, Any]]], Dict[str, Any]]] = None,
+    ):
+        self.model = model
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval_s = flush_interval_s
+        self.max_pending = max_pending
+        self.counters = counters
+        self._columns = [column for column in model.__table__.columns if column.key != "id"]
+        self._pending: Deque[Tuple[Dict[str, Any], asyncio.Future]] = deque()
+        self._latest: Dict[Hashable, asyncio.Future] = {}
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def _row(self, obj) -> Dict[str, Any]:
+        """Column values of a transient model instance, with Python-side defaults applied."""
+        row = {}
+        for column in self._columns:
+            value = getattr(obj, column.key)
+            if value is None and column.default is not None:
+                value = column.default.arg(None) if column.default.is_callable else column.default.arg
+            row[column.key] = value
+        return row
+
+    def add(self, obj, key: Optional[Hashable] = None) -> asyncio.Future:
+        """
+        Queue a model instance for insertion.
+
+        Returns:
+            Future resolved with the assigned ID (None if the row was dropped).
+            With `key`, the future is also available from latest(key) until then.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((self._row(obj), future))
+        if key is not None:
+            self._latest[key] = future
+            future.add_done_callback(lambda _, key=key: self._forget(key, future))
+
+        while len(self._pending) > self.max_pending:
+            _, dropped = self._pending.popleft()
+            if not dropped.done():
+                dropped.set_result(None)
+            metrics.incr(f"write_behind.{self.name}.dropped")
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        metrics.set_gauge(f"write_behind.{self.name}.pending", len(self._pending))
+        return future
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._latest.get(key) is future:
+            del self._latest[key]
+
+    def latest(self, key: Hashable) -> Optional[asyncio.Future]:
+        """Future ID of the newest row added with `key` that is not written yet."""
+        return self._latest.get(key)
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """Insert rows (and bump their counters) in one transaction; returns their IDs in order."""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                insert(self.model).returning(self.model.id, sort_by_parameter_order=True),
+                rows,
+            )
+            ids = list(result.scalars().all())
+            if self.counters is not None:
+                await bump(session, self.counters(rows))
+            await session.commit()
+        return ids
+
+    async def _insert_rows(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> int:
+        """
+        Insert a rejected batch row by row, resolving each row's future as it
+        goes; rows rejected again are dropped (ID None). If the connection fails
+        midway, the rows not yet tried go back to the front of the queue.
+        """
+        written = 0
+        for position, (row, future) in enumerate(batch):
+            try:
+                row_id: Optional[int] = (await self._insert([row]))[0]
+                written += 1
+            except (IntegrityError, DataError) as e:
+                row_id = None
+                metrics.incr(f"write_behind.{self.name}.rejected")
+                logger.error("Write-behind row rejected", buffer=self.name, row=repr(row)[:500], error=str(e))
+            except BaseException:
+                self._pending.extendleft(reversed(batch[position:]))
+                raise
+            if not future.done():
+                future.set_result(row_id)
+        return written
+
+    async def flush(self) -> int:
+        """Insert queued rows batch by batch; stops at the first batch that fails on the connection."""
+        written = 0
+        async with self._lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+                start = time.perf_counter()
+                try:
+                    ids = await self._insert([row for row, _ in batch])
+                except (IntegrityError, DataError):
+                    try:
+                        stored = await self._insert_rows(batch)
+                    except Exception as e:
+                        metrics.incr(f"write_behind.{self.name}.errors")
+                        logger.error("Write-behind flush failed", buffer=self.name, rows=len(batch), error=str(e))
+                        break
+                except asyncio.CancelledError:
+                    # Shutdown mid-flush: keep the batch for the final flush
+                    self._pending.extendleft(reversed(batch))
+                    raise
+                except Exception as e:
+                    self._pending.extendleft(reversed(batch))
+                    metrics.incr(f"write_behind.{self.name}.errors")
+                    logger.error("Write-behind flush failed", buffer=self.name, rows=len(batch), error=str(e))
+                    break
+                else:
+                    for (_, future), row_id in zip(batch, ids):
+                        if not future.done():
+                            future.set_result(row_id)
+                    stored = len(batch)
+                written += stored
+                metrics.incr(f"write_behind.{self.name}.rows", stored)
+                metrics.observe("write_behind_flush_ms", (time.perf_counter() - start) * 1000)
+        metrics.set_gauge(f"write_behind.{self.name}.pending", len(self._pending))
+        return written
+
+    async def run(self) -> None:
+        """Flush on a full batch or every flush_interval_s, until cancelled."""
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    def drop_pending(self) -> int:
+        """Give up on unwritten rows (shutdown after a failed final flush)."""
+        dropped = len(self._pending)
+        while self._pending:
+            _, future = self._pending.popleft()
+            if not future.done():
+                future.set_result(None)
+        if dropped:
+            metrics.incr(f"write_behind.{self.name}.dropped", dropped)
+            logger.error("Write-behind rows lost at shutdown", buffer=self.name, rows=dropped)
+        return dropped
+
+
+def make_buffer(model, name: str, counters=None) -> WriteBehindBuffer:
+    return WriteBehindBuffer(
+        model, name,
+        max_batch=settings.write_behind_batch,
+        flush_interval_s=settings.write_behind_interval_s,
+        max_pending=settings.write_behind_max_pending,
+        counters=counters,
+    )
+
+
+query_log_buffer = make_buffer(QueryLog, "query_logs", query_log_deltas)
+feedback_buffer = make_buffer(Feedback, "feedback", feedback_deltas)
+BUFFERS = (query_log_buffer, feedback_buffer)
+
+
+async def run_flushers() -> None:
+    """Lifespan task: run every buffer's flusher."""
+    await asyncio.gather(*[buffer.run() for buffer in BUFFERS])
+
+
+async def close_buffers() -> None:
+    """Write whatever is still queued (lifespan shutdown, before the engine is disposed)."""
+    for buffer in BUFFERS:
+        await buffer.flush()
+        buffer.drop_pending()
@@ -0,0 +1 @@
+# Load-test benchmarks for the query and webhook paths
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Chunker micro-benchmark and chunk-quality report: legacy (characters) vs structured (tokens).
+
+    python -m benchmarks.chunking --pages 50 --blocks-per-page 150
+    python -m benchmarks.chunking --from-cache        # Real pages from the block cache (page_snapshots)
+
+Reports per chunker: extraction time, chunk count, token size distribution,
+overlap ratio (tokens repeated from the previous chunk / all chunk tokens),
+share of tiny chunks and the embedding index size.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+from app.config import settings
+from app.metrics import percentile
+from app.tokens import count_tokens
+from app.chunker import chunk_blocks
+from app.notion_sync import extract_chunks_legacy
+from standins.notion_server import Workspace, rich_text
+
+# Chunks under this share of CHUNK_MAX_TOKENS count as tiny
+TINY_SHARE = 0.25
+
+CHUNKERS: Dict[str, Callable[[List[dict]], List[Tuple[str, str]]]] = {
+    "legacy": extract_chunks_legacy,
+    "structured": lambda tree: list(chunk_blocks(tree)),
+}
+
+
+def synthetic_trees(pages: int, blocks_per_page: int, seed: int) -> List[List[dict]]:
+    """Block trees of the Notion stand-in workspace, plus a table and a code block per page."""
+    workspace = Workspace(pages=pages, blocks_per_page=blocks_per_page, seed=seed)
+    rng = random.Random(seed)
+
+    def nest(block_id: str) -> List[dict]:
+        blocks = []
+        for block in workspace.children(block_id):
+            block = dict(block)
+            if block.get("has_children"):
+                block["children"] = nest(block["id"])
+            blocks.append(block)
+        return blocks
+
+    trees = []
+    for page_id in workspace.page_ids:
+        tree = nest(page_id)
+        rows = [["Этап", "Срок", "Ответственный"]] + [
+            [workspace.sentence(rng), f"{rng.randint(1, 14)} дней", rng.choice(["Рекрутер", "Тимлид", "Руководитель"])]
+            for _ in range(rng.randint(3, 15))
+        ]
+        tree.insert(len(tree) // 2, {
+            "type": "table", "table": {"table_width": 3},
+            "children": [{"type": "table_row", "table_row": {"cells": [rich_text(cell) for cell in row]}} for row in rows],
+        })
+        code = "\n".join(f"step_{i} = run('{workspace.sentence(rng)}')" for i in range(rng.randint(3, 30)))
+        tree.append({"type": "code", "code": {"rich_text": rich_text(code), "language": "python"}})
+        trees.append(tree)
+    return trees
+
+
+async def cached_trees() -> List[List[dict]]:
+    """Block trees of every page in the block cache."""
+    from app.db import AsyncSessionLocal, close_db
+    from app.page_cache import iter_snapshots, unpack_snapshot
+
+    trees = []
+    async with AsyncSessionLocal() as session:
+        async for _, _, data in iter_snapshots(session):
+            trees.append(unpack_snapshot(data)[1])
+    await close_db()
+    return trees
+
+
+def overlap_chars(previous: str, current: str, min_chars: int = 10) -> int:
+    """Length of the longest suffix of `previous` (at least min_chars) that starts `current`."""
+    if not current:
+        return 0
+    idx = previous.find(current[0], max(0, len(previous) - len(current)))
+    while 0 <= idx <= len(previous) - min_chars:
+        if current.startswith(previous[idx:]):
+            return len(previous) - idx
+        idx = previous.find(current[0], idx + 1)
+    return 0
+
+
+def quality(chunked: List[List[Tuple[str, str]]]) -> Dict:
+    model = settings.openai_embed_model
+    sizes: List[float] = []
+    overlap_tokens = 0
+    for chunks in chunked:
+        previous = None
+        for _, text in chunks:
+            sizes.append(count_tokens(text, model))
+            if previous is not None:
+                repeated = overlap_chars(previous, text)
+                if repeated:
+                    overlap_tokens += count_tokens(text[:repeated], model)
+            previous = text
+    total = sum(sizes)
+    return {
+        "chunks": len(sizes),
+        "tokens": int(total),
+        "tokens_min": min(sizes) if sizes else None,
+        "tokens_p50": percentile(sizes, 50),
+        "tokens_p95": percentile(sizes, 95),
+        "tokens_max": max(sizes) if sizes else None,
+        "tokens_mean": round(total / len(sizes), 1) if sizes else None,
+        "overlap_ratio": round(overlap_tokens / total, 3) if total else None,
+        "tiny_share": round(sum(1 for size in sizes if size < TINY_SHARE * settings.chunk_max_tokens) / len(sizes), 3) if sizes else None,
+        # float32 vectors only; pgvector adds a small per-row header
+        "index_mb": round(len(sizes) * settings.embedding_dim * 4 / 2**20, 2),
+    }
+
+
+def run(trees: List[List[dict]], repeat: int) -> Dict:
+    results = {}
+    for name, extract in CHUNKERS.items():
+        extract(trees[0])  # Warm the tokenizer
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            chunked = [extract(tree) for tree in trees]
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results[name] = {
+            "pages": len(trees),
+            "best_s": round(best, 3),
+            "ms_per_page": round(best * 1000 / len(trees), 2),
+            **quality(chunked),
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the legacy and structured chunkers")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--blocks-per-page", type=int, default=150)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per chunker (best is reported)")
+    parser.add_argument("--from-cache", action="store_true", help="Use cached real pages instead of synthetic ones")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    trees = asyncio.run(cached_trees()) if args.from_cache else synthetic_trees(args.pages, args.blocks_per_page, args.seed)
+    if not trees:
+        raise SystemExit("No pages to chunk")
+    results = {
+        "settings": {"chunk_max_tokens": settings.chunk_max_tokens, "chunk_overlap_tokens": settings.chunk_overlap_tokens},
+        "chunkers": run(trees, args.repeat),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
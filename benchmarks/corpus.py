@@ -0,0 +1,107 @@
+"""Seeded synthetic corpus (documents, chunks, users) for load tests."""
+import random
+import uuid
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import delete, insert
+from app.config import settings
+from app.db import engine
+from app.logger import get_logger
+from app.models import Document, Chunk, TelegramUser
+from standins.notion_server import WORDS
+from standins.openai_server import fake_embedding, approx_tokens
+
+logger = get_logger(__name__)
+
+# Markers that keep benchmark rows separate from real data
+PAGE_ID_PREFIX = "bench-"
+USERNAME_PREFIX = "bench_"
+BENCH_USER_ID_BASE = 900_000_000
+ROLES = ["Recruiter", "Team Lead", "Head"]
+
+
+def sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 16))
+    return " ".join(words).capitalize() + "."
+
+
+def bench_user_ids(users: int) -> List[int]:
+    return [BENCH_USER_ID_BASE + i for i in range(users)]
+
+
+def make_questions(count: int, seed: int = 0) -> List[str]:
+    """Questions built from corpus vocabulary so retrieval finds matches."""
+    rng = random.Random(f"questions/{seed}")
+    return [
+        "Как " + " ".join(rng.choices(WORDS, k=rng.randint(3, 6))) + "?"
+        for _ in range(count)
+    ]
+
+
+async def seed_corpus(documents: int = 200, chunks_per_document: int = 25, users: int = 50, seed: int = 0) -> Dict[str, int]:
+    """
+    Insert a synthetic corpus with stand-in-compatible embeddings.
+
+    Embeddings come from the OpenAI stand-in's fake_embedding(), so queries
+    served through the stand-in retrieve meaningful neighbours.
+
+    Returns:
+        Counts of inserted rows
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    await clean_corpus()
+
+    async with engine.begin() as conn:
+        await conn.execute(insert(TelegramUser.__table__), [
+            {
+                "user_id": user_id,
+                "username": f"{USERNAME_PREFIX}{i}",
+                "role": ROLES[i % len(ROLES)],
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i, user_id in enumerate(bench_user_ids(users))
+        ])
+
+        for d in range(documents):
+            document_id = uuid.uuid4()
+            allowed_roles = ROLES[rng.randint(0, len(ROLES) - 1):]
+            await conn.execute(insert(Document.__table__).values(
+                id=document_id,
+                notion_page_id=f"{PAGE_ID_PREFIX}{seed}-{d}",
+                title=f"Регламент {d + 1}",
+                url=f"https://www.notion.so/bench-{d}",
+                allowed_roles=allowed_roles,
+                last_edited=now,
+                created_at=now,
+                updated_at=now,
+            ))
+
+            rows = []
+            for c in range(chunks_per_document):
+                content = " ".join(sentence(rng) for _ in range(rng.randint(3, 10)))
+                rows.append({
+                    "id": uuid.uuid4(),
+                    "document_id": document_id,
+                    "chunk_index": c,
+                    "heading_path": " ".join(rng.choices(WORDS, k=3)).capitalize(),
+                    "content": content,
+                    "token_count": approx_tokens(content),
+                    "embedding": fake_embedding(content, settings.embedding_dim),
+                    "allowed_roles": allowed_roles,
+                    "created_at": now,
+                })
+            await conn.execute(insert(Chunk.__table__), rows)
+
+    stats = {"documents": documents, "chunks": documents * chunks_per_document, "users": users}
+    logger.info("Benchmark corpus seeded", **stats)
+    return stats
+
+
+async def clean_corpus() -> None:
+    """Remove all benchmark documents (chunks cascade) and users."""
+    async with engine.begin() as conn:
+        await conn.execute(delete(Document.__table__).where(Document.notion_page_id.like(f"{PAGE_ID_PREFIX}%")))
+        await conn.execute(delete(TelegramUser.__table__).where(TelegramUser.username.like(f"{USERNAME_PREFIX}%")))
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Drive /api/v1/query and the Telegram webhook with concurrent traffic.
+
+Typical run against stand-ins (see README):
+
+    python -m benchmarks.load_test --seed-corpus --duration 60 --concurrency 32 \
+        --baseline benchmarks/baseline.json --output bench_results.json
+
+Exits with status 1 when a metric regresses beyond benchmarks/thresholds.json.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+import httpx
+from app.config import settings
+from app.metrics import percentile
+from benchmarks.corpus import seed_corpus, clean_corpus, make_questions, bench_user_ids
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), "thresholds.json")
+
+
+def telegram_update(update_id: int, user_id: int, text: str) -> Dict:
+    """Minimal private-chat message update."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": text,
+        },
+    }
+
+
+async def run_load(
+    base_url: str,
+    duration: float,
+    concurrency: int,
+    webhook_ratio: float,
+    questions: List[str],
+    user_ids: List[int],
+    seed: int = 0
+) -> Dict[str, Dict]:
+    """
+    Closed-loop load: `concurrency` workers send requests back to back until the deadline.
+
+    Returns:
+        Per-path request latencies (ms) and error counts
+    """
+    rng = random.Random(seed)
+    samples = {"query": {"latencies": [], "errors": 0}, "webhook": {"latencies": [], "errors": 0}}
+    deadline = time.perf_counter() + duration
+    update_ids = iter(range(1, 10 ** 9))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                question = rng.choice(questions)
+                user_id = rng.choice(user_ids)
+
+                if rng.random() < webhook_ratio:
+                    kind = "webhook"
+                    request = client.post(
+                        f"/telegram/webhook/{settings.webhook_secret_path}",
+                        json=telegram_update(next(update_ids), user_id, question),
+                    )
+                else:
+                    kind = "query"
+                    request = client.post(
+                        "/api/v1/query",
+                        json={"question": question, "telegram_user_id": user_id, "include_sources": True},
+                    )
+
+                start = time.perf_counter()
+                try:
+                    response = await request
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                samples[kind]["latencies"].append((time.perf_counter() - start) * 1000)
+                if not ok:
+                    samples[kind]["errors"] += 1
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    return samples
+
+
+def summarize_path(data: Dict, duration: float) -> Dict:
+    latencies = data["latencies"]
+    requests = len(latencies)
+    return {
+        "requests": requests,
+        "errors": data["errors"],
+        "error_rate": round(data["errors"] / requests, 4) if requests else 0.0,
+        "throughput_rps": round((requests - data["errors"]) / duration, 2),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        },
+    }
+
+
+async def fetch_server_metrics(client: httpx.AsyncClient, reset: bool = False) -> Dict:
+    response = await client.get(
+        "/api/v1/admin/metrics",
+        params={"secret": settings.webhook_secret_path, "reset": reset},
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def metric_value(results: Dict, path: str) -> Optional[float]:
+    """Look up a dotted metric path like 'query.latency_ms.p95'."""
+    value = results
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def check_regressions(results: Dict, baseline: Dict, thresholds: List[Dict]) -> List[str]:
+    """
+    Compare results with the baseline.
+
+    Threshold entries: {"metric": path, "max_increase_pct": N}, {"metric": path,
+    "max_decrease_pct": N} or {"metric": path, "max": N} (absolute, no baseline needed).
+
+    Returns:
+        Human-readable failures (empty when everything is within limits)
+    """
+    failures = []
+    for rule in thresholds:
+        path = rule["metric"]
+        current = metric_value(results, path)
+        if current is None:
+            continue
+
+        if "max" in rule and current > rule["max"]:
+            failures.append(f"{path}: {current} > {rule['max']}")
+
+        previous = metric_value(baseline, path) if baseline else None
+        if not previous:
+            continue
+        change_pct = (current - previous) / previous * 100
+        if "max_increase_pct" in rule and change_pct > rule["max_increase_pct"]:
+            failures.append(f"{path}: {previous} -> {current} (+{change_pct:.1f}% > {rule['max_increase_pct']}%)")
+        if "max_decrease_pct" in rule and -change_pct > rule["max_decrease_pct"]:
+            failures.append(f"{path}: {previous} -> {current} ({change_pct:.1f}% < -{rule['max_decrease_pct']}%)")
+
+    return failures
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test the query and webhook paths")
+    parser.add_argument("--base-url", default=settings.api_url)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of load")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds of load before measuring")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--webhook-ratio", type=float, default=0.3, help="Share of traffic sent to the webhook")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seed-corpus", action="store_true", help="(Re)create the synthetic corpus first")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--chunks-per-document", type=int, default=25)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--clean", action="store_true", help="Remove the synthetic corpus afterwards")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="Baseline results file to compare against")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write results to --baseline instead of comparing")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    if args.seed_corpus:
+        await seed_corpus(args.documents, args.chunks_per_document, args.users, args.seed)
+
+    questions = make_questions(500, args.seed)
+    user_ids = bench_user_ids(args.users)
+
+    try:
+        if args.warmup:
+            await run_load(args.base_url, args.warmup, args.concurrency, args.webhook_ratio, questions, user_ids, args.seed)
+
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=30.0) as client:
+            await fetch_server_metrics(client, reset=True)
+            samples = await run_load(
+                args.base_url, args.duration, args.concurrency, args.webhook_ratio, questions, user_ids, args.seed
+            )
+            server = await fetch_server_metrics(client)
+    finally:
+        if args.clean:
+            await clean_corpus()
+
+    histograms = server.get("histograms", {})
+    results = {
+        "config": {
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "webhook_ratio": args.webhook_ratio,
+            "documents": args.documents,
+            "chunks": args.documents * args.chunks_per_document,
+        },
+        "query": summarize_path(samples["query"], args.duration),
+        "webhook": summarize_path(samples["webhook"], args.duration),
+        "server": {
+            "db_pool_wait_ms": histograms.get("db_pool_wait_ms"),
+            "event_loop_lag_ms": histograms.get("event_loop_lag_ms"),
+            "db_pool": server.get("db_pool"),
+        },
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        if args.baseline:
+            with open(args.baseline, "w") as f:
+                json.dump(results, f, indent=2)
+        return 0
+
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    with open(args.thresholds, "r") as f:
+        thresholds = json.load(f)
+
+    failures = check_regressions(results, baseline, thresholds)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -5,11 +5,13 @@ from fastapi import APIRouter, Request, HTTPException, Depends
 from aiogram import Bot, Dispatcher, types
 from aiogram.types import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError
 import httpx
 from app.config import settings
 from app.logger import get_logger
-from app.exceptions import TelegramError
+from app.exceptions import TelegramError, ServiceBusyError
 from app.db import get_db
 from app.models import TelegramUser
 from sqlalchemy import select
@@ -18,10 +20,19 @@ logger = get_logger(__name__)
 
 router = APIRouter()
 
-# Bot setup
-bot = Bot(settings.telegram_bot_token)
+# Bot setup (TELEGRAM_API_URL points the bot at a local Bot API server or stand-in)
+if settings.telegram_api_url:
+    bot = Bot(
+        settings.telegram_bot_token,
+        session=AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_url))
+    )
+else:
+    bot = Bot(settings.telegram_bot_token)
 dp = Dispatcher()
 
+# Shown when the API sheds load or a dependency is briefly unavailable (HTTP 503)
+BUSY_MESSAGE = "⏳ Сейчас слишком много запросов. Пожалуйста, повторите вопрос через минуту."
+
 
 async def is_user_allowed(user_id: int) -> bool:
     """Check if user is allowed to use the bot (check database)."""
@@ -44,14 +55,19 @@ async def is_user_allowed(user_id: int) -> bool:
         return user_id in allowed_users
 
 
-def create_feedback_keyboard(message_id: int) -> InlineKeyboardMarkup:
-    """Create inline keyboard for feedback."""
-    return InlineKeyboardMarkup(inline_keyboard=[
+def create_feedback_keyboard(message_id: int, extractive: bool = False) -> InlineKeyboardMarkup:
+    """Create inline keyboard for feedback (plus a full answer button for extracts)."""
+    keyboard = [
         [
             InlineKeyboardButton(text="👍 Хорошо", callback_data=f"feedback_good_{message_id}"),
             InlineKeyboardButton(text="👎 Плохо", callback_data=f"feedback_bad_{message_id}")
         ]
-    ])
+    ]
+    if extractive:
+        keyboard.append([
+            InlineKeyboardButton(text="📝 Подробный ответ", callback_data=f"full_{message_id}")
+        ])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
 async def send_typing_action(chat_id: int) -> None:
@@ -62,7 +78,7 @@ async def send_typing_action(chat_id: int) -> None:
         logger.warning("Failed to send typing action", chat_id=chat_id, error=str(e))
 
 
-async def call_api(query: str, user_id: int) -> dict:
+async def call_api(query: str, user_id: int, full_answer: bool = False) -> dict:
     """Call the API to process the query."""
     async with httpx.AsyncClient(timeout=60.0) as client:
         try:
@@ -71,7 +87,8 @@ async def call_api(query: str, user_id: int) -> dict:
                 json={
                     "question": query,
                     "telegram_user_id": user_id,
-                    "include_sources": True
+                    "include_sources": True,
+                    "full_answer": full_answer
                 }
             )
             response.raise_for_status()
@@ -80,6 +97,9 @@ async def call_api(query: str, user_id: int) -> dict:
             logger.error("API timeout", user_id=user_id, query=query[:100])
             raise TelegramError("API request timeout")
         except httpx.HTTPStatusError as e:
+            if e.response.status_code == 503:
+                logger.warning("API busy", user_id=user_id, retry_after=e.response.headers.get("Retry-After"))
+                raise ServiceBusyError("API busy")
             logger.error("API HTTP error", status_code=e.response.status_code, user_id=user_id)
             raise TelegramError(f"API error: {e.response.status_code}")
         except Exception as e:
@@ -87,6 +107,31 @@ async def call_api(query: str, user_id: int) -> dict:
             raise TelegramError("API call failed")
 
 
+async def send_answer(message: types.Message, data: dict, user_id: int) -> None:
+    """Send formatted answer, falling back to plain text if Markdown fails."""
+    response_text = await format_response(data)
+    reply_markup = create_feedback_keyboard(message.message_id, extractive=data.get("extractive", False))
+    
+    # Try to send with Markdown first
+    try:
+        await message.reply(
+            response_text,
+            parse_mode="Markdown",
+            disable_web_page_preview=True,
+            reply_markup=reply_markup
+        )
+        logger.info("Response sent with Markdown", user_id=user_id, response_length=len(response_text))
+    except TelegramBadRequest as markdown_error:
+        # If Markdown fails, try without it
+        logger.warning("Markdown parse failed, sending as plain text", error=str(markdown_error))
+        await message.reply(
+            response_text,
+            disable_web_page_preview=True,
+            reply_markup=reply_markup
+        )
+        logger.info("Response sent as plain text", user_id=user_id)
+
+
 async def format_response(data: dict) -> str:
     """Format API response for Telegram."""
     answer = data.get("answer", "Извините, не удалось получить ответ.")
@@ -198,6 +243,12 @@ async def handle_message(message: types.Message):
         # Call API
         try:
             data = await call_api(text, user_id)
+        except ServiceBusyError:
+            try:
+                await message.reply(BUSY_MESSAGE)
+            except Exception:
+                pass
+            return
         except TelegramError as e:
             try:
                 await message.reply(f"❌ Ошибка обработки запроса: {str(e)}")
@@ -214,26 +265,7 @@ async def handle_message(message: types.Message):
         
         # Format and send response
         try:
-            response_text = await format_response(data)
-            
-            # Try to send with Markdown first
-            try:
-                await message.reply(
-                    response_text,
-                    parse_mode="Markdown",
-                    disable_web_page_preview=True,
-                    reply_markup=create_feedback_keyboard(message.message_id)
-                )
-                logger.info("Response sent with Markdown", user_id=user_id, response_length=len(response_text))
-            except TelegramBadRequest as markdown_error:
-                # If Markdown fails, try without it
-                logger.warning("Markdown parse failed, sending as plain text", error=str(markdown_error))
-                await message.reply(
-                    response_text,
-                    disable_web_page_preview=True,
-                    reply_markup=create_feedback_keyboard(message.message_id)
-                )
-                logger.info("Response sent as plain text", user_id=user_id)
+            await send_answer(message, data, user_id)
             
         except TelegramBadRequest as e:
             logger.error("Telegram bad request", error=str(e), user_id=user_id)
@@ -267,6 +299,10 @@ async def handle_callback_query(callback_query: types.CallbackQuery):
         data = callback_query.data
         user_id = callback_query.from_user.id
         
+        if data.startswith("full_"):
+            await handle_full_answer(callback_query)
+            return
+        
         if not data.startswith("feedback_"):
             try:
                 await callback_query.answer("Неизвестная команда")
@@ -330,6 +366,46 @@ async def handle_callback_query(callback_query: types.CallbackQuery):
             pass  # Bot must never crash
 
 
+async def handle_full_answer(callback_query: types.CallbackQuery):
+    """Regenerate an extractive answer as a full LLM answer."""
+    user_id = callback_query.from_user.id
+    original = callback_query.message.reply_to_message if callback_query.message else None
+    question = (original.text or "").strip() if original else ""
+    
+    if not question:
+        try:
+            await callback_query.answer("Исходный вопрос не найден")
+        except Exception:
+            pass
+        return
+    
+    try:
+        await callback_query.answer("⏳ Готовлю подробный ответ...")
+        await callback_query.message.edit_reply_markup(
+            reply_markup=create_feedback_keyboard(original.message_id)
+        )
+    except Exception as e:
+        logger.warning("Error updating callback", error=str(e), user_id=user_id)
+    
+    await send_typing_action(callback_query.message.chat.id)
+    
+    try:
+        data = await call_api(question, user_id, full_answer=True)
+        await send_answer(original, data, user_id)
+        logger.info("Full answer sent", user_id=user_id)
+    except ServiceBusyError:
+        try:
+            await original.reply(BUSY_MESSAGE)
+        except Exception:
+            pass
+    except Exception as e:
+        logger.error("Error sending full answer", error=str(e), user_id=user_id)
+        try:
+            await original.reply("❌ Ошибка обработки запроса. Попробуйте позже.")
+        except Exception:
+            pass
+
+
 @router.post(f"/telegram/webhook/{{secret}}")
 async def telegram_webhook(secret: str, request: Request):
     """Handle Telegram webhook."""
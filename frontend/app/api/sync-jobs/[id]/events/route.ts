@@ -0,0 +1,39 @@
+const API_URL = process.env.API_URL || process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
+
+export const dynamic = "force-dynamic";
+
+export async function GET(
+  request: Request,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  const { id } = await params;
+
+  try {
+    const response = await fetch(`${API_URL}/api/sync-jobs/${id}/events`, {
+      cache: "no-store",
+      signal: request.signal,
+    });
+
+    if (!response.ok || !response.body) {
+      return new Response(JSON.stringify({ error: "Job not found" }), {
+        status: response.status || 500,
+        headers: { "Content-Type": "application/json" },
+      });
+    }
+
+    // Pass the event stream through unbuffered
+    return new Response(response.body, {
+      headers: {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        Connection: "keep-alive",
+      },
+    });
+  } catch (error) {
+    console.error("Error streaming sync job events:", error);
+    return new Response(JSON.stringify({ error: "Internal server error" }), {
+      status: 500,
+      headers: { "Content-Type": "application/json" },
+    });
+  }
+}
@@ -2,12 +2,31 @@
 
 import { useState } from "react";
 import { useRouter } from "next/navigation";
-import { NotionPage } from "@/types";
+import { NotionPage, SyncJob } from "@/types";
 
 export default function PageRow({ page }: { page: NotionPage }) {
   const router = useRouter();
   const [isDeleting, setIsDeleting] = useState(false);
   const [isSyncing, setIsSyncing] = useState(false);
+  const [job, setJob] = useState<SyncJob | null>(null);
+
+  const followJob = (jobId: number) => {
+    const events = new EventSource(`/api/sync-jobs/${jobId}/events`);
+    events.onmessage = (event) => {
+      const data: SyncJob = JSON.parse(event.data);
+      setJob(data);
+      if (data.status === "completed" || data.status === "failed") {
+        events.close();
+        setIsSyncing(false);
+        router.refresh();
+      }
+    };
+    events.onerror = () => {
+      events.close();
+      setIsSyncing(false);
+      router.refresh();
+    };
+  };
 
   const handleDelete = async () => {
     if (!confirm(`Удалить "${page.title}" из списка?`)) {
@@ -41,15 +60,17 @@ export default function PageRow({ page }: { page: NotionPage }) {
       });
 
       if (response.ok) {
+        const data = await response.json();
         router.refresh();
+        followJob(data.job_id);
       } else {
         const data = await response.json();
         alert(data.error || "Не удалось синхронизировать страницу");
+        setIsSyncing(false);
       }
     } catch (error) {
       console.error("Error syncing page:", error);
       alert("Ошибка при синхронизации страницы");
-    } finally {
       setIsSyncing(false);
     }
   };
@@ -59,7 +80,11 @@ export default function PageRow({ page }: { page: NotionPage }) {
       case "synced":
         return <span className="badge badge-success">Синхронизировано</span>;
       case "syncing":
-        return <span className="badge badge-info">Синхронизация...</span>;
+        return (
+          <span className="badge badge-info">
+            {job?.status === "queued" ? "В очереди..." : "Синхронизация..."}
+          </span>
+        );
       case "pending":
         return <span className="badge" style={{ background: "#ffc107", color: "#000" }}>Ожидает</span>;
       case "error":
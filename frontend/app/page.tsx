@@ -1,47 +1,39 @@
 import Link from "next/link";
-import { Document, QueryLog, Feedback } from "@/types";
+import { Document, QueryLog, Feedback, Stats } from "@/types";
 import LogoutButton from "./components/LogoutButton";
 
 const API_URL = process.env.API_URL || process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
+async function fetchJson<T>(path: string, fallback: T): Promise<T> {
+  const res = await fetch(`${API_URL}${path}`, {
+    cache: "no-store",
+    next: { revalidate: 0 }
+  });
+  return res.ok ? await res.json() : fallback;
+}
+
 async function getStats() {
   try {
-    // Fetch documents
-    const docsRes = await fetch(`${API_URL}/api/documents`, { 
-      cache: "no-store",
-      next: { revalidate: 0 }
-    });
-    const documents: Document[] = docsRes.ok ? await docsRes.json() : [];
-
-    // Fetch recent query logs
-    const logsRes = await fetch(`${API_URL}/api/query-logs?limit=10`, { 
-      cache: "no-store",
-      next: { revalidate: 0 }
-    });
-    const queryLogs: QueryLog[] = logsRes.ok ? await logsRes.json() : [];
-
-    // Fetch feedback
-    const feedbackRes = await fetch(`${API_URL}/api/feedback?limit=10`, { 
-      cache: "no-store",
-      next: { revalidate: 0 }
-    });
-    const feedback: Feedback[] = feedbackRes.ok ? await feedbackRes.json() : [];
-
-    return { documents, queryLogs, feedback };
+    // Totals come precomputed; the lists are only the few items shown below
+    const [stats, documents, queryLogs, feedback] = await Promise.all([
+      fetchJson<Stats | null>("/api/v1/stats?days=14", null),
+      fetchJson<Document[]>("/api/documents?limit=5", []),
+      fetchJson<QueryLog[]>("/api/query-logs?limit=5&days=30", []),
+      fetchJson<Feedback[]>("/api/feedback?limit=5", []),
+    ]);
+    return { stats, documents, queryLogs, feedback };
   } catch (error) {
     console.error("Error fetching stats:", error);
-    return { documents: [], queryLogs: [], feedback: [] };
+    return { stats: null, documents: [], queryLogs: [], feedback: [] };
   }
 }
 
 export default async function Home() {
-  const { documents, queryLogs, feedback } = await getStats();
+  const { stats, documents, queryLogs, feedback } = await getStats();
 
-  // Calculate stats
-  const totalDocs = documents.length;
-  const totalQueries = queryLogs.length;
-  const totalFeedback = feedback.length;
-  const goodFeedback = feedback.filter(f => f.rating === "good").length;
+  const totalDocs = stats?.documents ?? 0;
+  const daily = stats?.daily ?? [];
+  const maxDaily = Math.max(1, ...daily.map(d => d.queries));
 
   return (
     <div>
@@ -80,23 +72,56 @@ export default async function Home() {
             <div className="stat-label">Документов</div>
           </div>
           <div className="stat-card">
-            <div className="stat-value">{totalQueries}</div>
+            <div className="stat-value">{stats?.queries ?? 0}</div>
             <div className="stat-label">Всего запросов</div>
           </div>
           <div className="stat-card">
-            <div className="stat-value">{totalFeedback}</div>
+            <div className="stat-value">{stats?.feedback ?? 0}</div>
             <div className="stat-label">Всего отзывов</div>
           </div>
           <div className="stat-card">
             <div className="stat-value">
-              {totalFeedback > 0
-                ? `${Math.round((goodFeedback / totalFeedback) * 100)}%`
+              {stats?.satisfaction != null
+                ? `${Math.round(stats.satisfaction * 100)}%`
                 : "0%"}
             </div>
             <div className="stat-label">Положительных</div>
           </div>
+          <div className="stat-card">
+            <div className="stat-value">${(stats?.cost_usd ?? 0).toFixed(2)}</div>
+            <div className="stat-label">Расходы</div>
+          </div>
         </div>
 
+        {/* Queries per day */}
+        {daily.length > 0 && (
+          <section style={{ marginBottom: "40px" }}>
+            <h2 style={{ marginBottom: "20px", fontSize: "24px" }}>
+              📈 Запросы за {stats?.days} дней
+            </h2>
+            <div className="card">
+              {daily.map((d) => (
+                <div key={d.day} className="card-meta" style={{ display: "flex", alignItems: "center", gap: "10px" }}>
+                  <span style={{ width: "90px" }}>{new Date(d.day).toLocaleDateString('ru-RU')}</span>
+                  <div
+                    style={{
+                      height: "10px",
+                      width: `${(d.queries / maxDaily) * 60}%`,
+                      background: "#4f46e5",
+                      borderRadius: "4px",
+                    }}
+                  />
+                  <span>
+                    {d.queries}
+                    {d.failed > 0 && <> • без ответа: {d.failed}</>}
+                    {d.latency_avg_ms != null && <> • {d.latency_avg_ms}мс</>}
+                  </span>
+                </div>
+              ))}
+            </div>
+          </section>
+        )}
+
         {/* Recent Documents */}
         <section>
           <h2 style={{ marginBottom: "20px", fontSize: "24px" }}>
@@ -133,9 +158,9 @@ export default async function Home() {
                   </div>
                 </div>
               ))}
-              {documents.length > 5 && (
+              {totalDocs > 5 && (
                 <Link href="/documents" className="btn btn-primary">
-                  Все документы ({documents.length})
+                  Все документы ({totalDocs})
                 </Link>
               )}
             </div>
@@ -183,7 +208,7 @@ export default async function Home() {
                   )}
                 </div>
               ))}
-              {queryLogs.length > 5 && (
+              {(stats?.queries ?? 0) > 5 && (
                 <Link href="/query-logs" className="btn btn-primary">
                   Все запросы
                 </Link>
@@ -227,7 +252,7 @@ export default async function Home() {
                   )}
                 </div>
               ))}
-              {feedback.length > 5 && (
+              {(stats?.feedback ?? 0) > 5 && (
                 <Link href="/feedback" className="btn btn-primary">
                   Все отзывы
                 </Link>
@@ -148,7 +148,8 @@ export default async function QueryLogsPage() {
                 </div>
                 {log.prompt_tokens && (
                   <div className="card-meta">
-                    <strong>Токены:</strong> {log.prompt_tokens} промпт +{" "}
+                    <strong>Токены:</strong> {log.prompt_tokens} промпт
+                    {log.cached_prompt_tokens ? <> (из кэша {log.cached_prompt_tokens})</> : null} +{" "}
                     {log.completion_tokens} ответ ={" "}
                     {(log.prompt_tokens || 0) + (log.completion_tokens || 0)}{" "}
                     всего
@@ -28,6 +28,7 @@ export interface QueryLog {
   question: string;
   answer: string;
   prompt_tokens: number | null;
+  cached_prompt_tokens: number | null;
   completion_tokens: number | null;
   model: string | null;
   cost_usd: number | null;
@@ -47,6 +48,42 @@ export interface Feedback {
   comment: string | null;
 }
 
+export interface DailyStats {
+  day: string;
+  queries: number;
+  failed: number;
+  tokens: number;
+  cost_usd: number;
+  latency_avg_ms: number | null;
+  users: number;
+}
+
+export interface RoleStats {
+  role: string | null;
+  queries: number;
+  failed: number;
+  cost_usd: number;
+}
+
+export interface Stats {
+  documents: number;
+  chunks: number;
+  queries: number;
+  queries_failed: number;
+  failure_rate: number | null;
+  prompt_tokens: number;
+  cached_prompt_tokens: number;
+  completion_tokens: number;
+  cost_usd: number;
+  feedback: number;
+  feedback_good: number;
+  satisfaction: number | null;
+  days: number;
+  daily: DailyStats[];
+  by_role: RoleStats[];
+  updated_at: string | null;
+}
+
 export interface TelegramUser {
   user_id: number;
   username: string | null;
@@ -69,6 +106,21 @@ export interface NotionPage {
   updated_at: string;
 }
 
+export interface SyncJob {
+  id: number;
+  kind: string;
+  params: Record<string, unknown>;
+  status: "queued" | "running" | "completed" | "failed";
+  total: number | null;
+  done: number;
+  report: Record<string, unknown> | null;
+  error: string | null;
+  created_at: string | null;
+  started_at: string | null;
+  finished_at: string | null;
+  updated_at: string | null;
+}
+
 // API Response Types
 export interface ApiResponse<T> {
   data?: T;
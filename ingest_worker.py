@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""Standalone ingestion worker: claims ingest_items pages until interrupted. Run as many as needed."""
+import asyncio
+from app.db import close_db
+from app.ingest_workers import run_item_worker
+from app.notion_api import close_notion
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+async def main():
+    try:
+        await run_item_worker()
+    finally:
+        await close_notion()
+        await close_db()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Ingest worker stopped")
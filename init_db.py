@@ -26,6 +26,11 @@ async def init_database():
             await conn.run_sync(Base.metadata.create_all)
             logger.info("Database tables created")
             
+            # query_logs is partitioned; inserts need a partition for the current month
+            from app.log_maintenance import create_partitions
+            await create_partitions(conn)
+            logger.info("Query log partitions created")
+            
         logger.info("Database initialization completed successfully")
         
     except Exception as e:
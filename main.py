@@ -6,9 +6,18 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.logger import get_logger
 from app.db import init_db, close_db
+from app.notion_api import close_notion
+from app.sync_jobs import run_worker
+from app.ingest_workers import run_item_worker
+from app.sync_scheduler import run_scheduler
+from app.metrics import monitor_event_loop_lag
+from app.write_behind import run_flushers, close_buffers
+from app.log_maintenance import ensure_query_log_partitions, run_log_maintenance
+from app.circuit_breaker import breaker_states
 from app.api import router as api_router
 from app.crud_api import router as crud_router
 from app.notion_pages_api import router as notion_pages_router
+from app.notion_webhooks import router as notion_webhooks_router, page_events
 from bot.telegram import router as telegram_router, set_webhook, delete_webhook
 
 logger = get_logger(__name__)
@@ -23,6 +32,7 @@ async def lifespan(app: FastAPI):
     # Initialize database
     try:
         await init_db()
+        await ensure_query_log_partitions()
         logger.info("✓ Database initialized successfully")
     except Exception as e:
         logger.error("✗ Database initialization failed", error=str(e))
@@ -36,6 +46,29 @@ async def lifespan(app: FastAPI):
         logger.error("✗ Telegram webhook configuration failed", error=str(e))
         # Don't raise - continue startup
     
+    if settings.model_router_enabled and settings.openai_fast_model == settings.openai_chat_model:
+        logger.warning("Model router enabled but OPENAI_FAST_MODEL equals OPENAI_CHAT_MODEL; "
+                       "set OPENAI_CHAT_MODEL to a stronger model for routing to have any effect",
+                       model=settings.openai_chat_model)
+    
+    # Start event-loop lag sampling
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    
+    # Batch QueryLog and Feedback inserts off the request path
+    flushers = asyncio.create_task(run_flushers())
+    
+    # Start the background sync job worker
+    sync_worker = asyncio.create_task(run_worker()) if settings.sync_worker_enabled else None
+    
+    # Claim ingest work items here too (more workers: python ingest_worker.py)
+    ingest_worker = asyncio.create_task(run_item_worker()) if settings.ingest_worker_enabled else None
+    
+    # Poll Notion for changed pages (or run python sync_daemon.py on its own)
+    scheduler = asyncio.create_task(run_scheduler()) if settings.sync_scheduler_enabled else None
+    
+    # Create query_logs partitions ahead, refresh daily rollups, drop expired partitions
+    log_maintenance = asyncio.create_task(run_log_maintenance()) if settings.log_maintenance_enabled else None
+    
     logger.info("=== Application startup complete ===")
     
     yield
@@ -43,10 +76,21 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("=== Shutting down Notion RAG Bot ===")
     
+    # Cancel background tasks and wait until they have released their sessions
+    tasks = [
+        task for task in (lag_monitor, sync_worker, ingest_worker, scheduler, log_maintenance, flushers)
+        if task is not None
+    ]
+    for task in tasks:
+        task.cancel()
+    tasks.extend(page_events.cancel_all())
+    await asyncio.gather(*tasks, return_exceptions=True)
     try:
-        # Close database connections only
+        # Write buffered rows, then close database connections
+        await close_buffers()
         await close_db()
         logger.info("✓ Database connections closed")
+        await close_notion()
     except Exception as e:
         logger.error("✗ Shutdown error", error=str(e))
 
@@ -72,6 +116,7 @@ app.add_middleware(
 app.include_router(api_router, prefix="/api/v1")
 app.include_router(crud_router)
 app.include_router(notion_pages_router)
+app.include_router(notion_webhooks_router)
 app.include_router(telegram_router)
 
 
@@ -87,8 +132,13 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for Railway."""
-    return {"status": "healthy"}
+    """Health check endpoint for Railway (always 200; breaker state is informational)."""
+    breakers = breaker_states()
+    degraded = any(b["state"] != "closed" for b in breakers.values())
+    return {
+        "status": "degraded" if degraded else "healthy",
+        "circuit_breakers": {name: b["state"] for name, b in breakers.items()},
+    }
 
 
 @app.get("/ready")
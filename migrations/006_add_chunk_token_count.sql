@@ -0,0 +1,4 @@
+-- Migration 006: Store per-chunk token counts for token-budgeted context packing
+
+-- Token count of chunk content, computed once at ingest (NULL for legacy chunks until re-sync)
+ALTER TABLE chunks ADD COLUMN IF NOT EXISTS token_count INTEGER;
@@ -0,0 +1,7 @@
+-- Migration 007: Track provider-side prompt caching in query logs
+
+-- Prompt tokens served from the provider's prompt cache
+ALTER TABLE query_logs ADD COLUMN IF NOT EXISTS cached_prompt_tokens INTEGER;
+
+-- Hash of the stable prompt prefix (system prompt + context) for cache-hit analysis
+ALTER TABLE query_logs ADD COLUMN IF NOT EXISTS prompt_prefix_hash TEXT;
@@ -0,0 +1,12 @@
+-- Migration 008: Record model router decisions in query logs
+
+-- Router outcome: direct, fast, strong, escalated
+ALTER TABLE query_logs ADD COLUMN IF NOT EXISTS route TEXT;
+
+-- Why the strong model was used: low_similarity, chunk_disagreement, not_found
+ALTER TABLE query_logs ADD COLUMN IF NOT EXISTS route_reason TEXT;
+
+-- Per-tier model, latency, tokens and cost
+ALTER TABLE query_logs ADD COLUMN IF NOT EXISTS route_tiers JSONB;
+
+CREATE INDEX IF NOT EXISTS idx_query_logs_route ON query_logs(route);
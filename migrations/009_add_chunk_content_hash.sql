@@ -0,0 +1,7 @@
+-- Migration 009: Content hashes for diffing chunk upserts
+
+-- SHA-256 (hex) of chunk content; re-syncs keep rows whose content is unchanged
+ALTER TABLE chunks ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Backfill with the same hash the ingester computes (hashlib.sha256 of UTF-8 content)
+UPDATE chunks SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex') WHERE content_hash IS NULL;
@@ -0,0 +1,19 @@
+-- Migration 010: Durable background sync jobs
+
+CREATE TABLE IF NOT EXISTS sync_jobs (
+    id SERIAL PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params JSONB,
+    status TEXT NOT NULL DEFAULT 'queued',
+    total INTEGER,
+    done INTEGER NOT NULL DEFAULT 0,
+    completed_pages TEXT[],
+    report JSONB,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_jobs_status ON sync_jobs(status);
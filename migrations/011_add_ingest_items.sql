@@ -0,0 +1,23 @@
+-- Migration 011: Per-page ingestion work items for distributed workers
+
+CREATE TABLE IF NOT EXISTS ingest_items (
+    id BIGSERIAL PRIMARY KEY,
+    job_id INTEGER REFERENCES sync_jobs(id) ON DELETE CASCADE,
+    page_id TEXT NOT NULL,
+    full_sync BOOLEAN NOT NULL DEFAULT FALSE,
+    status TEXT NOT NULL DEFAULT 'pending',
+    outcome TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires_at TIMESTAMP WITH TIME ZONE,
+    available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Claim scan: pending items whose backoff has passed, and expired leases
+CREATE INDEX IF NOT EXISTS idx_ingest_items_claim ON ingest_items(status, available_at);
+
+-- One item per page per job (re-enqueueing a job is a no-op)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_ingest_items_job_page ON ingest_items(job_id, page_id);
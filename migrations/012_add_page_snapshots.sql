@@ -0,0 +1,15 @@
+-- Migration 012: Raw Notion block cache for re-chunking without refetching
+
+CREATE TABLE IF NOT EXISTS page_snapshots (
+    id BIGSERIAL PRIMARY KEY,
+    page_id TEXT NOT NULL,
+    last_edited TIMESTAMP WITH TIME ZONE NOT NULL,
+    content_hash TEXT NOT NULL,
+    data BYTEA NOT NULL,
+    raw_bytes INTEGER NOT NULL,
+    stored_bytes INTEGER NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- One snapshot per page revision
+CREATE UNIQUE INDEX IF NOT EXISTS uq_page_snapshots_page_edited ON page_snapshots(page_id, last_edited);
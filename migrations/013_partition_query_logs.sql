@@ -0,0 +1,128 @@
+-- Migration 013: Partition query_logs by month; daily rollups
+-- Copies every existing row once; run in a quiet period.
+
+BEGIN;
+
+-- A foreign key to a partitioned table would have to include the partition key,
+-- so feedback.query_log_id becomes a plain reference
+ALTER TABLE feedback DROP CONSTRAINT IF EXISTS feedback_query_log_id_fkey;
+
+-- Move the old table aside, keeping its id sequence
+ALTER TABLE query_logs RENAME TO query_logs_unpartitioned;
+ALTER TABLE query_logs_unpartitioned RENAME CONSTRAINT query_logs_pkey TO query_logs_unpartitioned_pkey;
+ALTER SEQUENCE query_logs_id_seq OWNED BY NONE;
+
+DO $$
+DECLARE
+    idx record;
+BEGIN
+    FOR idx IN
+        SELECT indexname FROM pg_indexes
+        WHERE tablename = 'query_logs_unpartitioned' AND indexname <> 'query_logs_unpartitioned_pkey'
+    LOOP
+        EXECUTE format('DROP INDEX IF EXISTS %I', idx.indexname);
+    END LOOP;
+END $$;
+
+CREATE TABLE query_logs (
+    id BIGINT NOT NULL DEFAULT nextval('query_logs_id_seq'),
+    ts TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    telegram_user_id BIGINT,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    prompt_tokens INTEGER,
+    cached_prompt_tokens INTEGER,
+    prompt_prefix_hash TEXT,
+    completion_tokens INTEGER,
+    model TEXT,
+    cost_usd NUMERIC(10,4),
+    route TEXT,
+    route_reason TEXT,
+    route_tiers JSONB,
+    processing_time_ms INTEGER,
+    has_answer BOOLEAN NOT NULL DEFAULT TRUE,
+    PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
+
+ALTER SEQUENCE query_logs_id_seq OWNED BY query_logs.id;
+
+CREATE INDEX IF NOT EXISTS ix_query_logs_ts ON query_logs(ts);
+CREATE INDEX IF NOT EXISTS ix_query_logs_telegram_user_id ON query_logs(telegram_user_id);
+CREATE INDEX IF NOT EXISTS ix_query_logs_has_answer ON query_logs(has_answer);
+CREATE INDEX IF NOT EXISTS idx_query_logs_route ON query_logs(route);
+
+-- Rows outside every monthly partition (late, replayed or beyond the precreated
+-- months); the maintenance task moves them out when their month is created
+CREATE TABLE IF NOT EXISTS query_logs_default PARTITION OF query_logs DEFAULT;
+
+-- Monthly partitions (query_logs_pYYYYMM) from the oldest row to two months ahead
+DO $$
+DECLARE
+    month date := date_trunc('month', COALESCE((SELECT min(ts) FROM query_logs_unpartitioned), NOW()) AT TIME ZONE 'UTC')::date;
+    last_month date := (date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '2 months')::date;
+BEGIN
+    WHILE month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF query_logs FOR VALUES FROM (%L) TO (%L)',
+            'query_logs_p' || to_char(month, 'YYYYMM'),
+            month::timestamp AT TIME ZONE 'UTC',
+            (month + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+        );
+        month := (month + INTERVAL '1 month')::date;
+    END LOOP;
+END $$;
+
+INSERT INTO query_logs (
+    id, ts, telegram_user_id, question, answer, prompt_tokens, cached_prompt_tokens, prompt_prefix_hash,
+    completion_tokens, model, cost_usd, route, route_reason, route_tiers, processing_time_ms, has_answer
+)
+SELECT
+    id, ts, telegram_user_id, question, answer, prompt_tokens, cached_prompt_tokens, prompt_prefix_hash,
+    completion_tokens, model, cost_usd, route, route_reason, route_tiers, processing_time_ms, COALESCE(has_answer, TRUE)
+FROM query_logs_unpartitioned;
+
+DROP TABLE query_logs_unpartitioned;
+
+-- Daily rollups per user and role (filled by the log maintenance task)
+CREATE TABLE IF NOT EXISTS query_log_daily (
+    day DATE NOT NULL,
+    telegram_user_id BIGINT NOT NULL,
+    role TEXT NOT NULL,
+    queries INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    cached_prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    cost_usd NUMERIC(12,4) NOT NULL DEFAULT 0,
+    latency_avg_ms INTEGER,
+    latency_p50_ms INTEGER,
+    latency_p95_ms INTEGER,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (day, telegram_user_id, role)
+);
+
+-- Backfill rollups for the data already logged
+INSERT INTO query_log_daily (
+    day, telegram_user_id, role, queries, failed, prompt_tokens, cached_prompt_tokens,
+    completion_tokens, cost_usd, latency_avg_ms, latency_p50_ms, latency_p95_ms, updated_at
+)
+SELECT
+    (q.ts AT TIME ZONE 'UTC')::date,
+    COALESCE(q.telegram_user_id, 0),
+    COALESCE(u.role, ''),
+    count(*),
+    count(*) FILTER (WHERE NOT q.has_answer),
+    COALESCE(sum(q.prompt_tokens), 0),
+    COALESCE(sum(q.cached_prompt_tokens), 0),
+    COALESCE(sum(q.completion_tokens), 0),
+    COALESCE(sum(q.cost_usd), 0),
+    round(avg(q.processing_time_ms)),
+    round(percentile_cont(0.5) WITHIN GROUP (ORDER BY q.processing_time_ms)),
+    round(percentile_cont(0.95) WITHIN GROUP (ORDER BY q.processing_time_ms)),
+    NOW()
+FROM query_logs q
+LEFT JOIN telegram_users u ON u.user_id = q.telegram_user_id
+GROUP BY 1, 2, 3
+ON CONFLICT (day, telegram_user_id, role) DO NOTHING;
+
+COMMIT;
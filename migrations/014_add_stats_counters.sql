@@ -0,0 +1,27 @@
+-- Migration 014: Incrementally maintained dashboard counters
+-- Seeded from the current tables; kept up to date by the application afterwards.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS stats_counters (
+    name TEXT PRIMARY KEY,
+    value NUMERIC(20,4) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO stats_counters (name, value)
+SELECT name, value FROM (
+    SELECT 'documents' AS name, count(*)::numeric AS value FROM documents
+    UNION ALL SELECT 'chunks', count(*) FROM chunks
+    UNION ALL SELECT 'feedback', count(*) FROM feedback
+    UNION ALL SELECT 'feedback_good', count(*) FROM feedback WHERE rating = 'good'
+    UNION ALL SELECT 'queries', count(*) FROM query_logs
+    UNION ALL SELECT 'queries_failed', count(*) FROM query_logs WHERE NOT has_answer
+    UNION ALL SELECT 'prompt_tokens', COALESCE(sum(prompt_tokens), 0) FROM query_logs
+    UNION ALL SELECT 'cached_prompt_tokens', COALESCE(sum(cached_prompt_tokens), 0) FROM query_logs
+    UNION ALL SELECT 'completion_tokens', COALESCE(sum(completion_tokens), 0) FROM query_logs
+    UNION ALL SELECT 'cost_usd', COALESCE(sum(cost_usd), 0) FROM query_logs
+) AS seed
+ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value, updated_at = NOW();
+
+COMMIT;
@@ -0,0 +1,12 @@
+-- Migration 015: High-water marks for periodic sync tasks
+-- Change detection stops its Notion search walk at the start of the last successful pass.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS sync_checkpoints (
+    name TEXT PRIMARY KEY,
+    checked_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+COMMIT;
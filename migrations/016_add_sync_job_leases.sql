@@ -0,0 +1,4 @@
+-- Migration 016: Leases on running sync jobs, so several workers can share the queue
+
+ALTER TABLE sync_jobs ADD COLUMN IF NOT EXISTS lease_owner TEXT;
+ALTER TABLE sync_jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITH TIME ZONE;
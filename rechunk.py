@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Rebuild chunks from the raw block cache (page_snapshots) without calling Notion."""
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+from sqlalchemy import select
+from app.db import AsyncSessionLocal, close_db
+from app.models import Document
+from app.notion_sync import extract_chunks, page_title_and_url, write_page
+from app.page_cache import iter_snapshots, unpack_snapshot
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+async def rechunk(page_ids: Optional[List[str]] = None, dry_run: bool = False):
+    """
+    Re-extract every cached page that still has a document and diff its chunks
+    against the stored ones.
+
+    Unchanged chunks keep their rows and embeddings, so only chunks whose text
+    changed are embedded. With dry_run nothing is written or embedded.
+    """
+    started = time.perf_counter()
+    totals = {"pages": 0, "chunks": 0, "unchanged": 0, "updated": 0, "inserted": 0, "deleted": 0, "failed": 0}
+
+    async with AsyncSessionLocal() as reader:
+        async for page_id, last_edited, data in iter_snapshots(reader, page_ids):
+            totals["pages"] += 1
+            page, tree = unpack_snapshot(data)
+            title, url = page_title_and_url(page)
+            chunks_with_path = extract_chunks(tree)
+            totals["chunks"] += len(chunks_with_path)
+            if dry_run:
+                print(f"page     {page_id}: {len(chunks_with_path)} chunks")
+                continue
+
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        select(Document.allowed_roles).where(Document.notion_page_id == page_id)
+                    )
+                    row = result.one_or_none()
+                    if row is None:
+                        # Deleted since the snapshot was read
+                        print(f"deleted  {page_id}")
+                        continue
+                    allowed_roles = row.allowed_roles
+                    counts = await write_page(session, page_id, last_edited, title, url, chunks_with_path, allowed_roles)
+                    await session.commit()
+            except Exception as e:
+                totals["failed"] += 1
+                print(f"failed   {page_id}: {e}")
+                continue
+            for key, value in counts.items():
+                totals[key] += value
+            print(f"page     {page_id}: " + ", ".join(f"{key} {value}" for key, value in counts.items()))
+
+    if page_ids:
+        # Pages never fetched since the cache was enabled
+        found = totals["pages"]
+        if found < len(page_ids):
+            print(f"missing  {len(page_ids) - found} of {len(page_ids)} pages have no snapshot or no document (run sync_notion.py --full)")
+
+    totals["wall_s"] = round(time.perf_counter() - started, 2)
+    logger.info("Re-chunk completed", dry_run=dry_run, **totals)
+    print("total    " + ", ".join(f"{key} {value}" for key, value in totals.items()))
+    await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild chunks from cached Notion block trees")
+    parser.add_argument("--page", action="append", dest="page_ids", help="Only this page (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Only extract and count chunks")
+    args = parser.parse_args()
+    asyncio.run(rechunk(page_ids=args.page_ids, dry_run=args.dry_run))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Replay logged questions through the pipeline and report latency, cost and diffs."""
+import argparse
+import asyncio
+import json
+import os
+from datetime import datetime
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--failed-only", action="store_true", help="Only questions logged with has_answer = false")
+    parser.add_argument("--bad-feedback", action="store_true", help="Only questions rated 'bad' in feedback")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only questions asked since (ISO date)")
+    parser.add_argument("--limit", type=int, default=100, help="Maximum number of questions to replay")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions in flight at once")
+    parser.add_argument("--rate", type=float, help="Mean arrival rate, questions per second (default: unpaced)")
+    parser.add_argument("--openai-base-url", help="OpenAI-compatible endpoint, e.g. a local stand-in server")
+    parser.add_argument("--baseline", help="Results file of a previous replay to diff retrieval against")
+    parser.add_argument("--output", help="Write full per-question results to this JSON file")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> None:
+    """Load, replay and report."""
+    # Imported here so that --openai-base-url applies before clients are created
+    from app.db import AsyncSessionLocal, close_db
+    from app.replay import load_queries, replay, summarize
+
+    try:
+        async with AsyncSessionLocal() as db:
+            queries = await load_queries(
+                db,
+                failed_only=args.failed_only,
+                bad_feedback_only=args.bad_feedback,
+                since=args.since,
+                limit=args.limit,
+            )
+
+        results = await replay(queries, concurrency=args.concurrency, rate=args.rate)
+
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)["results"]
+
+        report = summarize(results, baseline=baseline)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"report": report, "results": results}, f, ensure_ascii=False, indent=2, default=str)
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.openai_base_url:
+        os.environ["OPENAI_BASE_URL"] = args.openai_base_url
+    asyncio.run(main(args))
@@ -0,0 +1 @@
+# Local stand-in servers for OpenAI, Notion and Telegram (load testing)
@@ -0,0 +1,45 @@
+"""Run a stand-in server: python -m standins {openai,notion,telegram} [options]."""
+import argparse
+import uvicorn
+from .behavior import Behavior
+from . import openai_server, notion_server, telegram_server
+
+DEFAULT_PORTS = {"openai": 9101, "notion": 9102, "telegram": 9103}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("service", choices=sorted(DEFAULT_PORTS))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:MS | uniform:LO,HI | lognormal:MEDIAN,SIGMA | exp:MEAN")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on injected 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dim", type=int, default=1536, help="OpenAI: embedding dimension")
+    parser.add_argument("--pages", type=int, default=50, help="Notion: number of synthetic pages")
+    parser.add_argument("--blocks-per-page", type=int, default=150, help="Notion: blocks per page (incl. nested)")
+    args = parser.parse_args()
+
+    behavior = Behavior(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after_s=args.retry_after,
+        seed=args.seed,
+    )
+
+    if args.service == "openai":
+        app = openai_server.create_app(behavior, dim=args.dim)
+    elif args.service == "notion":
+        app = notion_server.create_app(behavior, pages=args.pages, blocks_per_page=args.blocks_per_page, seed=args.seed)
+        print("NOTION_DATABASE_IDS=" + ",".join(app.state.workspace.page_ids))
+    else:
+        app = telegram_server.create_app(behavior)
+
+    uvicorn.run(app, host=args.host, port=args.port or DEFAULT_PORTS[args.service], log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Latency and fault injection shared by the stand-in servers."""
+import asyncio
+import random
+from typing import Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class Behavior:
+    """
+    Latency distribution and error injection for a stand-in server.
+
+    Latency specs (milliseconds):
+        fixed:200
+        uniform:100,400
+        lognormal:300,0.5   (median, sigma)
+        exp:250             (mean)
+    """
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after_s: float = 1.0,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_s = retry_after_s
+        self.random = random.Random(seed)
+        self._sample = self._parse_latency(latency)
+
+    def _parse_latency(self, spec: str):
+        kind, _, args = spec.partition(":")
+        values = [float(x) for x in args.split(",") if x.strip()]
+
+        if kind == "fixed":
+            return lambda: values[0]
+        if kind == "uniform":
+            return lambda: self.random.uniform(values[0], values[1])
+        if kind == "lognormal":
+            median, sigma = values
+            return lambda: self.random.lognormvariate(0, sigma) * median
+        if kind == "exp":
+            return lambda: self.random.expovariate(1.0 / values[0])
+        raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample_latency_s(self) -> float:
+        """Sample one response delay in seconds."""
+        return max(0.0, self._sample()) / 1000.0
+
+    def sample_fault(self) -> Optional[int]:
+        """Sample an injected HTTP status (429 or 500), or None for success."""
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+
+def install_behavior(app: FastAPI, behavior: Behavior, error_body) -> None:
+    """
+    Apply latency and fault injection to every request of a stand-in app.
+
+    Args:
+        app: Stand-in FastAPI app
+        behavior: Latency and fault configuration
+        error_body: Callable (status_code) -> JSON body in the mimicked API's error format
+    """
+    app.state.behavior = behavior
+
+    @app.middleware("http")
+    async def inject(request: Request, call_next):
+        await asyncio.sleep(behavior.sample_latency_s())
+
+        status = behavior.sample_fault()
+        if status == 429:
+            return JSONResponse(
+                error_body(429),
+                status_code=429,
+                headers={"Retry-After": str(behavior.retry_after_s)},
+            )
+        if status:
+            return JSONResponse(error_body(status), status_code=status)
+
+        return await call_next(request)
@@ -0,0 +1,185 @@
+"""Notion API stand-in serving a deterministic synthetic workspace."""
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from .behavior import Behavior, install_behavior
+
+WORDS = (
+    "кандидат собеседование вакансия рекрутер заказчик оффер скрининг резюме "
+    "регламент срок согласование тимлид руководитель отчет воронка интервью "
+    "требование стек зарплата грейд договор клиент этап проверка рекомендация "
+    "анкета отказ обратная связь календарь встреча шаблон письмо база доступ"
+).split()
+
+MAX_PAGE_SIZE = 100
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def rich_text(text: str) -> List[Dict]:
+    """Notion rich text array with a single plain segment."""
+    return [{"type": "text", "text": {"content": text}, "plain_text": text, "annotations": {}}]
+
+
+def iso(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+class Workspace:
+    """Synthetic pages with heading/paragraph/list/toggle block trees."""
+
+    def __init__(self, pages: int = 50, blocks_per_page: int = 150, seed: int = 0):
+        self.seed = seed
+        self.blocks_per_page = blocks_per_page
+        rng = random.Random(seed)
+        self.page_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(pages)]
+        self.last_edited = {
+            page_id: BASE_TIME + timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+            for page_id in self.page_ids
+        }
+        self.revisions = {page_id: 0 for page_id in self.page_ids}
+        self.deleted = set()
+        self.block_owner: Dict[str, str] = {}
+
+    def sentence(self, rng: random.Random) -> str:
+        words = rng.choices(WORDS, k=rng.randint(6, 16))
+        return " ".join(words).capitalize() + rng.choice([".", ".", ".", "!", "?"])
+
+    def page(self, page_id: str) -> Dict:
+        title = f"Регламент {self.page_ids.index(page_id) + 1}"
+        return {
+            "object": "page",
+            "id": page_id,
+            "created_time": iso(BASE_TIME),
+            "last_edited_time": iso(self.last_edited[page_id]),
+            "archived": page_id in self.deleted,
+            "url": f"https://www.notion.so/{title.replace(' ', '-')}-{page_id.replace('-', '')}",
+            "properties": {"title": {"id": "title", "type": "title", "title": rich_text(title)}},
+        }
+
+    def touch(self, page_id: str) -> None:
+        """Simulate an edit: bump last_edited_time and regenerate content."""
+        self.revisions[page_id] += 1
+        self.last_edited[page_id] = datetime.now(timezone.utc)
+
+    def children(self, block_id: str) -> List[Dict]:
+        page_id = block_id if block_id in self.revisions else self.block_owner.get(block_id)
+        if page_id is None:
+            return []
+        return self._page_blocks(page_id, self.revisions[page_id]).get(block_id, [])
+
+    @lru_cache(maxsize=256)
+    def _page_blocks(self, page_id: str, revision: int) -> Dict[str, List[Dict]]:
+        """Block tree of one page revision: parent id -> ordered child blocks."""
+        rng = random.Random(f"{self.seed}/{page_id}/{revision}")
+        tree: Dict[str, List[Dict]] = {page_id: []}
+        counter = {"n": 0}
+
+        def block(parent: str, block_type: str, text: str, has_children: bool = False) -> Dict:
+            counter["n"] += 1
+            block_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{page_id}/{revision}/{counter['n']}"))
+            self.block_owner[block_id] = page_id
+            item = {
+                "object": "block",
+                "id": block_id,
+                "type": block_type,
+                "has_children": has_children,
+                block_type: {"rich_text": rich_text(text)},
+            }
+            tree[parent].append(item)
+            if has_children:
+                tree[block_id] = []
+            return item
+
+        while counter["n"] < self.blocks_per_page:
+            block(page_id, rng.choice(["heading_1", "heading_2", "heading_3"]), " ".join(rng.choices(WORDS, k=3)).capitalize())
+            for _ in range(rng.randint(2, 8)):
+                kind = rng.choice(["paragraph", "paragraph", "bulleted_list_item", "numbered_list_item", "quote", "toggle"])
+                if kind == "toggle":
+                    toggle = block(page_id, "toggle", self.sentence(rng), has_children=True)
+                    for _ in range(rng.randint(1, 4)):
+                        block(toggle["id"], "paragraph", self.sentence(rng))
+                else:
+                    block(page_id, kind, " ".join(self.sentence(rng) for _ in range(rng.randint(1, 4))))
+
+        return tree
+
+
+def paginate(items: List[Dict], start_cursor: Optional[str], page_size: Optional[int]) -> Dict:
+    """Notion-style cursor pagination over a list."""
+    start = int(start_cursor) if start_cursor else 0
+    size = min(int(page_size or MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+    end = start + size
+    return {
+        "object": "list",
+        "results": items[start:end],
+        "next_cursor": str(end) if end < len(items) else None,
+        "has_more": end < len(items),
+    }
+
+
+def create_app(behavior: Behavior, pages: int = 50, blocks_per_page: int = 150, seed: int = 0) -> FastAPI:
+    """Create the Notion stand-in app (base_url = http://host:port)."""
+    app = FastAPI(title="Notion stand-in")
+    workspace = Workspace(pages=pages, blocks_per_page=blocks_per_page, seed=seed)
+    app.state.workspace = workspace
+    install_behavior(app, behavior, lambda status: {
+        "object": "error",
+        "status": status,
+        "code": "rate_limited" if status == 429 else "internal_server_error",
+        "message": "Rate limited" if status == 429 else "Injected server error",
+    })
+
+    def not_found(object_id: str) -> JSONResponse:
+        return JSONResponse(
+            {"object": "error", "status": 404, "code": "object_not_found", "message": f"Could not find {object_id}"},
+            status_code=404,
+        )
+
+    @app.get("/v1/pages/{page_id}")
+    async def retrieve_page(page_id: str):
+        if page_id not in workspace.revisions:
+            return not_found(page_id)
+        return workspace.page(page_id)
+
+    @app.get("/v1/blocks/{block_id}/children")
+    async def list_children(block_id: str, start_cursor: Optional[str] = None, page_size: Optional[int] = None):
+        return paginate(workspace.children(block_id), start_cursor, page_size)
+
+    @app.post("/v1/search")
+    async def search(request: Request):
+        body = await request.json() if await request.body() else {}
+        pages = [workspace.page(pid) for pid in workspace.page_ids if pid not in workspace.deleted]
+        pages.sort(key=lambda p: p["last_edited_time"], reverse=True)
+        return paginate(pages, body.get("start_cursor"), body.get("page_size"))
+
+    @app.post("/v1/databases/{database_id}/query")
+    async def query_database(database_id: str, request: Request):
+        body = await request.json() if await request.body() else {}
+        pages = [workspace.page(pid) for pid in workspace.page_ids if pid not in workspace.deleted]
+        return paginate(pages, body.get("start_cursor"), body.get("page_size"))
+
+    # Stand-in control endpoints (not part of the Notion API)
+    @app.get("/standin/pages")
+    async def standin_pages():
+        return {"page_ids": workspace.page_ids}
+
+    @app.post("/standin/pages/{page_id}/touch")
+    async def standin_touch(page_id: str):
+        if page_id not in workspace.revisions:
+            return not_found(page_id)
+        workspace.touch(page_id)
+        return workspace.page(page_id)
+
+    @app.post("/standin/pages/{page_id}/delete")
+    async def standin_delete(page_id: str):
+        if page_id not in workspace.revisions:
+            return not_found(page_id)
+        workspace.deleted.add(page_id)
+        workspace.touch(page_id)
+        return workspace.page(page_id)
+
+    return app
@@ -0,0 +1,142 @@
+"""OpenAI API stand-in: deterministic embeddings and chat completions."""
+import hashlib
+import math
+import re
+import time
+from typing import Dict, List, Union
+from fastapi import FastAPI, Request
+from .behavior import Behavior, install_behavior
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+# Provider-side caching applies to prompt prefixes of at least this many tokens
+CACHE_MIN_TOKENS = 1024
+CACHE_INCREMENT_TOKENS = 128
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token estimate (about 3 characters per token for Russian text)."""
+    return max(1, len(text) // 3) if text else 0
+
+
+def fake_embedding(text: str, dim: int = 1536) -> List[float]:
+    """
+    Deterministic unit-length embedding from hashed words.
+
+    Texts that share words get similar vectors, so vector search over a
+    stand-in corpus behaves plausibly.
+    """
+    vector = [0.0] * dim
+    for word in WORD.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "big")
+        vector[value % dim] += 1.0 if (value >> 32) & 1 else -1.0
+
+    norm = math.sqrt(sum(v * v for v in vector))
+    if not norm:
+        # No words: fall back to a single hashed dimension
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+        vector[int.from_bytes(digest, "big") % dim] = 1.0
+        return vector
+    return [v / norm for v in vector]
+
+
+def fake_answer(messages: List[Dict]) -> str:
+    """Deterministic answer quoting the start of the first context block."""
+    user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    if "Контекст не найден." in user:
+        return "Я не нашел этого в регламентах."
+
+    lines = []
+    for line in user.splitlines():
+        line = line.strip()
+        if not line or line.startswith(("##", "**", "---", "Контекст из регламентов", "Вопрос:", "Ответ:")):
+            continue
+        lines.append(line)
+        if sum(len(x) for x in lines) > 300:
+            break
+
+    if not lines:
+        return "Я не нашел этого в регламентах."
+    return "**Согласно регламенту:**\n" + "\n".join(lines)
+
+
+def create_app(behavior: Behavior, dim: int = 1536) -> FastAPI:
+    """Create the OpenAI stand-in app (mount point: base_url = http://host:port/v1)."""
+    app = FastAPI(title="OpenAI stand-in")
+    install_behavior(app, behavior, lambda status: {
+        "error": {
+            "message": "Rate limit reached" if status == 429 else "Injected server error",
+            "type": "requests" if status == 429 else "server_error",
+            "code": "rate_limit_exceeded" if status == 429 else None,
+        }
+    })
+
+    seen_prefixes = set()
+    counter = {"n": 0}
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "standin", "object": "model", "owned_by": "standin"}]}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs: Union[str, List[str]] = body["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+
+        size = body.get("dimensions") or dim
+        tokens = sum(approx_tokens(text) for text in inputs)
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text, size)}
+                for i, text in enumerate(inputs)
+            ],
+            "model": body.get("model", "standin-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        answer = fake_answer(messages)
+
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        prompt_tokens = approx_tokens(prompt)
+        completion_tokens = min(approx_tokens(answer), body.get("max_tokens") or 10 ** 6)
+
+        # Emulate prefix caching: everything before the question counts as the prefix
+        prefix = prompt.rsplit("Вопрос:", 1)[0]
+        prefix_tokens = approx_tokens(prefix)
+        prefix_key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        cached_tokens = 0
+        if prefix_tokens >= CACHE_MIN_TOKENS:
+            if prefix_key in seen_prefixes:
+                cached_tokens = prefix_tokens - prefix_tokens % CACHE_INCREMENT_TOKENS
+            seen_prefixes.add(prefix_key)
+
+        counter["n"] += 1
+        return {
+            "id": f"chatcmpl-standin-{counter['n']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "standin"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        }
+
+    return app
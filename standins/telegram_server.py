@@ -0,0 +1,59 @@
+"""Telegram Bot API stand-in that accepts and records bot calls."""
+import time
+from typing import Dict
+from fastapi import FastAPI, Request
+from .behavior import Behavior, install_behavior
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Stand-in bot", "username": "standin_bot"}
+
+
+async def read_params(request: Request) -> Dict:
+    """Bot API parameters arrive as JSON, form or multipart data."""
+    if request.headers.get("content-type", "").startswith("application/json"):
+        return await request.json()
+    form = await request.form()
+    return dict(form)
+
+
+def create_app(behavior: Behavior) -> FastAPI:
+    """Create the Bot API stand-in app (TELEGRAM_API_URL = http://host:port)."""
+    app = FastAPI(title="Telegram stand-in")
+    install_behavior(app, behavior, lambda status: {
+        "ok": False,
+        "error_code": status,
+        "description": "Too Many Requests: retry later" if status == 429 else "Internal Server Error",
+        **({"parameters": {"retry_after": int(behavior.retry_after_s) or 1}} if status == 429 else {}),
+    })
+
+    calls: Dict[str, int] = {}
+    counter = {"message_id": 0}
+
+    def message(params: Dict) -> Dict:
+        counter["message_id"] += 1
+        return {
+            "message_id": counter["message_id"],
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+
+    @app.post("/bot{token}/{method}")
+    async def bot_method(token: str, method: str, request: Request):
+        params = await read_params(request)
+        calls[method] = calls.get(method, 0) + 1
+
+        if method == "getMe":
+            return {"ok": True, "result": BOT_USER}
+        if method in ("sendMessage", "editMessageText"):
+            return {"ok": True, "result": message(params)}
+        if method == "editMessageReplyMarkup":
+            return {"ok": True, "result": message(params) if params.get("chat_id") else True}
+        return {"ok": True, "result": True}
+
+    # Stand-in control endpoint (not part of the Bot API)
+    @app.get("/standin/calls")
+    async def standin_calls():
+        return calls
+
+    return app
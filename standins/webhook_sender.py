@@ -0,0 +1,83 @@
+"""
+Send signed Notion-style webhook events to the API (stand-in for Notion's webhook delivery).
+
+    python -m standins.webhook_sender PAGE_ID --token TOKEN [--type page.content_updated] [--burst 5]
+
+With --notion pointing at the Notion stand-in, the page is edited (or deleted)
+there first, so the re-sync the event triggers sees a change.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import httpx
+
+SIGNATURE_HEADER = "X-Notion-Signature"
+
+
+def sign(body: bytes, token: str) -> str:
+    """HMAC-SHA256 of the raw body keyed with the verification token, as Notion signs deliveries."""
+    return "sha256=" + hmac.new(token.encode(), body, hashlib.sha256).hexdigest()
+
+
+def make_event(page_id: str, event_type: str) -> Dict:
+    """Event body in the shape of Notion's integration webhooks."""
+    return {
+        "id": str(uuid.uuid4()),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "workspace_id": str(uuid.UUID(int=0)),
+        "subscription_id": str(uuid.UUID(int=1)),
+        "integration_id": str(uuid.UUID(int=2)),
+        "type": event_type,
+        "authors": [{"id": str(uuid.UUID(int=3)), "type": "person"}],
+        "attempt_number": 1,
+        "entity": {"id": page_id, "type": "page"},
+        "data": {},
+    }
+
+
+async def send_events(
+    url: str,
+    token: str,
+    page_id: str,
+    event_type: str,
+    burst: int = 1,
+    interval_s: float = 0.2,
+    notion_url: Optional[str] = None
+) -> None:
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        for n in range(burst):
+            if notion_url:
+                action = "delete" if event_type == "page.deleted" else "touch"
+                response = await client.post(f"{notion_url}/standin/pages/{page_id}/{action}")
+                response.raise_for_status()
+
+            body = json.dumps(make_event(page_id, event_type)).encode()
+            response = await client.post(
+                url, content=body,
+                headers={"Content-Type": "application/json", SIGNATURE_HEADER: sign(body, token)},
+            )
+            print(f"{n + 1}/{burst} {event_type} {page_id}: {response.status_code} {response.text}")
+            if n + 1 < burst:
+                await asyncio.sleep(interval_s)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Send signed Notion webhook events")
+    parser.add_argument("page_id")
+    parser.add_argument("--token", required=True, help="Same value as NOTION_WEBHOOK_TOKEN")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/notion/webhook")
+    parser.add_argument("--type", default="page.content_updated", help="page.content_updated, page.deleted, ...")
+    parser.add_argument("--burst", type=int, default=1, help="Events to send (to exercise debouncing)")
+    parser.add_argument("--interval", type=float, default=0.2, help="Seconds between events of a burst")
+    parser.add_argument("--notion", help="Notion stand-in base URL, e.g. http://127.0.0.1:9102")
+    args = parser.parse_args()
+    asyncio.run(send_events(args.url, args.token, args.page_id, args.type, args.burst, args.interval, args.notion))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Standalone change-detection daemon: enqueue sync jobs for pages edited in Notion (--once for a single pass)."""
+import argparse
+import asyncio
+from app.db import close_db
+from app.notion_api import close_notion
+from app.sync_scheduler import check_for_changes, run_scheduler
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+async def main(once: bool = False):
+    try:
+        if once:
+            changed = await check_for_changes()
+            for page_id in changed["configured"]:
+                print(f"queued   {page_id}")
+            for page_id in changed["managed"]:
+                print(f"queued   {page_id} (managed)")
+        else:
+            await run_scheduler()
+    finally:
+        await close_notion()
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll Notion and enqueue syncs for changed pages")
+    parser.add_argument("--once", action="store_true", help="Run one check and exit")
+    try:
+        asyncio.run(main(once=parser.parse_args().once))
+    except KeyboardInterrupt:
+        logger.info("Sync daemon stopped")
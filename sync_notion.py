@@ -1,23 +1,33 @@
 #!/usr/bin/env python3
-"""Sync Notion databases with the application."""
+"""Sync Notion databases with the application (incremental unless --full)."""
+import argparse
 import asyncio
-from app.db import get_db
-from app.notion_sync import ingest_all
+from app.ingest_pipeline import ingest_all
 from app.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-async def sync_notion():
+async def sync_notion(full: bool = False):
     """Sync all Notion databases."""
     try:
-        async for db in get_db():
-            stats = await ingest_all(db)
-            logger.info("Notion sync completed", stats=stats)
+        stats = await ingest_all(full=full)
+        report = stats.pop("report")
+        logger.info("Notion sync completed", stats=stats)
+        for page_id in report["updated"]:
+            print(f"updated  {page_id}")
+        for page_id in report["skipped"]:
+            print(f"skipped  {page_id}")
+        for failure in report["failed"]:
+            print(f"failed   {failure['page_id']} ({failure['stage']}): {failure['error']}")
+        for name, stage in report["stages"].items():
+            print(f"stage    {name}: {stage['pages']} pages, {stage['busy_s']}s busy, {stage['pages_per_s']} pages/s")
     except Exception as e:
         logger.error("Notion sync failed", error=str(e))
         raise
 
 
 if __name__ == "__main__":
-    asyncio.run(sync_notion())
+    parser = argparse.ArgumentParser(description="Sync configured Notion pages")
+    parser.add_argument("--full", action="store_true", help="Re-ingest every page, even unchanged ones")
+    asyncio.run(sync_notion(full=parser.parse_args().full))
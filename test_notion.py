@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 """Test Notion API connection."""
 import asyncio
-from notion_client import AsyncClient
 from app.config import settings
+from app.notion_api import notion, notion_call
 from app.logger import get_logger
 
 logger = get_logger(__name__)
@@ -11,7 +11,6 @@ logger = get_logger(__name__)
 async def test_notion():
     """Test Notion connection and database access."""
     try:
-        notion = AsyncClient(auth=settings.notion_token)
         database_ids = settings.get_database_ids()
         
         print(f"\n=== Testing Notion API ===")
@@ -25,7 +24,7 @@ async def test_notion():
                 print(f"\n[{i}] Testing database: {db_id}")
                 
                 # Try to query the database
-                response = await notion.databases.query(database_id=db_id, page_size=1)
+                response = await notion_call(notion.databases.query, database_id=db_id, page_size=1)
                 pages_count = len(response.get("results", []))
                 
                 print(f"    ✅ Accessible - {pages_count} pages found")